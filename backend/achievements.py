@@ -0,0 +1,139 @@
+"""
+Declarative achievement registry.
+
+Each achievement subscribes to a single counter on the userInfo document.
+Unlocks are evaluated only when one of those counters moves, and each is
+persisted with a conditional $addToSet, so read endpoints never have to
+re-check the rules. Users who met a requirement before their counter last
+moved are unlocked by migrations/m0004_backfill_achievements.py.
+"""
+
+from cache import user_written
+
+# Achievement definitions, keyed by id. `counter` is the userInfo field the
+# rule listens to and `requirement` is the value that unlocks it.
+ACHIEVEMENTS = {
+    "streak_star": {
+        "id": "streak_star",
+        "name": "Streak Star",
+        "icon": "🔥",
+        "description": "Maintain spending limits for 4 consecutive weeks",
+        "counter": "consecutive_weekly_streaks",
+        "requirement": 4
+    },
+    "budget_boss": {
+        "id": "budget_boss",
+        "name": "Budget Boss",
+        "icon": "💰",
+        "description": "Earn 100-point monthly bonus for 3 consecutive months",
+        "counter": "consecutive_monthly_bonuses",
+        "requirement": 3
+    },
+    "loan_legend": {
+        "id": "loan_legend",
+        "name": "Loan Legend",
+        "icon": "🏦",
+        "description": "Complete 5 timely loan repayments",
+        "counter": "timely_loan_repayments",
+        "requirement": 5
+    }
+}
+
+# counter field -> achievements that subscribe to it
+SUBSCRIPTIONS = {}
+for _achievement in ACHIEVEMENTS.values():
+    SUBSCRIPTIONS.setdefault(_achievement["counter"], []).append(_achievement)
+
+
+def public_achievement(achievement: dict):
+    """Achievement fields exposed to the client"""
+    return {k: v for k, v in achievement.items() if k != 'counter'}
+
+
+def on_counters_changed(users, username: str, counters: dict, user: dict = None):
+    """
+    Evaluate the rules subscribed to the counters that just moved.
+
+    Args:
+        users: the userInfo collection
+        username: user whose counters changed
+        counters: {counter_field: new_value} as written by the caller
+        user: the request's copy of the user document, kept in sync if given
+
+    Returns:
+        List of achievements unlocked by this change
+    """
+    candidates = []
+    for counter, value in counters.items():
+        for achievement in SUBSCRIPTIONS.get(counter, []):
+            if value >= achievement["requirement"]:
+                candidates.append(achievement)
+
+    if not candidates:
+        return []
+
+    # Each id is added only while the user doesn't hold it, to both lists, so
+    # a held achievement is never shown as new again.
+    unlocked = []
+    for achievement in candidates:
+        result = users.update_one(
+            {'username': username, 'achievements': {'$ne': achievement["id"]}},
+            {'$addToSet': {
+                'achievements': achievement["id"],
+                'unseen_achievements': achievement["id"]
+            }}
+        )
+        if result.modified_count:
+            unlocked.append(achievement["id"])
+    if not unlocked:
+        return []
+    user_written(username)
+
+    if user is not None:
+        user['achievements'] = user.get('achievements', []) + unlocked
+        user['unseen_achievements'] = user.get('unseen_achievements', []) + unlocked
+    return [public_achievement(ACHIEVEMENTS[a]) for a in unlocked]
+
+
+def pop_unseen_achievements(users, user: dict):
+    """
+    Return achievements unlocked since the client last asked, and clear them.
+
+    Args:
+        users: the userInfo collection
+        user: userInfo document already loaded by the caller; updated in place
+    """
+    unseen = user.get('unseen_achievements', [])
+    if not unseen:
+        return []
+
+    users.update_one(
+        {'username': user['username']},
+        {'$pullAll': {'unseen_achievements': unseen}}
+    )
+    user_written(user['username'])
+    user['unseen_achievements'] = []
+    return [public_achievement(ACHIEVEMENTS[a]) for a in unseen if a in ACHIEVEMENTS]
+
+
+def achievement_progress(user: dict):
+    """Progress of every registered achievement for a loaded user document"""
+    unlocked_achievements = user.get('achievements', [])
+    achievements_data = []
+
+    for achievement_id, achievement in ACHIEVEMENTS.items():
+        current_value = user.get(achievement['counter'], 0)
+        progress = min(100, int((current_value / achievement['requirement']) * 100))
+
+        achievements_data.append({
+            'id': achievement_id,
+            'name': achievement['name'],
+            'icon': achievement['icon'],
+            'description': achievement['description'],
+            'unlocked': achievement_id in unlocked_achievements,
+            'progress': progress,
+            'current': current_value,
+            'required': achievement['requirement']
+        })
+
+    return achievements_data
@@ -0,0 +1,101 @@
+"""
+Income/expense/loan breakdowns for /get-analytics.
+
+All five time frames are computed in one pass over the user's columns:
+each row is bucketed by the smallest frame that contains it, one bincount
+sums amounts per (bucket, type, label), and a cumulative sum over the
+buckets turns that into per-frame totals. The result for every frame is
+cached together under (username, data_version, date), so switching the
+time frame is a cache hit, and any transaction write (which bumps
+data_version) or a new day moves to a fresh entry; stale ones fall out
+of the LRU.
+"""
+
+from datetime import date, timedelta
+import numpy as np
+from cache import analytics_cache
+from columnar import TYPES, TYPE_CODES, get_columns
+
+TIME_FRAMES = {
+    '1week': 7,
+    '1month': 30,
+    '3months': 90,
+    '6months': 180,
+    '1year': 365
+}
+DEFAULT_TIME_FRAME = '1month'
+
+_FRAME_NAMES = list(TIME_FRAMES)
+_FRAME_DAYS = np.array(list(TIME_FRAMES.values()))
+
+
+def _breakdowns(columns, end: date):
+    """[frame][type] -> ({label: total}, total), for every frame at once"""
+    end_day = np.datetime64(end, 'D')
+    rows = columns.mask(end_day - int(_FRAME_DAYS[-1]), end_day, inclusive_end=True) & (columns.types >= 0)
+    days_ago = (end_day - columns.dates[rows]).astype(np.int64)
+    buckets = np.searchsorted(_FRAME_DAYS, days_ago, side='left')
+
+    labels = len(columns.label_names)
+    shape = (len(_FRAME_DAYS), len(TYPES), labels)
+    keys = (buckets * len(TYPES) + columns.types[rows]) * labels + columns.labels[rows]
+    size = int(np.prod(shape))
+    sums = np.bincount(keys, weights=columns.amounts[rows], minlength=size).reshape(shape).cumsum(axis=0)
+    counts = np.bincount(keys, minlength=size).reshape(shape).cumsum(axis=0)
+
+    frames = []
+    for frame in range(len(_FRAME_DAYS)):
+        per_type = []
+        for type_code in range(len(TYPES)):
+            present = np.flatnonzero(counts[frame, type_code])
+            by_label = {columns.label_names[i]: round(float(sums[frame, type_code, i]), 2) for i in present}
+            by_label = dict(sorted(by_label.items(), key=lambda x: x[1], reverse=True))
+            per_type.append((by_label, float(sums[frame, type_code].sum())))
+        frames.append(per_type)
+    return frames
+
+
+def compute_reports(columns, end: date):
+    """{time_frame: report} for all time frames ending on `end`"""
+    reports = {}
+    for name, days, per_type in zip(_FRAME_NAMES, _FRAME_DAYS, _breakdowns(columns, end)):
+        income_by_source, total_income = per_type[TYPE_CODES['income']]
+        expense_by_category, total_expense = per_type[TYPE_CODES['debit']]
+        loans_taken, total_loans_taken = per_type[TYPE_CODES['loanTaken']]
+        loan_repayments, total_loan_repayments = per_type[TYPE_CODES['loanRepayment']]
+        reports[name] = {
+            'start_date': str(end - timedelta(days=int(days))),
+            'end_date': str(end),
+            'income': {
+                'by_source': income_by_source,
+                'total': round(total_income, 2)
+            },
+            'expenses': {
+                'by_category': expense_by_category,
+                'total': round(total_expense, 2)
+            },
+            'loans': {
+                'taken': {
+                    'by_lender': loans_taken,
+                    'total': round(total_loans_taken, 2)
+                },
+                'repayments': {
+                    'by_lender': loan_repayments,
+                    'total': round(total_loan_repayments, 2)
+                }
+            },
+            'net_balance': round(total_income - total_expense - total_loan_repayments + total_loans_taken, 2)
+        }
+    return reports
+
+
+def analytics_report(db, username: str, data_version, time_frame: str, end: date = None):
+    """The /get-analytics body for one time frame (unknown frames fall back to 1month)"""
+    end = end or date.today()
+    key = (username, data_version or 0, end)
+    reports = analytics_cache.get(key)
+    if reports is None:
+        reports = compute_reports(get_columns(db, username, data_version), end)
+        analytics_cache.put(key, reports)
+    report = reports.get(time_frame, reports[DEFAULT_TIME_FRAME])
+    return dict(report, time_frame=time_frame)
@@ -0,0 +1,268 @@
+"""
+ASGI serving mode.
+
+    uvicorn asgi:app --workers 4
+
+The endpoints that spend most of their time waiting on an upstream
+service -- /gemini-suggestions, /add-post, /finance-news,
+/finance-headlines, /api/translate and /api/translate/batch -- are served
+by async handlers: Gemini through the google-genai aio client, NewsAPI
+through httpx and MongoDB through PyMongo's AsyncMongoClient. A request
+waiting on Gemini holds no thread, so thousands can be in flight per
+worker. bcrypt checks are awaited on the password process pool.
+
+Every other route is handed to the Flask app unchanged (asgiref runs it
+on a thread pool), and the async handlers return the same bodies and
+status codes as their Flask versions, so clients can't tell which server
+they are talking to. `python main.py` keeps serving everything with Flask.
+"""
+
+import json
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl
+from asgiref.wsgi import WsgiToAsgi
+from mongodb import getdatabase_async
+from metrics import REQUEST_SECONDS
+from cache import transaction_snapshot_async
+from user_repository import AsyncUserRepository
+from gemini import get_gemini_suggestions_async, get_keywords_async
+from newsapi import (get_finance_tips_articles_async, get_top_finance_headlines_async,
+                     format_articles_for_display)
+from translation import translate_text_async, translate_batch_async
+from passwords import checkpw_async, PasswordQueueFull
+import main
+
+adb = getdatabase_async("finwise")
+users_repo = AsyncUserRepository(adb.get_collection("userInfo"))
+flask_app = WsgiToAsgi(main.app)
+
+
+async def authenticated_user(username: str, password: str, *views):
+    """(user, None) or (None, error response) like the Flask routes"""
+    user = await users_repo.get(username, 'auth', *views)
+    if not user:
+        return None, ({'error': 'Username does not exist'}, 404)
+    if not await checkpw_async(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return None, ({'error': 'Password entered is incorrect'}, 401)
+    return user, None
+
+
+async def gemini_suggestions(args, req):
+    username = req.get('username')
+    password = req.get('password')
+
+    if not username or not password:
+        return {'error': 'username and password are required'}, 400
+
+    user, error = await authenticated_user(username, password, 'history')
+    if error:
+        return error
+
+    data = (await transaction_snapshot_async(adb, username, user.get('data_version')))['records']
+
+    if not data:
+        return {'error': 'No transaction data available for analysis'}, 404
+
+    try:
+        suggestions = await get_gemini_suggestions_async(data)
+
+        return {
+            'msg': 'Suggestions generated successfully',
+            'praise': suggestions.praise,
+            'suggestions': suggestions.suggestions
+        }, 200
+    except Exception as e:
+        return {'error': f'Failed to generate suggestions: {str(e)}'}, 500
+
+
+async def add_post(args, req):
+    username = req.get('username')
+    password = req.get('password')
+    content = req.get('content', '')
+
+    if not username or not password or not content:
+        return {'error': 'username, password, and content are required'}, 400
+
+    # Convert \n string literals back to actual newlines
+    content = content.replace('\\n', '\n')
+
+    user, error = await authenticated_user(username, password)
+    if error:
+        return error
+
+    try:
+        keywords = await get_keywords_async(content)
+
+        community = adb.get_collection("community")
+
+        last_post = await community.find_one(sort=[("post_id", -1)])
+        next_post_id = (last_post.get("post_id", 0) if last_post else 0) + 1
+
+        await community.insert_one({
+            "post_id": next_post_id,
+            "username": username,
+            "dateEntered": str(datetime.now().date()),
+            "timeEntered": str(datetime.now().time()),
+            "content": content,
+            "keywords": keywords
+        })
+
+        return {
+            'msg': 'Post added successfully',
+            'post_id': next_post_id,
+            'keywords': keywords
+        }, 201
+
+    except Exception as e:
+        return {'error': f'Failed to add post: {str(e)}'}, 500
+
+
+async def finance_news(args, req):
+    try:
+        result = await get_finance_tips_articles_async(
+            query=args.get('query', 'finance tips OR personal finance OR money management OR budgeting OR saving money'),
+            sort_by=args.get('sort_by', 'publishedAt'),
+            page_size=int(args.get('page_size', 10)),
+            page=int(args.get('page', 1)),
+            from_date=args.get('from_date', None)
+        )
+
+        if result['status'] == 'error':
+            return {'error': result.get('error', 'Failed to fetch articles')}, 500
+
+        return {
+            'status': 'ok',
+            'totalResults': result['totalResults'],
+            'articles': format_articles_for_display(result['articles']),
+            'query': result.get('query'),
+            'from_date': result.get('from_date')
+        }, 200
+
+    except Exception as e:
+        return {'error': f'Failed to fetch finance news: {str(e)}'}, 500
+
+
+async def finance_headlines(args, req):
+    try:
+        result = await get_top_finance_headlines_async(
+            country=args.get('country', 'in'),
+            page_size=int(args.get('page_size', 10)),
+            page=int(args.get('page', 1))
+        )
+
+        if result['status'] == 'error':
+            return {'error': result.get('error', 'Failed to fetch headlines')}, 500
+
+        return {
+            'status': 'ok',
+            'totalResults': result['totalResults'],
+            'articles': format_articles_for_display(result['articles'])
+        }, 200
+
+    except Exception as e:
+        return {'error': f'Failed to fetch finance headlines: {str(e)}'}, 500
+
+
+async def translate(args, data):
+    try:
+        if not data or 'text' not in data:
+            return {'error': 'Missing required field: text'}, 400
+
+        text = data.get('text', '')
+        source_lang = data.get('source', 'en')
+        target_lang = data.get('target', 'en')
+
+        if not text or text.strip() == '':
+            return {'translatedText': text, 'source': source_lang, 'target': target_lang}, 200
+
+        translated = await translate_text_async(text, source_lang, target_lang)
+        return {'translatedText': translated, 'source': source_lang, 'target': target_lang}, 200
+
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+async def translate_batch(args, data):
+    try:
+        if not data or 'texts' not in data:
+            return {'error': 'Missing required field: texts'}, 400
+
+        texts = data.get('texts', [])
+        source_lang = data.get('source', 'en')
+        target_lang = data.get('target', 'en')
+
+        if not isinstance(texts, list):
+            return {'error': 'texts must be an array'}, 400
+
+        translations = await translate_batch_async(texts, source_lang, target_lang)
+        return {'translations': translations, 'source': source_lang, 'target': target_lang}, 200
+
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+
+# (method, path) -> async handler(query args, JSON body) returning (payload, status)
+ROUTES = {
+    ('POST', '/gemini-suggestions'): gemini_suggestions,
+    ('POST', '/add-post'): add_post,
+    ('GET', '/finance-news'): finance_news,
+    ('GET', '/finance-headlines'): finance_headlines,
+    ('POST', '/api/translate'): translate,
+    ('POST', '/api/translate/batch'): translate_batch,
+}
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _respond(send, payload, status: int, cors: bool):
+    body = main.app.json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n'
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    if cors:
+        headers.append((b'access-control-allow-origin', b'*'))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _serve(handler, scope, receive, send):
+    started = time.perf_counter()
+    headers = dict(scope['headers'])
+    args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+    body = await _read_body(receive)
+    try:
+        req = json.loads(body) if body else {}
+    except ValueError:
+        payload, status = {'error': 'Request body must be JSON'}, 400
+    else:
+        try:
+            payload, status = await handler(args, req if isinstance(req, dict) else {})
+        except PasswordQueueFull:
+            payload, status = {'error': 'Server is busy, please try again shortly'}, 503
+    await _respond(send, payload, status, cors=b'origin' in headers)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, scope['path'], scope['method'], str(status))
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    handler = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler is None:
+        return await flask_app(scope, receive, send)
+    await _serve(handler, scope, receive, send)
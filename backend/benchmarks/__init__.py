@@ -0,0 +1 @@
+"""Benchmarks for the FinWise backend"""
@@ -0,0 +1,139 @@
+"""
+Microbenchmark: per-row loops vs. columnar group-bys.
+
+Compares the list-of-dicts loops the streak checks and /get-analytics used
+to run against the columnar versions in columnar.py, on synthetic
+histories of increasing size. No database is needed.
+
+Usage (from backend/):
+    python -m benchmarks.columnar_bench
+    python -m benchmarks.columnar_bench --sizes 1000 10000 100000
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime, date, timedelta
+from columnar import columns_from_records, period_totals, exceeded_categories, TYPE_CODES
+
+CATEGORIES = ["Food & Dining", "Transportation", "Shopping", "Entertainment",
+              "Bills & Utilities", "Healthcare", "Education", "Travel", "Other"]
+SOURCES = ["Salary", "Freelance", "Interest"]
+LIMITS = {"Food & Dining": 10, "Transportation": 5, "Shopping": 5, "Entertainment": 5,
+          "Bills & Utilities": 10, "Healthcare": 5, "Education": 20, "Travel": 5, "Other": 5}
+
+
+def synthetic_history(n: int, seed: int = 42):
+    """n transactions spread over the last two years"""
+    rng = random.Random(seed)
+    today = date(2026, 1, 1)
+    records = []
+    for _ in range(n):
+        day = str(today - timedelta(days=rng.randrange(730)))
+        if rng.random() < 0.15:
+            records.append({'dateEntered': day, 'amount': round(rng.uniform(500, 5000), 2),
+                            'type': 'income', 'source': rng.choice(SOURCES)})
+        else:
+            records.append({'dateEntered': day, 'amount': round(rng.uniform(1, 300), 2),
+                            'type': 'debit', 'category': rng.choice(CATEGORIES)})
+    return records
+
+
+def loop_period_totals(records, start, end):
+    """The per-row loop the streak checks used"""
+    expenses = {}
+    total_income = 0
+    for trans in records:
+        try:
+            trans_date = datetime.strptime(trans.get('dateEntered', ''), '%Y-%m-%d').date()
+            if start <= trans_date < end:
+                if trans.get('type') == 'debit':
+                    category = trans.get('category', 'Unknown')
+                    expenses[category] = expenses.get(category, 0) + float(trans.get('amount', 0))
+                elif trans.get('type') == 'income':
+                    total_income += float(trans.get('amount', 0))
+        except:
+            continue
+    return total_income, expenses
+
+
+def loop_compliance(records, start, end):
+    total_income, expenses = loop_period_totals(records, start, end)
+    return [c for c, spent in expenses.items()
+            if c in LIMITS and total_income > 0 and spent > LIMITS[c] / 100 * total_income]
+
+
+def columnar_compliance(columns, start, end):
+    total_income, expenses = period_totals(columns, start, end)
+    return exceeded_categories(expenses, LIMITS, total_income)
+
+
+def loop_analytics(records, start, end):
+    """The per-row filter + group-by /get-analytics used"""
+    filtered = []
+    for trans in records:
+        try:
+            trans_date = datetime.strptime(trans.get('dateEntered', ''), '%Y-%m-%d').date()
+            if start <= trans_date <= end:
+                filtered.append(trans)
+        except (ValueError, AttributeError):
+            continue
+    by_source, by_category = {}, {}
+    for trans in filtered:
+        if trans.get('type') == 'income':
+            source = trans.get('source', 'Unknown')
+            by_source[source] = by_source.get(source, 0) + float(trans.get('amount', 0))
+        elif trans.get('type') == 'debit':
+            category = trans.get('category', 'Unknown')
+            by_category[category] = by_category.get(category, 0) + float(trans.get('amount', 0))
+    return by_source, by_category
+
+
+def columnar_analytics(columns, start, end):
+    in_range = columns.mask(start, end, inclusive_end=True)
+    return (columns.group_totals(in_range & (columns.types == TYPE_CODES['income'])),
+            columns.group_totals(in_range & (columns.types == TYPE_CODES['debit'])))
+
+
+def bench(fn, repeat: int):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main(sizes, repeat):
+    month_start, month_end = date(2025, 11, 1), date(2025, 12, 1)
+    year_start, year_end = date(2025, 1, 1), date(2026, 1, 1)
+
+    print(f"{'rows':>8} {'case':<22} {'loop ms':>10} {'columnar ms':>12} {'speedup':>8}")
+    for n in sizes:
+        records = synthetic_history(n)
+        load_ms = bench(lambda: columns_from_records(records), repeat)
+        columns = columns_from_records(records)
+
+        # sanity check: both paths agree
+        income, expenses = loop_period_totals(records, month_start, month_end)
+        c_income, c_expenses = period_totals(columns, month_start, month_end)
+        assert abs(income - c_income) < 1e-6 and expenses.keys() == c_expenses.keys()
+
+        cases = {
+            'monthly compliance': (
+                lambda: loop_compliance(records, month_start, month_end),
+                lambda: columnar_compliance(columns, month_start, month_end)
+            ),
+            'analytics (1 year)': (
+                lambda: loop_analytics(records, year_start, year_end),
+                lambda: columnar_analytics(columns, year_start, year_end)
+            )
+        }
+        for name, (loop_fn, columnar_fn) in cases.items():
+            loop_ms = bench(loop_fn, repeat)
+            columnar_ms = bench(columnar_fn, repeat)
+            print(f"{n:>8} {name:<22} {loop_ms:>10.2f} {columnar_ms:>12.3f} {loop_ms / columnar_ms:>7.1f}x")
+        print(f"{n:>8} {'load (one-off, cached)':<22} {'':>10} {load_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Loop vs. columnar transaction benchmarks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,77 @@
+"""
+Benchmark: friend suggestion latency on a large synthetic graph.
+
+Builds a FriendGraph from an in-memory stand-in for the userInfo
+collection (random friendships with a given average degree and random
+interest maps) and times suggestions() for random users. No database is
+needed.
+
+Usage (from backend/):
+    python -m benchmarks.friend_graph_bench
+    python -m benchmarks.friend_graph_bench --users 1000000 --degree 50
+"""
+
+import argparse
+import random
+import time
+import numpy as np
+from friend_graph import FriendGraph
+
+TOPICS = [f"Finance topic {i}" for i in range(30)]
+
+
+class FakeUsers:
+    """Just enough of a pymongo collection for FriendGraph.build"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, *args, **kwargs):
+        return iter(self.docs)
+
+
+def synthetic_users(n: int, degree: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    names = [f"user_{i:07d}" for i in range(n)]
+    friends = [[] for _ in range(n)]
+    edges = rng.integers(0, n, size=(n * degree // 2, 2))
+    for a, b in edges.tolist():
+        if a != b:
+            friends[a].append(names[b])
+            friends[b].append(names[a])
+    interests = rng.gamma(0.5, 10, size=(n, len(TOPICS)))
+    return [{
+        'username': names[i],
+        'friends': friends[i],
+        'user_interest': dict(zip(TOPICS, interests[i].tolist()))
+    } for i in range(n)]
+
+
+def main(users: int, degree: int, lookups: int):
+    print(f"Generating {users} users with average degree {degree}...")
+    docs = synthetic_users(users, degree)
+
+    graph = FriendGraph(TOPICS)
+    started = time.perf_counter()
+    graph.build(FakeUsers(docs))
+    print(f"Build: {time.perf_counter() - started:.1f}s  {graph.stats()}")
+
+    rng = random.Random(3)
+    timings = []
+    for _ in range(lookups):
+        username = docs[rng.randrange(users)]['username']
+        started = time.perf_counter()
+        graph.suggestions(username, 10)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(f"suggestions(): p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms over {lookups} lookups")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Friend suggestion latency")
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--degree', type=int, default=30)
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+    main(args.users, args.degree, args.lookups)
@@ -0,0 +1,19 @@
+"""
+Load test for the FinWise API.
+
+Seeds a scratch database with synthetic users, transaction histories,
+friendships, posts and split expenses (datagen.py), then drives the real
+Flask app in-process through weighted scenarios (scenarios.py) from
+several threads. Gemini, NewsAPI and the translator are replaced by
+local stubs (stubs.py), so results measure our own code and MongoDB only.
+
+Latency percentiles and throughput per endpoint are written as JSON;
+pass a previous report with --baseline to print the change per endpoint.
+
+Usage (from backend/, with a local mongod running):
+    python -m benchmarks.load --users 2000 --requests 5000 --output before.json
+    python -m benchmarks.load --users 2000 --requests 5000 --baseline before.json
+
+The scratch database (finwise_bench by default) is dropped and reseeded
+on every run unless --keep-data is given.
+"""
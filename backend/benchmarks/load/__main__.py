@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="FinWise API load test")
+parser.add_argument('--database', default='finwise_bench', help="scratch database (dropped and reseeded)")
+parser.add_argument('--users', type=int, default=1000)
+parser.add_argument('--transactions', type=int, default=200, help="average transactions per user")
+parser.add_argument('--friends', type=int, default=10, help="average friends per user")
+parser.add_argument('--posts', type=int, default=2000)
+parser.add_argument('--splits', type=int, default=500)
+parser.add_argument('--requests', type=int, default=3000, help="scenario runs (each issues 1-4 requests)")
+parser.add_argument('--concurrency', type=int, default=8)
+parser.add_argument('--scenarios', nargs='+', help="only run these scenarios")
+parser.add_argument('--stub-latency-ms', type=float, default=0, help="simulated Gemini/NewsAPI/translator latency")
+parser.add_argument('--seed', type=int, default=7)
+parser.add_argument('--keep-data', action='store_true', help="reuse the existing scratch database")
+parser.add_argument('--output', help="write the JSON report here (default: stdout)")
+parser.add_argument('--baseline', help="previous JSON report to compare against")
+args = parser.parse_args()
+
+if args.database == 'finwise':
+    parser.error("refusing to reseed the production database; pick another --database")
+
+# Point every getdatabase() call, including main's, at the scratch database
+os.environ['FINWISE_DATABASE'] = args.database
+os.environ.setdefault('FINWISE_SLOW_REQUEST_MS', '1000000')  # keep the slow-request log quiet
+
+from benchmarks.load import stubs  # noqa: E402
+stubs.install(args.stub_latency_ms)
+
+from mongodb import getdatabase  # noqa: E402
+from benchmarks.load.datagen import seed, username_for  # noqa: E402
+from benchmarks.load.scenarios import SCENARIOS, Session  # noqa: E402
+
+db = getdatabase(args.database)
+if args.keep_data and db.get_collection("userInfo").estimated_document_count():
+    friend_lists = {u['username']: u.get('friends', [])
+                    for u in db.get_collection("userInfo").find({'username': {'$regex': '^bench_user_'}},
+                                                                 {'username': True, 'friends': True})}
+    posts = db.get_collection("community").estimated_document_count()
+else:
+    db.client.drop_database(args.database)
+    started = time.perf_counter()
+    friend_lists = seed(db, args.users, args.transactions, args.friends, args.posts, args.splits, args.seed)
+    posts = args.posts
+    print(f"🌱 Seeded {args.database} in {time.perf_counter() - started:.1f}s")
+
+import main  # noqa: E402  (imported after seeding so the friend graph sees the data)
+
+names = args.scenarios or list(SCENARIOS)
+weights = [SCENARIOS[name][0] for name in names]
+usernames = sorted(friend_lists)
+
+samples = {}
+lock = threading.Lock()
+
+
+def record(label: str, seconds: float, status: int):
+    with lock:
+        samples.setdefault(label, []).append((seconds, status))
+
+
+local = threading.local()
+
+
+def run_one(i: int):
+    if not hasattr(local, 'client'):
+        local.client = main.app.test_client()
+    rng = random.Random(args.seed * 1_000_003 + i)
+    username = rng.choice(usernames)
+    name = rng.choices(names, weights=weights)[0]
+    SCENARIOS[name][1](Session(local.client, record, rng, username, friend_lists[username], posts))
+
+
+print(f"🚀 {args.requests} scenario runs over {args.concurrency} threads: {', '.join(names)}")
+started = time.perf_counter()
+with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+    list(pool.map(run_one, range(args.requests)))
+wall = time.perf_counter() - started
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+endpoints = {}
+for label, values in sorted(samples.items()):
+    ordered = sorted(seconds for seconds, _ in values)
+    endpoints[label] = {
+        'count': len(values),
+        'errors': sum(1 for _, status in values if status >= 500),
+        'rejected': sum(1 for _, status in values if 400 <= status < 500),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'throughput_rps': round(len(values) / wall, 2)
+    }
+
+try:
+    revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+except OSError:
+    revision = None
+
+report = {
+    'revision': revision,
+    'at': datetime.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+    'wall_seconds': round(wall, 3),
+    'total_requests': sum(e['count'] for e in endpoints.values()),
+    'throughput_rps': round(sum(e['count'] for e in endpoints.values()) / wall, 2),
+    'endpoints': endpoints
+}
+
+if args.output:
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {args.output}")
+else:
+    print(json.dumps(report, indent=2))
+
+if args.baseline:
+    with open(args.baseline) as f:
+        baseline = json.load(f)['endpoints']
+    print(f"\n{'endpoint':<36} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for label, now in endpoints.items():
+        before = baseline.get(label)
+        if not before:
+            print(f"{label:<36} {'(new)':>16}")
+            continue
+        cells = [f"{before[k]:.1f}→{now[k]:.1f}" for k in ('p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{label:<36} {cells[0]:>16} {cells[1]:>16} {cells[2]:>16}")
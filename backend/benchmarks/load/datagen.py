@@ -0,0 +1,146 @@
+"""Synthetic FinWise data: users with transaction histories, friends, posts and split expenses"""
+
+import random
+from datetime import date, timedelta
+import bcrypt
+from gemini import finance_topics
+from social import FRIEND_REQUESTS
+from split_expenses import create_split_expense, settle
+from transactions import TRANSACTIONS
+from schema import bootstrap
+
+PASSWORD = "benchpass"
+BATCH_SIZE = 5000
+SETTLED_SHARE = 0.3
+
+CATEGORIES = ["Food & Dining", "Transportation", "Shopping", "Entertainment", "Bills & Utilities",
+              "Healthcare", "Education", "Travel", "Other"]
+SOURCES = ["Salary", "Freelance", "Investments", "Gift"]
+LENDERS = ["Bank", "Credit Union", "Family"]
+
+
+def username_for(i: int):
+    return f"bench_user_{i:06d}"
+
+
+def _user(i: int, hashed: str, rng):
+    interests = {topic: 0 for topic in finance_topics}
+    for topic in rng.sample(finance_topics, 5):
+        interests[topic] = rng.randint(1, 20)
+    return {
+        "name": f"Bench User {i}",
+        "username": username_for(i),
+        "email": f"{username_for(i)}@example.com",
+        "age": rng.randint(18, 70),
+        "password": hashed,
+        "user_interest": interests,
+        "limit": {category: rng.choice([5, 10, 20]) for category in CATEGORIES},
+        "reward_points": rng.randint(0, 4000),
+        "last_weekly_check": "",
+        "last_monthly_check": "",
+        "transaction_count": 5,
+        "last_bonus_id": "",
+        "achievements": [],
+        "achievement_progress": {"streak_star_weeks": 0, "budget_boss_months": 0, "loan_legend_count": 0},
+        "consecutive_monthly_bonuses": 0,
+        "consecutive_weekly_streaks": 0,
+        "timely_loan_repayments": 0,
+        "friends": [],
+        "data_version": 0
+    }
+
+
+def _transaction(username: str, rng, today: date):
+    row = {
+        "username": username,
+        "dateEntered": str(today - timedelta(days=rng.randint(0, 365))),
+        "amount": round(rng.lognormvariate(3.5, 1.0), 2)
+    }
+    kind = rng.choices(["debit", "income", "loanTaken", "loanRepayment"], weights=[70, 15, 5, 10])[0]
+    row["type"] = kind
+    if kind == "debit":
+        row["category"] = rng.choice(CATEGORIES)
+    elif kind == "income":
+        row["source"] = rng.choice(SOURCES)
+        row["amount"] = round(rng.uniform(500, 5000), 2)
+    else:
+        row["lender"] = rng.choice(LENDERS)
+        if kind == "loanRepayment":
+            row["is_paid_on_time"] = rng.random() < 0.8
+    return row
+
+
+def _friend_pairs(users: int, friends: int, rng):
+    """Random undirected friendships, about `friends` per user"""
+    pairs = set()
+    for _ in range(users * friends // 2):
+        a, b = rng.randrange(users), rng.randrange(users)
+        if a != b:
+            pairs.add((min(a, b), max(a, b)))
+    return pairs
+
+
+def seed(db, users: int, transactions: int, friends: int, posts: int, splits: int, seed: int = 7):
+    """Fill an empty database; returns {username: [friends]} for the scenario drivers"""
+    rng = random.Random(seed)
+    bootstrap(db)
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    today = date.today()
+
+    pairs = _friend_pairs(users, friends, rng)
+    friend_lists = {username_for(i): [] for i in range(users)}
+    for a, b in pairs:
+        friend_lists[username_for(a)].append(username_for(b))
+        friend_lists[username_for(b)].append(username_for(a))
+
+    docs = []
+    for i in range(users):
+        user = _user(i, hashed, rng)
+        user["friends"] = friend_lists[user["username"]]
+        docs.append(user)
+    db.get_collection("userInfo").insert_many(docs, ordered=False)
+    print(f"👥 {users} users, {len(pairs)} friendships")
+
+    if pairs:
+        db.get_collection(FRIEND_REQUESTS).insert_many([
+            {'sender': username_for(a), 'recipient': username_for(b), 'status': 'approved',
+             'dateCreated': str(today), 'timeCreated': '12:00:00'}
+            for a, b in pairs
+        ], ordered=False)
+
+    rows = []
+    written = 0
+    for i in range(users):
+        for _ in range(max(1, int(rng.expovariate(1 / transactions)))):
+            rows.append(_transaction(username_for(i), rng, today))
+        if len(rows) >= BATCH_SIZE:
+            db.get_collection(TRANSACTIONS).insert_many(rows, ordered=False)
+            written += len(rows)
+            rows = []
+    if rows:
+        db.get_collection(TRANSACTIONS).insert_many(rows, ordered=False)
+        written += len(rows)
+    print(f"💳 {written} transactions")
+
+    if posts:
+        db.get_collection("community").insert_many([{
+            "post_id": post_id,
+            "username": username_for(rng.randrange(users)),
+            "dateEntered": str(today - timedelta(days=rng.randint(0, 90))),
+            "timeEntered": "12:00:00",
+            "content": f"Tip #{post_id}: automate your savings before you spend.",
+            "keywords": rng.sample(finance_topics, rng.randint(3, 7))
+        } for post_id in range(1, posts + 1)], ordered=False)
+    print(f"📝 {posts} posts")
+
+    with_friends = [u for u, f in friend_lists.items() if f]
+    created = 0
+    for _ in range(splits if with_friends else 0):
+        creator = rng.choice(with_friends)
+        split_with = rng.sample(friend_lists[creator], min(len(friend_lists[creator]), rng.randint(1, 4)))
+        expense, _ = create_split_expense(db, creator, round(rng.uniform(10, 300), 2), "Dinner", split_with)
+        if rng.random() < SETTLED_SHARE:
+            settle(db, expense)
+        created += 1
+    print(f"🧾 {created} split expenses")
+    return friend_lists
@@ -0,0 +1,102 @@
+"""Weighted user flows; each one issues a few requests as one synthetic user"""
+
+import time
+from itertools import count
+from benchmarks.load.datagen import PASSWORD, CATEGORIES, SOURCES, LENDERS
+
+TIME_FRAMES = ['1week', '1month', '3months', '6months', '1year']
+_signups = count()
+
+
+class Session:
+    """One scenario run: a test client acting as one user, recording every request"""
+
+    def __init__(self, client, recorder, rng, username: str, friends: list, posts: int):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.username = username
+        self.friends = friends
+        self.posts = posts
+
+    def _record(self, label: str, call):
+        started = time.perf_counter()
+        response = call()
+        self.recorder(label, time.perf_counter() - started, response.status_code)
+        return response
+
+    def post(self, path: str, body: dict = None, auth: bool = True):
+        if auth:
+            body = dict(body or {}, username=self.username, password=PASSWORD)
+        return self._record(f"POST {path}", lambda: self.client.post(path, json=body))
+
+    def get(self, path: str, **params):
+        return self._record(f"GET {path}", lambda: self.client.get(path, query_string=params))
+
+
+def signup(s: Session):
+    username = f"bench_signup_{time.time_ns()}_{next(_signups)}"
+    s.post("/add-user", {'username': username, 'password': PASSWORD, 'name': "New User",
+                         'email': f"{username}@example.com", 'age': 30}, auth=False)
+
+
+def writes(s: Session):
+    kind = s.rng.choices(['transaction', 'income', 'loanTaken', 'loanRepayment'], weights=[70, 15, 5, 10])[0]
+    amount = round(s.rng.uniform(5, 200), 2)
+    if kind == 'transaction':
+        s.post("/add-transaction", {'amount': amount, 'category': s.rng.choice(CATEGORIES)})
+    elif kind == 'income':
+        s.post("/add-income", {'amount': amount * 10, 'source': s.rng.choice(SOURCES)})
+    elif kind == 'loanTaken':
+        s.post("/add-loanTaken", {'amount': amount * 5, 'lender': s.rng.choice(LENDERS)})
+    else:
+        s.post("/add-loanRepayment", {'amount': amount, 'lender': s.rng.choice(LENDERS),
+                                      'is_paid_on_time': s.rng.random() < 0.8})
+
+
+def dashboard(s: Session):
+    s.post("/get-user-data")
+    s.post("/get-analytics", {'time_frame': s.rng.choice(TIME_FRAMES)})
+    s.post("/get-user-limits")
+
+
+def rewards(s: Session):
+    s.post("/get-rewards")
+    s.post("/get-rank-and-achievements")
+
+
+def community(s: Session):
+    if s.rng.random() < 0.2:
+        s.get("/get-post")  # the whole feed
+    if s.posts:
+        post_id = s.rng.randint(1, s.posts)
+        s.get("/get-post", post_id=post_id)
+        s.post("/handle-interaction", {'username': s.username, 'post_id': post_id, 'weight': 1}, auth=False)
+    if s.rng.random() < 0.1:
+        s.post("/add-post", {'content': "Pay yourself first: save before you spend."})
+
+
+def splits(s: Session):
+    s.post("/get-split-expenses", {'status': s.rng.choice(['unsettled', 'settled', 'all'])})
+    if s.friends and s.rng.random() < 0.3:
+        split_with = s.rng.sample(s.friends, min(len(s.friends), s.rng.randint(1, 3)))
+        s.post("/create-split-expense", {'amount': round(s.rng.uniform(10, 200), 2),
+                                         'description': "Groceries", 'split_with': split_with})
+
+
+def external(s: Session):
+    s.post("/gemini-suggestions")
+    s.get("/finance-news")
+    s.post("/api/translate", {'text': "Track every expense", 'source': 'en', 'target': 'es'}, auth=False)
+
+
+# name -> (relative weight, flow)
+SCENARIOS = {
+    'signup': (2, signup),
+    'writes': (25, writes),
+    'dashboard': (25, dashboard),
+    'rewards': (15, rewards),
+    'community': (15, community),
+    'splits': (15, splits),
+    'external': (3, external),
+}
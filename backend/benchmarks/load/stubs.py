@@ -0,0 +1,106 @@
+"""Local stand-ins for Gemini, NewsAPI and the translator"""
+
+import asyncio
+import os
+import random
+import time
+from types import SimpleNamespace
+
+# gemini.py builds its client at import time
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+
+class _GeminiResponse:
+    def __init__(self, parsed):
+        self.parsed = parsed
+
+
+class _GeminiModels:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _respond(self, config):
+        import gemini
+        if config['response_schema'] is gemini.FinancialSuggestion:
+            return _GeminiResponse(gemini.FinancialSuggestion(
+                praise="You kept your dining spend steady this month.",
+                suggestions="Move part of your income into savings on payday."
+            ))
+        return _GeminiResponse(random.sample(gemini.finance_topics, 4))
+
+    def generate_content(self, model, contents, config):
+        time.sleep(self.latency)
+        return self._respond(config)
+
+
+class _AsyncGeminiModels(_GeminiModels):
+    async def generate_content(self, model, contents, config):
+        await asyncio.sleep(self.latency)
+        return self._respond(config)
+
+
+class _GeminiClient:
+    def __init__(self, latency: float):
+        self.models = _GeminiModels(latency)
+        self.aio = SimpleNamespace(models=_AsyncGeminiModels(latency))
+
+
+class _NewsResponse:
+    def __init__(self, params):
+        self.params = params
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        size = self.params.get('pageSize', 10)
+        return {
+            'status': 'ok',
+            'totalResults': 100,
+            'articles': [{
+                'title': f"Budgeting tip #{i}",
+                'description': "How to build an emergency fund.",
+                'url': f"https://example.com/articles/{i}",
+                'source': {'name': 'Example News'},
+                'publishedAt': '2026-01-01T00:00:00Z'
+            } for i in range(size)]
+        }
+
+
+class _AsyncNewsClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def get(self, endpoint, params=None):
+        await asyncio.sleep(self.latency)
+        return _NewsResponse(params or {})
+
+
+class _Translator:
+    latency = 0.0
+
+    def __init__(self, source='auto', target='en'):
+        self.target = target
+
+    def translate(self, text):
+        time.sleep(self.latency)
+        return f"[{self.target}] {text}"
+
+
+def install(latency_ms: float = 0):
+    """Patch the external clients; call before importing main"""
+    import gemini
+    import newsapi
+    import translation
+
+    latency = latency_ms / 1000
+    gemini.client = _GeminiClient(latency)
+
+    def fake_get(endpoint, params=None, timeout=None):
+        time.sleep(latency)
+        return _NewsResponse(params or {})
+    newsapi.requests = SimpleNamespace(get=fake_get, exceptions=newsapi.requests.exceptions)
+    newsapi._async_client = _AsyncNewsClient(latency)
+
+    _Translator.latency = latency
+    translation.GoogleTranslator = _Translator
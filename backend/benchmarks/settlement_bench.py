@@ -0,0 +1,66 @@
+"""
+Benchmark: debt simplification on large friend groups.
+
+Generates open split expenses among a group (random creator, random
+subset of participants), then times net_positions + min_cash_flow and
+compares the number of transfers against settling every pairwise debt
+separately. No database is needed.
+
+Usage (from backend/):
+    python -m benchmarks.settlement_bench
+    python -m benchmarks.settlement_bench --people 100 500 --expenses 5000
+"""
+
+import argparse
+import random
+import timeit
+from settlement import net_positions, min_cash_flow
+
+
+def synthetic_expenses(people: int, expenses: int, seed: int = 5):
+    rng = random.Random(seed)
+    members = [f"friend_{i:04d}" for i in range(people)]
+    records = []
+    for expense_id in range(1, expenses + 1):
+        creator = rng.choice(members)
+        split_with = rng.sample([m for m in members if m != creator], rng.randint(1, min(8, people - 1)))
+        per_person = round(rng.uniform(5, 500) / (len(split_with) + 1), 2)
+        records.append({
+            'expense_id': expense_id,
+            'created_by': creator,
+            'balances': {friend: per_person for friend in split_with}
+        })
+    return records
+
+
+def main(people_counts, expenses: int, repeat: int):
+    print(f"{'people':>7} {'expenses':>9} {'pair debts':>11} {'transfers':>10} {'plan ms':>9}")
+    for people in people_counts:
+        records = synthetic_expenses(people, expenses)
+        pairs = {(debtor, e['created_by']) for e in records for debtor in e['balances']}
+
+        transfers = min_cash_flow(net_positions(records))
+        net = net_positions(records)
+        assert all(cents == 0 for cents in _apply(net, transfers).values())
+
+        seconds = min(timeit.repeat(lambda: min_cash_flow(net_positions(records)), number=1, repeat=repeat))
+        print(f"{people:>7} {expenses:>9} {len(pairs):>11} {len(transfers):>10} {seconds * 1000:>9.2f}")
+
+
+def _apply(net: dict, transfers):
+    """Net positions left after making the transfers (all zero if the plan is complete)"""
+    left = dict(net)
+    for t in transfers:
+        cents = int(round(t['amount'] * 100))
+        left[t['from']] += cents
+        left[t['to']] -= cents
+    return left
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Greedy min-cash-flow settlement")
+    parser.add_argument('--people', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--expenses', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.people, args.expenses, args.repeat)
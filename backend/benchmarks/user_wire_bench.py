@@ -0,0 +1,81 @@
+"""
+Benchmark: bytes shipped per user lookup, full document vs. named views.
+
+Builds userInfo documents with large friend lists and interest maps and
+measures the BSON size (what crosses the wire in a find_one reply) and
+decode time of the full document against each projection in
+user_repository.PROJECTIONS. No database is needed.
+
+Usage (from backend/):
+    python -m benchmarks.user_wire_bench
+    python -m benchmarks.user_wire_bench --friends 0 500 5000
+"""
+
+import argparse
+import random
+import timeit
+import bcrypt
+import bson
+from user_repository import PROJECTIONS
+
+# same shape as gemini.finance_topics (30 topics) without needing an API key
+FINANCE_TOPICS = [f"Finance topic {i}" for i in range(30)]
+
+
+def synthetic_user(friends: int, seed: int = 7):
+    """A fully populated userInfo document"""
+    rng = random.Random(seed)
+    return {
+        '_id': bson.ObjectId(),
+        'name': 'Bench User',
+        'username': 'bench_user',
+        'email': 'bench@example.com',
+        'age': 30,
+        'password': bcrypt.hashpw(b'benchpassword', bcrypt.gensalt(rounds=4)).decode('utf-8'),
+        'user_interest': {topic: rng.uniform(0, 50) for topic in FINANCE_TOPICS},
+        'limit': {f"Category {i}": rng.randint(1, 20) for i in range(12)},
+        'reward_points': 1234,
+        'last_weekly_check': '2026-10-19',
+        'last_monthly_check': '2026-10-01',
+        'transaction_count': 420,
+        'data_version': 420,
+        'last_bonus_id': '',
+        'rewards_seen_id': bson.ObjectId(),
+        'achievements': ['streak_star', 'loan_legend'],
+        'unseen_achievements': [],
+        'achievement_progress': {'streak_star_weeks': 0, 'budget_boss_months': 0, 'loan_legend_count': 0},
+        'consecutive_monthly_bonuses': 2,
+        'consecutive_weekly_streaks': 5,
+        'timely_loan_repayments': 7,
+        'friends': [f"friend_{i:06d}" for i in range(friends)]
+    }
+
+
+def project(doc: dict, projection: dict):
+    return {k: v for k, v in doc.items() if projection.get(k)}
+
+
+def main(friend_counts, repeat):
+    views = ['auth', 'auth+limits', 'auth+rewards', 'auth+social', 'interests']
+    print(f"{'friends':>8} {'view':<14} {'bytes':>9} {'vs full':>8} {'decode us':>10}")
+    for friends in friend_counts:
+        doc = synthetic_user(friends)
+        full = bson.encode(doc)
+        full_decode = min(timeit.repeat(lambda: bson.decode(full), number=100, repeat=repeat)) / 100 * 1e6
+        print(f"{friends:>8} {'full document':<14} {len(full):>9} {'100%':>8} {full_decode:>10.1f}")
+
+        for view in views:
+            projection = {}
+            for part in view.split('+'):
+                projection.update(PROJECTIONS[part])
+            encoded = bson.encode(project(doc, projection))
+            decode = min(timeit.repeat(lambda: bson.decode(encoded), number=100, repeat=repeat)) / 100 * 1e6
+            print(f"{friends:>8} {view:<14} {len(encoded):>9} {len(encoded) / len(full):>8.1%} {decode:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-document vs. projected user reads")
+    parser.add_argument('--friends', type=int, nargs='+', default=[0, 100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.friends, args.repeat)
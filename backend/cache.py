@@ -0,0 +1,244 @@
+"""
+In-process caches for user documents and transaction snapshots.
+
+Both caches are bounded LRUs keyed by username; user entries hold one
+document per named view (see user_repository.py). Every route or helper that
+writes a user calls `user_written`/`transactions_written`, which drops the
+local entry and publishes the invalidation on a capped MongoDB collection.
+Every process tails that collection, so several gunicorn workers (and the
+streak scheduler) stay coherent. User documents also expire after
+USER_TTL seconds to bound the damage of a missed invalidation. Other
+in-memory state can ride the same channel with `publish`/`subscribe`
+(see friend_graph.py).
+
+analytics_cache (see analytics.py) is keyed by data_version itself, so it
+needs no invalidation: a write moves readers to a new key.
+llm_fallback_cache (see llm_gateway.py) keeps the last Gemini answer per
+prompt, served only while Gemini is unavailable.
+
+Set FINWISE_CACHE_CHANNEL=0 to run without the cross-process channel
+(single-process development only).
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from pymongo.write_concern import WriteConcern
+from transactions import for_user
+
+USER_CACHE_SIZE = 10000
+USER_TTL = 60  # seconds
+TRANSACTION_CACHE_SIZE = 512
+ANALYTICS_CACHE_SIZE = 2048  # one entry holds every time frame for a user
+LLM_FALLBACK_CACHE_SIZE = 1024
+
+CHANNEL = "cacheInvalidations"
+CHANNEL_SIZE_BYTES = 4 * 1024 * 1024
+
+
+class LRUCache:
+    """Thread-safe bounded LRU with optional expiry and hit/miss counters"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, stored_at = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+user_cache = LRUCache('users', USER_CACHE_SIZE, ttl=USER_TTL)
+transaction_cache = LRUCache('transactions', TRANSACTION_CACHE_SIZE)
+analytics_cache = LRUCache('analytics', ANALYTICS_CACHE_SIZE)
+llm_fallback_cache = LRUCache('llm_fallback', LLM_FALLBACK_CACHE_SIZE)
+
+
+def transaction_snapshot(db, username: str, data_version):
+    """
+    Cached snapshot of a user's transactions at a given data_version.
+
+    The snapshot is a dict holding 'records' (documents without _id); other
+    modules may memoize derived views on it (e.g. columnar arrays).
+    """
+    version = data_version or 0
+    snapshot = transaction_cache.get(username)
+    if snapshot is None or snapshot['version'] != version:
+        records = list(for_user(db, username).find())
+        snapshot = {'version': version, 'records': records}
+        transaction_cache.put(username, snapshot)
+    return snapshot
+
+
+async def transaction_snapshot_async(db, username: str, data_version):
+    """transaction_snapshot over an AsyncDatabase, sharing the same cache"""
+    version = data_version or 0
+    snapshot = transaction_cache.get(username)
+    if snapshot is None or snapshot['version'] != version:
+        records = await for_user(db, username).find().to_list(None)
+        snapshot = {'version': version, 'records': records}
+        transaction_cache.put(username, snapshot)
+    return snapshot
+
+
+def user_written(*usernames):
+    """Drop cached user documents here and in every other process"""
+    for username in usernames:
+        user_cache.invalidate(username)
+    _publish('user', usernames)
+
+
+def transactions_written(*usernames):
+    """Drop cached transaction snapshots (and the user documents) everywhere"""
+    for username in usernames:
+        transaction_cache.invalidate(username)
+        user_cache.invalidate(username)
+    _publish('transactions', usernames)
+
+
+def cache_stats():
+    return {
+        'users': user_cache.stats(),
+        'transactions': transaction_cache.stats(),
+        'analytics': analytics_cache.stats(),
+        'llm_fallback': llm_fallback_cache.stats()
+    }
+
+
+# ---- cross-process invalidation channel ----
+
+_channel = None
+_origin = None
+_handlers = {}  # message kind -> callback for messages from other processes
+
+
+def _publish(kind: str, usernames, **payload):
+    if _channel is None or not (usernames or payload):
+        return
+    try:
+        _channel.insert_one(dict(payload, origin=_origin, kind=kind, usernames=list(usernames)))
+    except PyMongoError:
+        # The TTL on user documents bounds staleness if a message is lost
+        pass
+
+
+def publish(kind: str, **payload):
+    """Send a message to the `kind` subscribers of every other process"""
+    _publish(kind, (), **payload)
+
+
+def subscribe(kind: str, handler):
+    """Call handler(message) for each `kind` message published by another process"""
+    _handlers[kind] = handler
+
+
+def _apply(message):
+    for username in message.get('usernames', []):
+        user_cache.invalidate(username)
+        if message.get('kind') == 'transactions':
+            transaction_cache.invalidate(username)
+    handler = _handlers.get(message.get('kind'))
+    if handler is not None:
+        try:
+            handler(message)
+        except Exception as e:
+            print(f"⚠️  {message.get('kind')} message failed: {e}")
+
+
+def _listen(channel):
+    last_id = None
+    newest = channel.find_one(sort=[('$natural', -1)])
+    if newest:
+        last_id = newest['_id']
+
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id else {}
+        try:
+            cursor = channel.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+            while cursor.alive:
+                for message in cursor:
+                    last_id = message['_id']
+                    if message.get('origin') != _origin:
+                        _apply(message)
+        except PyMongoError:
+            # Messages may have been missed; start from a clean cache
+            user_cache.clear()
+            transaction_cache.clear()
+        time.sleep(1)
+
+
+def start_invalidation_channel(db, listen: bool = True):
+    """
+    Start publishing (and, unless listen is False, tailing) invalidations.
+
+    Call once per process. Batch jobs that keep no long-lived cache only
+    need to publish.
+    """
+    global _channel, _origin
+    if _channel is not None or os.getenv("FINWISE_CACHE_CHANNEL", "1") == "0":
+        return
+
+    try:
+        db.create_collection(CHANNEL, capped=True, size=CHANNEL_SIZE_BYTES)
+    except CollectionInvalid:
+        pass  # already exists
+
+    _origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    channel = db.get_collection(CHANNEL)
+    # Fire-and-forget publishes: writers never wait on the channel
+    _channel = channel.with_options(write_concern=WriteConcern(w=0))
+
+    if listen:
+        threading.Thread(target=_listen, args=(channel,), name="cache-invalidation", daemon=True).start()
@@ -0,0 +1,153 @@
+"""
+Columnar view of a user's transaction history.
+
+A user's transactions are read once into NumPy arrays (date as
+datetime64[D], amount as float64, type and label as int codes) so the
+streak checks and analytics become masked group-bys instead of per-row
+strptime/float loops. The label column holds the field analytics groups
+each type by: category for debits, source for income, lender for loans.
+
+Columns are memoized on the user's cached transaction snapshot (see
+cache.py), which is tied to the user's data_version, so a cached copy is
+never stale.
+"""
+
+import numpy as np
+from cache import transaction_snapshot
+
+TYPES = ['debit', 'income', 'loanTaken', 'loanRepayment']
+TYPE_CODES = {name: code for code, name in enumerate(TYPES)}
+UNKNOWN_TYPE = -1
+
+# type -> field holding its grouping label
+LABEL_FIELDS = {
+    'debit': 'category',
+    'income': 'source',
+    'loanTaken': 'lender',
+    'loanRepayment': 'lender'
+}
+
+
+class TransactionColumns:
+    """Parallel arrays for one user's transactions"""
+
+    __slots__ = ('dates', 'amounts', 'types', 'labels', 'label_names')
+
+    def __init__(self, dates, amounts, types, labels, label_names):
+        self.dates = dates
+        self.amounts = amounts
+        self.types = types
+        self.labels = labels
+        self.label_names = label_names
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def mask(self, start=None, end=None, inclusive_end=False, type_name=None):
+        """Rows with a valid date/amount in [start, end) (or [start, end]) of the given type"""
+        m = ~np.isnat(self.dates) & ~np.isnan(self.amounts)
+        if start is not None:
+            m &= self.dates >= np.datetime64(start, 'D')
+        if end is not None:
+            end = np.datetime64(end, 'D')
+            m &= (self.dates <= end) if inclusive_end else (self.dates < end)
+        if type_name is not None:
+            m &= self.types == TYPE_CODES[type_name]
+        return m
+
+    def total(self, mask):
+        return float(self.amounts[mask].sum())
+
+    def group_totals(self, mask):
+        """{label: summed amount} over the masked rows"""
+        sums = np.bincount(self.labels[mask], weights=self.amounts[mask], minlength=len(self.label_names))
+        present = np.bincount(self.labels[mask], minlength=len(self.label_names)) > 0
+        return {self.label_names[i]: float(sums[i]) for i in np.flatnonzero(present)}
+
+
+def _parse_dates(values):
+    try:
+        return np.array(values, dtype='datetime64[D]')
+    except ValueError:
+        dates = np.empty(len(values), dtype='datetime64[D]')
+        for i, value in enumerate(values):
+            try:
+                dates[i] = np.datetime64(value, 'D')
+            except (ValueError, TypeError):
+                dates[i] = np.datetime64('NaT')
+        return dates
+
+
+def _parse_amounts(values):
+    try:
+        return np.array(values, dtype=np.float64)
+    except (ValueError, TypeError):
+        amounts = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                amounts[i] = float(value)
+            except (ValueError, TypeError):
+                amounts[i] = np.nan
+        return amounts
+
+
+def columns_from_records(records):
+    """Build columns from transaction documents"""
+    dates = []
+    amounts = []
+    types = []
+    labels = []
+    label_codes = {}
+
+    for trans in records:
+        type_name = trans.get('type')
+        dates.append(trans.get('dateEntered') or 'NaT')
+        amounts.append(trans.get('amount', 0))
+        types.append(TYPE_CODES.get(type_name, UNKNOWN_TYPE))
+        label = trans.get(LABEL_FIELDS.get(type_name, 'category'), 'Unknown')
+        labels.append(label_codes.setdefault(label, len(label_codes)))
+
+    return TransactionColumns(
+        dates=_parse_dates(dates),
+        amounts=_parse_amounts(amounts),
+        types=np.array(types, dtype=np.int8),
+        labels=np.array(labels, dtype=np.int32),
+        label_names=list(label_codes)
+    )
+
+
+def load_columns(transactions):
+    """Read a transaction collection once into columns"""
+    projection = {'_id': False, 'dateEntered': True, 'amount': True, 'type': True,
+                  'category': True, 'source': True, 'lender': True}
+    return columns_from_records(transactions.find({}, projection))
+
+
+def get_columns(db, username: str, data_version):
+    """Columns for a user, reused until their data_version changes"""
+    snapshot = transaction_snapshot(db, username, data_version)
+    columns = snapshot.get('columns')
+    if columns is None:
+        columns = columns_from_records(snapshot['records'])
+        snapshot['columns'] = columns
+    return columns
+
+
+def period_totals(columns: TransactionColumns, start, end):
+    """Income total and per-category debit totals for start <= date < end"""
+    in_period = columns.mask(start, end)
+    total_income = columns.total(in_period & (columns.types == TYPE_CODES['income']))
+    expenses = columns.group_totals(in_period & (columns.types == TYPE_CODES['debit']))
+    return total_income, expenses
+
+
+def exceeded_categories(expenses: dict, limits: dict, total_income: float):
+    """Categories whose spending is over their limit (percent of income)"""
+    if total_income <= 0:
+        return []
+    names = [c for c in expenses if c in limits]
+    if not names:
+        return []
+    spent = np.array([expenses[c] for c in names], dtype=np.float64)
+    allowed = np.array([limits[c] for c in names], dtype=np.float64) / 100 * total_income
+    return [names[i] for i in np.flatnonzero(spent > allowed)]
@@ -0,0 +1,189 @@
+"""
+Cash-flow forecasts for /get-forecast.
+
+Each user has a small model per series (total income, and spending per
+debit category): an exponentially weighted daily level plus an
+exponentially weighted value per weekday, stored in forecastModels. Both
+are plain EWMAs, so folding in N new days is one matrix product over a
+(series x N) block of daily totals, not a per-day loop.
+
+The model only ever folds completed days. A forecast request folds the
+days since the model's `as_of` (normally none or one) and projects from
+the stored state. When the model is current and the user's data_version
+hasn't moved since it was saved, that is one document read and a few
+small array operations; the transaction columns are only loaded to fold
+or to re-check the model. If rows dated before `as_of` changed since they
+were folded (a backdated import or a migration), the fingerprint of the
+folded rows no longer matches and the model is rebuilt from the last
+HISTORY_DAYS.
+"""
+
+from datetime import date, datetime, timedelta
+import numpy as np
+from columnar import TYPE_CODES, get_columns, exceeded_categories
+
+FORECAST_MODELS = "forecastModels"
+FORECAST_HORIZONS = (30, 90)
+DEFAULT_HORIZON = 30
+HISTORY_DAYS = 365
+
+LEVEL_HALF_LIFE_DAYS = 60
+WEEKDAY_HALF_LIFE_WEEKS = 8
+ALPHA = 1 - 0.5 ** (1 / LEVEL_HALF_LIFE_DAYS)
+BETA = 1 - 0.5 ** (1 / WEEKDAY_HALF_LIFE_WEEKS)
+
+_INCOME = TYPE_CODES['income']
+_DEBIT = TYPE_CODES['debit']
+
+
+def _day(value) -> np.datetime64:
+    return np.datetime64(value, 'D')
+
+
+def _weekday_slots(first_day: np.datetime64, days: int):
+    # Slot by days since the epoch, so slots line up across incremental folds
+    return (first_day.astype(np.int64) + np.arange(days)) % 7
+
+
+def _empty_model(start: np.datetime64):
+    return {
+        'as_of': str(start),
+        'days': 0,
+        'weekday_days': [0] * 7,
+        'categories': [],
+        'level': [0.0],
+        'weekday': [[0.0] * 7],
+        'folded': {'count': 0, 'total': 0.0}
+    }
+
+
+def _folded_rows(columns, end):
+    rows = columns.mask(None, end) & ((columns.types == _INCOME) | (columns.types == _DEBIT))
+    return {'count': int(rows.sum()), 'total': round(columns.total(rows), 2)}
+
+
+def _daily_totals(columns, model, start: np.datetime64, end: np.datetime64):
+    """(series x day) totals for start <= date < end; new categories are appended to the model"""
+    rows = columns.mask(start, end) & ((columns.types == _INCOME) | (columns.types == _DEBIT))
+    categories = model['categories']
+    known = {name: i for i, name in enumerate(categories)}
+    for code in np.unique(columns.labels[rows & (columns.types == _DEBIT)]):
+        name = columns.label_names[code]
+        if name not in known:
+            known[name] = len(categories)
+            categories.append(name)
+
+    # series 0 is income, 1.. are debit categories in model order
+    label_series = np.array([known.get(name, -1) + 1 for name in columns.label_names], dtype=np.int64)
+    series = np.where(columns.types[rows] == _INCOME, 0, label_series[columns.labels[rows]])
+    days = int((end - start).astype(np.int64))
+    day_index = (columns.dates[rows] - start).astype(np.int64)
+    keys = series * days + day_index
+    return np.bincount(keys, weights=columns.amounts[rows], minlength=(len(categories) + 1) * days).reshape(-1, days)
+
+
+def _fold(model, totals, start: np.datetime64):
+    """Fold a (series x day) block of totals into the model's EWMAs"""
+    series, days = totals.shape
+    level = np.zeros(series)
+    weekday = np.zeros((series, 7))
+    level[:len(model['level'])] = model['level']
+    weekday[:len(model['weekday'])] = model['weekday']
+
+    position = np.arange(days)
+    level = level * (1 - ALPHA) ** days + totals @ (ALPHA * (1 - ALPHA) ** (days - 1 - position))
+
+    slots = np.eye(7)[_weekday_slots(start, days)]
+    seen = slots.sum(axis=0)
+    later = (days - 1 - position) // 7  # later days in this block with the same weekday
+    weekday = weekday * (1 - BETA) ** seen + (totals * (BETA * (1 - BETA) ** later)) @ slots
+
+    model['level'] = level.tolist()
+    model['weekday'] = weekday.tolist()
+    model['days'] += days
+    model['weekday_days'] = (np.array(model['weekday_days']) + seen).astype(int).tolist()
+
+
+def refresh_model(db, username: str, data_version, today: date = None):
+    """The user's model with every completed day folded in, or None without history"""
+    today = _day(today or date.today())
+    models = db.get_collection(FORECAST_MODELS)
+    model = models.find_one({'_id': username})
+    if model and model['as_of'] == str(today) and model.get('data_version') == data_version:
+        return model  # nothing to fold and no rows written since it was checked
+
+    columns = get_columns(db, username, data_version)
+    if not len(columns) or not columns.mask(None, today).any():
+        return None
+    if model and _folded_rows(columns, _day(model['as_of'])) != model['folded']:
+        model = None  # rows before as_of changed; refold the history
+    if model is None:
+        first = columns.dates[columns.mask(None, today)].min()
+        model = _empty_model(max(first, today - HISTORY_DAYS))
+
+    as_of = _day(model['as_of'])
+    if as_of < today:
+        _fold(model, _daily_totals(columns, model, as_of, today), as_of)
+        model['as_of'] = str(today)
+        model['folded'] = _folded_rows(columns, today)
+    model['data_version'] = data_version
+    model['updated_at'] = datetime.now()
+    models.replace_one({'_id': username}, dict(model, _id=username), upsert=True)
+    return model
+
+
+def project(model, start: date, horizon: int):
+    """Expected (income, {category: spend}) for `horizon` days from `start`"""
+    level = np.array(model['level'])
+    weekday = np.array(model['weekday'])
+    weekday_days = np.array(model['weekday_days'])
+
+    # EWMAs start from zero; dividing by the weight folded so far removes that bias
+    level = level / (1 - (1 - ALPHA) ** model['days']) if model['days'] else level
+    seen = weekday_days > 0
+    weekday = np.divide(weekday, 1 - (1 - BETA) ** weekday_days, out=np.zeros_like(weekday), where=seen)
+    if seen.any():
+        offsets = np.where(seen, weekday - weekday[:, seen].mean(axis=1, keepdims=True), 0.0)
+    else:
+        offsets = weekday
+
+    occurrences = np.bincount(_weekday_slots(_day(start), horizon), minlength=7)
+    expected = np.clip(level[:, None] + offsets, 0, None) @ occurrences
+    return float(expected[0]), dict(zip(model['categories'], expected[1:].tolist()))
+
+
+def forecast_report(db, username: str, data_version, limits: dict, horizon: int, today: date = None):
+    """The /get-forecast body, or None when the user has no history to project from"""
+    today = today or date.today()
+    model = refresh_model(db, username, data_version, today)
+    if model is None:
+        return None
+
+    start = today + timedelta(days=1)
+    income, expenses = project(model, start, horizon)
+    expenses = {c: round(v, 2) for c, v in sorted(expenses.items(), key=lambda x: x[1], reverse=True) if round(v, 2) > 0}
+    total_expense = sum(expenses.values())
+
+    breaches = [{
+        'category': category,
+        'projected': expenses[category],
+        'allowed': round(limits[category] / 100 * income, 2),
+        'limit_percent': limits[category]
+    } for category in exceeded_categories(expenses, limits, income)]
+
+    return {
+        'horizon_days': horizon,
+        'start_date': str(start),
+        'end_date': str(start + timedelta(days=horizon - 1)),
+        'income': {'total': round(income, 2)},
+        'expenses': {
+            'by_category': expenses,
+            'total': round(total_expense, 2)
+        },
+        'net_balance': round(income - total_expense, 2),
+        'limit_breaches': breaches,
+        'model': {
+            'as_of': str(_day(model['as_of']) - 1),
+            'history_days': model['days']
+        }
+    }
@@ -0,0 +1,239 @@
+"""
+In-memory friendship graph for friend suggestions.
+
+Usernames are mapped to dense int ids once; each user's friends are kept
+as a compact int32 array and interest vectors as rows of one unit-length
+float32 matrix. Suggestions are friends-of-friends ranked by mutual-friend
+count and interest cosine similarity, so a lookup touches only the user's
+two-hop neighbourhood and never queries MongoDB.
+
+The graph is built from userInfo in a background thread at startup and
+updated incrementally by the routes that change friendships, interests or
+users. Each update is also published on the cache invalidation channel, so
+other processes apply it right away. The rebuild every REBUILD_INTERVAL
+seconds only repairs what a lost message left behind. Rebuilds and
+suggestion scoring run outside the lock, which is held only to swap in a
+new graph or to copy the few rows a query reads.
+"""
+
+import threading
+import time
+from array import array
+import numpy as np
+from cache import publish, subscribe
+
+REBUILD_INTERVAL = 15 * 60  # seconds
+CHANNEL_KIND = "friend_graph"
+MUTUAL_WEIGHT = 0.7
+SIMILARITY_WEIGHT = 0.3
+BUILD_BATCH = 10000
+
+
+class FriendGraph:
+    """Adjacency index over all users, safe to share between request threads"""
+
+    def __init__(self, topics: list):
+        self.topics = list(topics)
+        self._topic_index = {topic: i for i, topic in enumerate(self.topics)}
+        self._lock = threading.RLock()
+        self._ids = {}
+        self._names = []
+        self._adjacency = []
+        self._interests = np.zeros((0, len(self.topics)), dtype=np.float32)
+        self._pending = None  # updates made while a rebuild is running
+        self.ready = False
+        self.built_at = None
+
+    # ---- building ----
+
+    def _vector(self, user_interest: dict):
+        vector = np.zeros(len(self.topics), dtype=np.float32)
+        for topic, value in (user_interest or {}).items():
+            i = self._topic_index.get(topic)
+            if i is not None:
+                vector[i] = value
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def build(self, users):
+        """Rebuild from the userInfo collection and swap it in"""
+        with self._lock:
+            self._pending = []
+
+        ids = {}
+        names = []
+        friend_names = []
+        vectors = []
+        cursor = users.find({}, {'_id': False, 'username': True, 'friends': True, 'user_interest': True},
+                            batch_size=BUILD_BATCH)
+        for user in cursor:
+            ids[user['username']] = len(names)
+            names.append(user['username'])
+            friend_names.append(user.get('friends', []))
+            vectors.append(self._vector(user.get('user_interest')))
+
+        adjacency = [
+            array('i', sorted(ids[f] for f in friends if f in ids))
+            for friends in friend_names
+        ]
+        interests = np.vstack(vectors) if vectors else np.zeros((0, len(self.topics)), dtype=np.float32)
+
+        with self._lock:
+            self._ids, self._names, self._adjacency, self._interests = ids, names, adjacency, interests
+            pending, self._pending = self._pending, None
+            for update, args in pending:
+                update(*args)
+            self.ready = True
+            self.built_at = time.time()
+
+    def _deferred(self, update, args):
+        """Remember an update to replay once the running rebuild swaps in"""
+        if self._pending is not None:
+            self._pending.append((update, args))
+
+    # ---- incremental updates ----
+
+    def _id_for(self, username: str):
+        user_id = self._ids.get(username)
+        if user_id is None:
+            user_id = self._ids[username] = len(self._names)
+            self._names.append(username)
+            self._adjacency.append(array('i'))
+            if user_id >= len(self._interests):
+                # Grow geometrically so signups don't copy the matrix each time
+                grown = np.zeros((max(2 * len(self._interests), 1024), len(self.topics)), dtype=np.float32)
+                grown[:len(self._interests)] = self._interests
+                self._interests = grown
+        return user_id
+
+    def _update(self, update: str, *args, broadcast: bool = True):
+        """Apply an update here and, unless it came from there, in every other process"""
+        with self._lock:
+            apply = getattr(self, '_' + update)
+            self._deferred(apply, args)
+            apply(*args)
+        if broadcast:
+            publish(CHANNEL_KIND, update=update, args=list(args))
+
+    def apply_message(self, message: dict):
+        """Apply an update published by another process"""
+        if message.get('update') in ('add_user', 'set_interests', 'add_friendship', 'remove_friendship'):
+            self._update(message['update'], *message['args'], broadcast=False)
+
+    def add_user(self, username: str, user_interest: dict = None):
+        self._update('add_user', username, user_interest)
+
+    def set_interests(self, username: str, user_interest: dict):
+        self._update('set_interests', username, user_interest)
+
+    def add_friendship(self, first: str, second: str):
+        self._update('add_friendship', first, second)
+
+    def remove_friendship(self, first: str, second: str):
+        self._update('remove_friendship', first, second)
+
+    def _add_user(self, username: str, user_interest: dict = None):
+        user_id = self._id_for(username)  # may grow the matrix
+        self._interests[user_id] = self._vector(user_interest)
+
+    def _set_interests(self, username: str, user_interest: dict):
+        user_id = self._id_for(username)  # may grow the matrix
+        self._interests[user_id] = self._vector(user_interest)
+
+    def _add_friendship(self, first: str, second: str):
+        a, b = self._id_for(first), self._id_for(second)
+        for user_id, friend_id in ((a, b), (b, a)):
+            friends = self._adjacency[user_id]
+            if friend_id not in friends:
+                friends.append(friend_id)
+
+    def _remove_friendship(self, first: str, second: str):
+        a, b = self._ids.get(first), self._ids.get(second)
+        if a is None or b is None:
+            return
+        for user_id, friend_id in ((a, b), (b, a)):
+            friends = self._adjacency[user_id]
+            if friend_id in friends:
+                friends.remove(friend_id)
+
+    # ---- queries ----
+
+    def suggestions(self, username: str, limit: int = 10, exclude=()):
+        """
+        Up to `limit` users to befriend, best first.
+
+        Friends-of-friends are scored by MUTUAL_WEIGHT * (mutual friends,
+        scaled to the best candidate) + SIMILARITY_WEIGHT * interest cosine.
+        Users without friends get the most similar users overall instead,
+        and users with neither friends nor interests get no suggestions.
+        """
+        with self._lock:
+            user_id = self._ids.get(username)
+            if user_id is None:
+                return []
+            # Copies of what this query reads; updates may change the originals
+            friends = np.array(self._adjacency[user_id], dtype=np.int32)
+            two_hop = [np.array(self._adjacency[f], dtype=np.int32) for f in friends]
+            skip = set(friends.tolist())
+            skip.add(user_id)
+            skip.update(self._ids[name] for name in exclude if name in self._ids)
+            vector = self._interests[user_id].copy()
+            # Rebuilds and growth replace these objects rather than resizing them
+            names = self._names
+            interests = self._interests[:len(names)]
+
+        if len(friends):
+            candidates, mutual = np.unique(np.concatenate(two_hop), return_counts=True)
+            keep = ~np.isin(candidates, list(skip))
+            candidates, mutual = candidates[keep], mutual[keep]
+        else:
+            candidates = mutual = np.zeros(0, dtype=np.int64)
+
+        if len(candidates):
+            similarity = interests[candidates] @ vector
+            score = MUTUAL_WEIGHT * mutual / mutual.max() + SIMILARITY_WEIGHT * similarity
+        elif not vector.any():
+            return []  # nothing to rank by; don't scan every user for zero scores
+        else:
+            # Cold start: nearest interests across everyone
+            similarity = interests @ vector
+            similarity[list(skip)] = -np.inf
+            candidates = np.arange(len(similarity))
+            mutual = np.zeros(len(similarity), dtype=np.int64)
+            score = similarity
+
+        top = min(limit, len(candidates))
+        if top == 0:
+            return []
+        best = np.argpartition(-score, top - 1)[:top]
+        best = best[np.argsort(-score[best], kind='stable')]
+        return [{
+            'username': names[candidates[i]],
+            'mutual_friends': int(mutual[i]),
+            'interest_similarity': round(float(similarity[i]), 4),
+            'score': round(float(score[i]), 4)
+        } for i in best if np.isfinite(score[i])]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'users': len(self._names),
+                'friendships': sum(len(friends) for friends in self._adjacency) // 2,
+                'built_at': self.built_at
+            }
+
+
+def start_friend_graph(graph: FriendGraph, users, interval: float = REBUILD_INTERVAL):
+    """Build the graph in the background, then rebuild it every `interval` seconds"""
+    subscribe(CHANNEL_KIND, graph.apply_message)
+
+    def rebuild_forever():
+        while True:
+            try:
+                graph.build(users)
+            except Exception as e:
+                print(f"⚠️  Friend graph rebuild failed: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=rebuild_forever, name="friend-graph", daemon=True).start()
@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from llm_gateway import generate, generate_async
 finance_topics = [
         "Corporate finance and capital structure",
         "Investment analysis and portfolio management",
@@ -44,16 +45,19 @@ class FinancialSuggestion(BaseModel):
     praise: str
     suggestions: str
 
-def get_gemini_suggestions(user_data):
-    """
-    Generate financial suggestions based on user transaction data.
-    
-    Args:
-        user_data: List of transaction records from MongoDB
-    
-    Returns:
-        dict with 'praise' and 'suggestions' keys
-    """
+SUGGESTIONS_MODEL = "gemini-2.5-flash"
+SUGGESTIONS_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": FinancialSuggestion,
+}
+KEYWORDS_MODEL = "gemini-2.5-flash-lite"
+KEYWORDS_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": list[str],
+}
+
+def suggestions_prompt(user_data):
+    """Prompt asking for praise and suggestions on a list of transaction records"""
     # Calculate date one month ago
     one_month_ago = datetime.now() - timedelta(days=30)
     
@@ -86,31 +90,60 @@ Please analyze these records and provide:
 
 Focus more on the recent transactions (from the last month). Be encouraging and positive in your tone.
 Keep your response between 150-200 words total."""
+    return prompt
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": FinancialSuggestion,
-        },
-    )
-    
-    return response.parsed
-
-def get_keywords(post):
+def get_gemini_suggestions(user_data):
     """
-    Generate financial keywords for content filtering.
+    Generate financial suggestions based on user transaction data.
     
     Args:
-        post: Post content (string)
+        user_data: List of transaction records from MongoDB
     
     Returns:
-        List of keywords selected from predefined finance topics
+        FinancialSuggestion with 'praise' and 'suggestions'
     """
+    return generate(client, SUGGESTIONS_MODEL, suggestions_prompt(user_data), SUGGESTIONS_CONFIG,
+                    fallback=lambda: heuristic_suggestions(user_data))
+
+async def get_gemini_suggestions_async(user_data):
+    """get_gemini_suggestions without blocking the event loop"""
+    return await generate_async(client, SUGGESTIONS_MODEL, suggestions_prompt(user_data), SUGGESTIONS_CONFIG,
+                                fallback=lambda: heuristic_suggestions(user_data))
+
+def heuristic_suggestions(user_data):
+    """Rule-based praise and suggestions, used when Gemini is unavailable"""
+    one_month_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    income = 0.0
+    spending = {}
+    for transaction in user_data:
+        if str(transaction.get('dateEntered', '')) < one_month_ago:
+            continue
+        try:
+            amount = float(transaction.get('amount', 0))
+        except (TypeError, ValueError):
+            continue
+        if transaction.get('type') == 'income':
+            income += amount
+        elif transaction.get('type') == 'debit':
+            category = transaction.get('category', 'Other')
+            spending[category] = spending.get(category, 0) + amount
     
-    # Predefined financial topics
+    spent = sum(spending.values())
+    if income > spent:
+        praise = f"You spent {spent:.2f} of the {income:.2f} you earned in the last 30 days. Keep it up!"
+    else:
+        praise = "You're keeping track of your transactions, which is the first step to managing money well."
     
+    if spending:
+        top = max(spending, key=spending.get)
+        suggestions = (f"Your biggest expense in the last 30 days was {top} ({spending[top]:.2f}). "
+                       f"Set a monthly limit for it and move what you save into an emergency fund.")
+    else:
+        suggestions = "Record your expenses as they happen so you can see where your money goes."
+    return FinancialSuggestion(praise=praise, suggestions=suggestions)
+
+def keywords_prompt(post):
+    """Prompt asking which of finance_topics a community post is about"""
     prompt = f"""Analyze this financial community post and identify which of the following financial topics are most relevant to it.
 
 Post content:
@@ -120,14 +153,34 @@ Available financial topics (choose ONLY from these):
 {', '.join(finance_topics)}
 
 Select 3-7 topics from the list above that best match the content of this post. Return ONLY topics from the provided list that are relevant. If the post covers multiple areas, include all relevant topics."""
+    return prompt
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash-lite",
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": list[str],
-        },
-    )
+def get_keywords(post):
+    """
+    Generate financial keywords for content filtering.
     
-    return response.parsed
\ No newline at end of file
+    Args:
+        post: Post content (string)
+    
+    Returns:
+        List of keywords selected from predefined finance topics
+    """
+    return generate(client, KEYWORDS_MODEL, keywords_prompt(post), KEYWORDS_CONFIG,
+                    fallback=lambda: heuristic_keywords(post))
+
+async def get_keywords_async(post):
+    """get_keywords without blocking the event loop"""
+    return await generate_async(client, KEYWORDS_MODEL, keywords_prompt(post), KEYWORDS_CONFIG,
+                                fallback=lambda: heuristic_keywords(post))
+
+def heuristic_keywords(post):
+    """finance_topics sharing the most words with the post, used when Gemini is unavailable"""
+    words = {word.strip('.,!?:;()"\'').lower() for word in post.split()}
+    scores = {}
+    for topic in finance_topics:
+        topic_words = {w.strip('()').lower() for w in topic.split() if len(w) > 3}
+        overlap = len(words & topic_words)
+        if overlap:
+            scores[topic] = overlap
+    keywords = sorted(scores, key=scores.get, reverse=True)[:7]
+    return keywords or ["Personal finance and financial literacy"]
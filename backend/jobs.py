@@ -0,0 +1,110 @@
+"""
+Resumable batch jobs over a collection, split into _id ranges.
+
+A job's ranges are planned once with $bucketAuto and stored in the
+jobCheckpoints collection; each range records the last _id it finished,
+so workers can process ranges in parallel and an interrupted job resumes
+where it stopped. Used by streak_scheduler.py and the migrations runner.
+
+Past the last planned boundary there is one open-ended tail range, which
+covers documents inserted after planning. It is reopened every time the
+plan is reused, so a resumed job also reaches documents inserted since the
+interrupted run.
+"""
+
+from datetime import datetime
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+CHECKPOINTS = "jobCheckpoints"
+CHUNKS = 64  # _id ranges per job
+
+
+def plan_chunks(db, job: str, collection: str = "userInfo", chunks: int = CHUNKS):
+    """Split a collection into _id ranges for a job, or reuse the ranges of an interrupted run"""
+    checkpoints = db.get_collection(CHECKPOINTS)
+
+    planned = list(checkpoints.find({'job': job}))
+    if planned:
+        return _reopen_tail(checkpoints, job, planned)
+
+    buckets = list(db.get_collection(collection).aggregate([
+        {'$bucketAuto': {'groupBy': '$_id', 'buckets': chunks}}
+    ]))
+    planned = [{
+        '_id': f"{job}:{i}",
+        'job': job,
+        'min_id': bucket['_id']['min'],
+        'max_id': bucket['_id']['max'],
+        'last_chunk': i == len(buckets) - 1,  # $bucketAuto's last max is inclusive
+        'last_id': None,
+        'processed': 0,
+        'done': False
+    } for i, bucket in enumerate(buckets)]
+
+    if planned:
+        planned.append(_tail_chunk(job, planned))
+        try:
+            checkpoints.insert_many(planned, ordered=False)
+        except BulkWriteError:
+            # Another process planned the same job first
+            return list(checkpoints.find({'job': job}))
+    return planned
+
+
+def _tail_chunk(job: str, planned: list):
+    """The open-ended range past the last planned boundary"""
+    boundary = next(c['max_id'] for c in planned if c['last_chunk'])
+    return {
+        '_id': f"{job}:tail",
+        'job': job,
+        'min_id': boundary,
+        'max_id': None,  # no upper bound
+        'last_chunk': False,
+        'last_id': boundary,  # the boundary itself belongs to the last bucket
+        'processed': 0,
+        'done': False
+    }
+
+
+def _reopen_tail(checkpoints, job: str, planned: list):
+    """Make the tail range of a reused plan pending again; plans made before tails get one"""
+    tail = next((c for c in planned if c['max_id'] is None), None)
+    if tail is None:
+        tail = _tail_chunk(job, planned)
+        try:
+            checkpoints.insert_one(tail)
+        except DuplicateKeyError:
+            tail = checkpoints.find_one({'_id': tail['_id']})  # added concurrently
+        planned.append(tail)
+
+    if tail['done']:
+        # It continues from its last checkpoint, not from the boundary
+        checkpoints.update_one({'_id': tail['_id']}, {'$set': {'done': False}})
+        tail['done'] = False
+    return planned
+
+
+def remaining_range(chunk: dict):
+    """_id condition for the part of a range that hasn't been processed yet"""
+    id_range = {}
+    if chunk['max_id'] is not None:
+        id_range['$lte' if chunk['last_chunk'] else '$lt'] = chunk['max_id']
+    if chunk['last_id'] is None:
+        id_range['$gte'] = chunk['min_id']
+    else:
+        id_range['$gt'] = chunk['last_id']
+    return id_range
+
+
+def save_checkpoint(db, chunk_id: str, last_id, processed: int, **counters):
+    db.get_collection(CHECKPOINTS).update_one(
+        {'_id': chunk_id},
+        {'$set': dict(counters, last_id=last_id, processed=processed)}
+    )
+
+
+def finish_chunk(db, chunk_id: str, processed: int, **counters):
+    db.get_collection(CHECKPOINTS).update_one(
+        {'_id': chunk_id},
+        {'$set': dict(counters, processed=processed, done=True, finished_at=datetime.now())}
+    )
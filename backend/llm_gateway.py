@@ -0,0 +1,223 @@
+"""
+Guarded calls to Gemini.
+
+Every generate_content call goes through `generate`/`generate_async`,
+which add, per model:
+
+- a cap on in-flight calls (FINWISE_LLM_MAX_IN_FLIGHT per process). A call
+  that can't get a slot within FINWISE_LLM_QUEUE_WAIT_MS is not sent
+- a deadline per call (DEADLINES), enforced by the HTTP client
+- a circuit breaker. After FAILURE_THRESHOLD consecutive failures or
+  timeouts the model is skipped for COOLDOWN seconds, then a single trial
+  call decides whether it closes again
+
+When a call isn't sent or fails, the caller gets the last good answer to
+the same prompt if one is cached, else the heuristic passed as `fallback`.
+Without either the error is raised as LLMUnavailable. Latency, outcomes,
+token usage, fallbacks and breaker state are exported per model on /metrics.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import httpx
+from cache import llm_fallback_cache as fallback_cache
+from metrics import Counter, Gauge, Histogram, register, span
+
+MAX_IN_FLIGHT = int(os.getenv("FINWISE_LLM_MAX_IN_FLIGHT", "8"))
+QUEUE_WAIT = float(os.getenv("FINWISE_LLM_QUEUE_WAIT_MS", "250")) / 1000
+FAILURE_THRESHOLD = 5  # consecutive failures that open the circuit
+COOLDOWN = 30  # seconds before a trial call
+
+# model -> seconds a call may take
+DEADLINES = {
+    "gemini-2.5-flash": 20,
+    "gemini-2.5-flash-lite": 8
+}
+DEFAULT_DEADLINE = 15
+
+LLM_SECONDS = register(Histogram(
+    "finwise_llm_seconds", "Gemini call latency by outcome (ok, error, timeout)", ('model', 'outcome')))
+LLM_TOKENS = register(Counter(
+    "finwise_llm_tokens_total", "Gemini tokens used (prompt, output)", ('model', 'kind')))
+LLM_IN_FLIGHT = register(Gauge(
+    "finwise_llm_in_flight", "Gemini calls in flight", ('model',)))
+LLM_FALLBACKS = register(Counter(
+    "finwise_llm_fallbacks_total", "Calls answered without Gemini, by reason and source", ('model', 'reason', 'source')))
+LLM_CIRCUIT_OPEN = register(Gauge(
+    "finwise_llm_circuit_open", "1 while a model's circuit is open", ('model',)))
+
+class LLMUnavailable(Exception):
+    """Gemini wasn't reachable and there was nothing to fall back on"""
+
+
+class CircuitBreaker:
+    """Closed until FAILURE_THRESHOLD failures in a row, then open for COOLDOWN seconds"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.trial and time.monotonic() - self.opened_at >= COOLDOWN:
+                self.trial = True  # half-open: let one call through
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.trial or self.failures >= FAILURE_THRESHOLD:
+                    self.opened_at = time.monotonic()
+            self.trial = False
+            LLM_CIRCUIT_OPEN.set(0 if self.opened_at is None else 1, self.model)
+
+
+class _Model:
+    """Per-model limits and state"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.deadline = DEADLINES.get(name, DEFAULT_DEADLINE)
+        self.breaker = CircuitBreaker(name)
+        self.slots = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+        self.async_slots = None  # created inside the event loop
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            LLM_IN_FLIGHT.set(self.in_flight, self.name)
+
+    def finished(self):
+        with self._lock:
+            self.in_flight -= 1
+            LLM_IN_FLIGHT.set(self.in_flight, self.name)
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _model(name: str):
+    with _models_lock:
+        if name not in _models:
+            _models[name] = _Model(name)
+        return _models[name]
+
+
+def _cache_key(model: str, contents: str):
+    return model, hashlib.sha256(contents.encode('utf-8')).hexdigest()
+
+
+def _with_deadline(config: dict, deadline: float):
+    return dict(config, http_options={'timeout': int(deadline * 1000)})  # milliseconds
+
+
+def _record_usage(model: str, response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        LLM_TOKENS.inc(model, 'prompt', amount=usage.prompt_token_count or 0)
+        LLM_TOKENS.inc(model, 'output', amount=usage.candidates_token_count or 0)
+
+
+def _outcome(error: Exception):
+    return 'timeout' if isinstance(error, (httpx.TimeoutException, TimeoutError)) else 'error'
+
+
+def _finish(model: _Model, key, started: float, response=None, error: Exception = None):
+    """Record a sent call; returns (parsed answer or None, outcome)"""
+    parsed = getattr(response, 'parsed', None) if error is None else None
+    outcome = 'ok' if parsed is not None else (_outcome(error) if error else 'error')
+    LLM_SECONDS.observe(time.perf_counter() - started, model.name, outcome)
+    model.breaker.record(outcome == 'ok')
+    if response is not None:
+        _record_usage(model.name, response)
+    if parsed is not None:
+        fallback_cache.put(key, parsed)
+    return parsed, outcome
+
+
+def _degraded(model: _Model, key, reason: str, fallback, error: Exception = None):
+    """The cached answer for this prompt, else the heuristic, else LLMUnavailable"""
+    cached = fallback_cache.get(key)
+    if cached is not None:
+        LLM_FALLBACKS.inc(model.name, reason, 'cache')
+        return cached
+    if fallback is not None:
+        LLM_FALLBACKS.inc(model.name, reason, 'heuristic')
+        return fallback()
+    raise LLMUnavailable(f"{model.name} is unavailable ({reason})") from error
+
+
+def generate(client, model_name: str, contents: str, config: dict, fallback=None):
+    """client.models.generate_content(...).parsed, guarded; see the module docstring"""
+    model = _model(model_name)
+    key = _cache_key(model_name, contents)
+    if not model.slots.acquire(timeout=QUEUE_WAIT):
+        return _degraded(model, key, 'busy', fallback)
+    try:
+        if not model.breaker.allow():
+            return _degraded(model, key, 'circuit_open', fallback)
+        model.started()
+        started = time.perf_counter()
+        try:
+            with span('llm'):
+                response = client.models.generate_content(
+                    model=model_name, contents=contents, config=_with_deadline(config, model.deadline))
+        except Exception as e:
+            _, outcome = _finish(model, key, started, error=e)
+            return _degraded(model, key, outcome, fallback, e)
+        finally:
+            model.finished()
+    finally:
+        model.slots.release()
+
+    parsed, outcome = _finish(model, key, started, response)
+    return parsed if parsed is not None else _degraded(model, key, outcome, fallback)
+
+
+async def generate_async(client, model_name: str, contents: str, config: dict, fallback=None):
+    """generate over client.aio, without blocking the event loop"""
+    model = _model(model_name)
+    key = _cache_key(model_name, contents)
+    if model.async_slots is None:
+        model.async_slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+    try:
+        await asyncio.wait_for(model.async_slots.acquire(), QUEUE_WAIT)
+    except TimeoutError:
+        return _degraded(model, key, 'busy', fallback)
+    try:
+        if not model.breaker.allow():
+            return _degraded(model, key, 'circuit_open', fallback)
+        model.started()
+        started = time.perf_counter()
+        try:
+            with span('llm'):
+                response = await asyncio.wait_for(client.aio.models.generate_content(
+                    model=model_name, contents=contents, config=_with_deadline(config, model.deadline)),
+                    model.deadline)
+        except Exception as e:
+            _, outcome = _finish(model, key, started, error=e)
+            return _degraded(model, key, outcome, fallback, e)
+        finally:
+            model.finished()
+    finally:
+        model.async_slots.release()
+
+    parsed, outcome = _finish(model, key, started, response)
+    return parsed if parsed is not None else _degraded(model, key, outcome, fallback)
+
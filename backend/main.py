@@ -1,17 +1,55 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g
 from flask_cors import CORS
-import bcrypt
+from metrics import instrument_app, render as render_metrics  # before the MongoClient exists
+from profiling import install_profiler, admin_authorized, list_traces, get_trace
 from mongodb import getdatabase
+from passwords import start_password_pool, checkpw, hash_password, needs_rehash, PasswordQueueFull
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
-from datetime import datetime, timedelta
+from datetime import datetime
 from gemini import get_gemini_suggestions, get_keywords, finance_topics
 from newsapi import get_finance_tips_articles, get_top_finance_headlines, format_articles_for_display
 from translation import translate_text, translate_batch, get_supported_languages
+from achievements import pop_unseen_achievements, achievement_progress
+from points import expense_limit_exceeded, apply_transaction_effects, recent_awards, mark_awards_seen
+from analytics import analytics_report
+from forecast import forecast_report, FORECAST_HORIZONS, DEFAULT_HORIZON
+from recurring import (PERIODS as RECURRING_PERIODS, RECURRING_TYPES, suggest_schedules, list_schedules,
+                       save_schedule, delete_schedule, advance)
+from columnar import LABEL_FIELDS
+from transactions import for_user
+from user_repository import UserRepository
+from social import FRIEND_REQUESTS, pending_counts, friend_profiles
+from friend_graph import FriendGraph, start_friend_graph
+from split_expenses import (SPLIT_EXPENSES, EXPENSE_FILTERS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                            start_split_recovery, create_split_expense as create_split,
+                            settle, balance_summary, list_expenses)
+from settlement import settlement_plan, bulk_settle, forbidden_expenses
+from schema import bootstrap
+from cache import (transaction_snapshot, user_written, transactions_written,
+                   start_invalidation_channel, cache_stats)
+from streaks import (get_month_start, weekly_due, monthly_due, evaluate_weekly_streak,
+                     evaluate_monthly_streak)
 
 app = Flask(__name__)
 CORS(app)
+instrument_app(app)
+install_profiler(app)
 
+start_password_pool()  # before any thread is started
 db = getdatabase("finwise")
+for finding in bootstrap(db):
+    print(f"⚠️  Schema: {finding}")
+start_split_recovery(db)
+start_invalidation_channel(db)
+users_repo = UserRepository(db.get_collection("userInfo"))
+friend_graph = FriendGraph(finance_topics)
+start_friend_graph(friend_graph, db.get_collection("userInfo"))
+
+
+@app.errorhandler(PasswordQueueFull)
+def password_queue_full(e):
+    return jsonify({'error': 'Server is busy, please try again shortly'}), 503, {'Retry-After': '1'}
 
 # Rank definitions
 RANKS = [
@@ -24,32 +62,6 @@ RANKS = [
     {"name": "FinWise Legend", "icon": "🌟", "min_points": 8000, "max_points": float('inf')}
 ]
 
-# Achievement definitions
-ACHIEVEMENTS = {
-    "streak_star": {
-        "id": "streak_star",
-        "name": "Streak Star",
-        "icon": "🔥",
-        "description": "Maintain spending limits for 4 consecutive weeks",
-        "requirement": 4
-    },
-    "budget_boss": {
-        "id": "budget_boss",
-        "name": "Budget Boss",
-        "icon": "💰",
-        "description": "Earn 100-point monthly bonus for 3 consecutive months",
-        "requirement": 3
-    },
-    "loan_legend": {
-        "id": "loan_legend",
-        "name": "Loan Legend",
-        "icon": "🏦",
-        "description": "Complete 5 timely loan repayments",
-        "requirement": 5
-    }
-}
-
-
 def get_user_rank(points: int):
     """Calculate user's rank based on points"""
     for rank in RANKS:
@@ -71,321 +83,67 @@ def get_next_rank(points: int):
     return None  # Already at max rank
 
 
-def check_achievement_unlock(username: str):
-    """Check if user has unlocked any new achievements"""
-    a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
-    
-    if not user:
-        return []
-    
-    current_achievements = user.get('achievements', [])
-    newly_unlocked = []
-    
-    # Check Streak Star (4 consecutive weeks)
-    if 'streak_star' not in current_achievements:
-        consecutive_weeks = user.get('consecutive_weekly_streaks', 0)
-        if consecutive_weeks >= ACHIEVEMENTS['streak_star']['requirement']:
-            current_achievements.append('streak_star')
-            newly_unlocked.append(ACHIEVEMENTS['streak_star'])
-    
-    # Check Budget Boss (3 consecutive months with 100-point bonus)
-    if 'budget_boss' not in current_achievements:
-        consecutive_months = user.get('consecutive_monthly_bonuses', 0)
-        if consecutive_months >= ACHIEVEMENTS['budget_boss']['requirement']:
-            current_achievements.append('budget_boss')
-            newly_unlocked.append(ACHIEVEMENTS['budget_boss'])
-    
-    # Check Loan Legend (5 timely loan repayments)
-    if 'loan_legend' not in current_achievements:
-        timely_repayments = user.get('timely_loan_repayments', 0)
-        if timely_repayments >= ACHIEVEMENTS['loan_legend']['requirement']:
-            current_achievements.append('loan_legend')
-            newly_unlocked.append(ACHIEVEMENTS['loan_legend'])
-    
-    # Update achievements in database
-    if newly_unlocked:
-        a.update_one(
-            {'username': username},
-            {'$set': {'achievements': current_achievements}}
-        )
-    
-    return newly_unlocked
-
-
-def award_points(username: str, points: int):
-    """Award points to a user"""
-    a = db.get_collection("userInfo")
-    a.update_one(
-        {'username': username},
-        {'$inc': {'reward_points': points}}
-    )
-
-
-def award_transaction_points(username: str):
-    """Award points for transactions - only first 5 transactions get 10 points"""
-    a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
-    
-    if not user:
-        return 0
-    
-    transaction_count = user.get('transaction_count', 0)
-    
-    # Increment transaction count
-    new_count = transaction_count + 1
-    a.update_one(
-        {'username': username},
-        {'$inc': {'transaction_count': 1}}
-    )
-    
-    # Award 10 points only for first 5 transactions
-    if transaction_count < 5:
-        award_points(username, 10)
-        # Generate bonus_id for this transaction award
-        import time
-        bonus_id = f"transaction_{new_count}_{int(time.time())}"
-        a.update_one(
-            {'username': username},
-            {'$set': {'last_transaction_bonus_id': bonus_id}}
-        )
-        return 10, bonus_id
-    
-    return 0, None
-
-
-def check_expense_limit_penalty(username: str, category: str, amount: float):
-    """Check if expense exceeds limit and return -30 penalty if limit exceeded"""
-    a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
-    
-    if not user:
-        return 0
-    
-    # Get user's limits
-    limits = user.get('limit', {})
-    if category not in limits:
-        return 0
-    
-    # Get all transactions to calculate current period income and expenses
-    b = db.get_collection(username)
-    transactions = list(b.find({}))
-    
-    # Calculate total income for current month
-    current_month_start = get_month_start()
-    total_income = 0
-    category_expenses = 0
-    
-    for trans in transactions:
-        try:
-            trans_date = datetime.strptime(trans.get('dateEntered', ''), '%Y-%m-%d').date()
-            if trans_date >= current_month_start:
-                if trans.get('type') == 'income':
-                    total_income += trans.get('amount', 0)
-                elif trans.get('type') == 'debit' and trans.get('category') == category:
-                    category_expenses += trans.get('amount', 0)
-        except:
-            continue
-    
-    # Check if limit exceeded with this new expense
-    if total_income > 0:
-        limit_percentage = limits[category]
-        limit_amount = (limit_percentage / 100) * total_income
-        
-        if category_expenses > limit_amount:
-            # Apply -30 penalty
-            award_points(username, -30)
-            return -30
+def request_user(username: str, *views):
+    """
+    userInfo fields of the given views for the current request.
     
-    return 0
-
-
-def get_week_start(date_obj=None):
-    """Get the Monday of the current week"""
-    if date_obj is None:
-        date_obj = datetime.now().date()
-    days_since_monday = date_obj.weekday()
-    monday = date_obj - timedelta(days=days_since_monday)
-    return monday
+    Loaded at most once per request and shared with every helper; asking
+    for more views later fetches only the missing fields into the same
+    document. Helpers that write the user apply the same change to it.
+    """
+    loaded = g.setdefault('loaded_users', {})
+    entry = loaded.get(username)
+    if entry is None:
+        user = users_repo.get(username, *views)
+        if user is None:
+            return None
+        entry = loaded[username] = {'user': user, 'views': set(views)}
+    else:
+        missing = [view for view in views if view not in entry['views']]
+        if missing:
+            entry['user'].update(users_repo.get(username, *missing) or {})
+            entry['views'].update(missing)
+    return entry['user']
 
 
-def get_month_start(date_obj=None):
-    """Get the first day of the current month"""
-    if date_obj is None:
-        date_obj = datetime.now().date()
-    return date_obj.replace(day=1)
+def valid_key(name) -> bool:
+    """Whether a map key can be written with a dotted field path"""
+    return isinstance(name, str) and bool(name) and '.' not in name and not name.startswith('$')
 
 
-def check_weekly_streak(username: str):
-    """Check if user maintained limits for the past week and award points"""
-    a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
-    
-    if not user:
+def check_weekly_streak(user: dict):
+    """Evaluate the weekly streak unless it was already evaluated this week"""
+    if not user or not weekly_due(user):
         return False
     
-    current_monday = get_week_start()
-    last_check = user.get('last_weekly_check')
-    
-    # Only check once per week
-    if last_check:
-        try:
-            last_check_date = datetime.strptime(last_check, '%Y-%m-%d').date()
-            if last_check_date >= current_monday:
-                return False
-        except:
-            pass
-    
-    # Get transactions for the past week
-    previous_monday = current_monday - timedelta(days=7)
-    b = db.get_collection(username)
-    weekly_transactions = list(b.find({}))
-    
-    # Filter transactions from previous week
-    weekly_expenses = {}
-    total_income = 0
-    
-    for trans in weekly_transactions:
-        try:
-            trans_date = datetime.strptime(trans.get('dateEntered', ''), '%Y-%m-%d').date()
-            if previous_monday <= trans_date < current_monday:
-                if trans.get('type') == 'debit':
-                    category = trans.get('category', 'Unknown')
-                    amount = float(trans.get('amount', 0))
-                    weekly_expenses[category] = weekly_expenses.get(category, 0) + amount
-                elif trans.get('type') == 'income':
-                    total_income += float(trans.get('amount', 0))
-        except:
-            continue
-    
-    # Check if any limit was exceeded
-    limits = user.get('limit', {})
-    limit_exceeded = False
-    
-    for category, spent in weekly_expenses.items():
-        if category in limits and total_income > 0:
-            limit_percentage = limits[category]
-            limit_amount = (limit_percentage / 100) * total_income
-            if spent > limit_amount:
-                limit_exceeded = True
-                break
-    
-    # Award points if no limit exceeded
-    if not limit_exceeded and (weekly_expenses or total_income > 0):
-        award_points(username, 25)
-        
-        # Increment consecutive weekly streaks for Streak Star achievement
-        consecutive_weeks = user.get('consecutive_weekly_streaks', 0) + 1
-        a.update_one(
-            {'username': username},
-            {'$set': {
-                'last_weekly_check': str(current_monday),
-                'consecutive_weekly_streaks': consecutive_weeks
-            }}
-        )
-        return True
-    
-    # Reset consecutive weeks if limit exceeded
-    a.update_one(
-        {'username': username},
-        {'$set': {
-            'last_weekly_check': str(current_monday),
-            'consecutive_weekly_streaks': 0
-        }}
-    )
-    return False
+    # The scheduler hasn't reached this user yet
+    return evaluate_weekly_streak(db, user['username'], shared=user)
 
 
-def check_monthly_streak(username: str):
-    """Check monthly limit compliance and award points"""
-    a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
-    
-    if not user:
+def check_monthly_streak(user: dict):
+    """Evaluate the monthly streak unless it was already evaluated this month"""
+    if not user or not monthly_due(user):
         return 0
     
-    current_month_start = get_month_start()
-    last_check = user.get('last_monthly_check')
-    
-    # Only check once per month
-    if last_check:
-        try:
-            last_check_date = datetime.strptime(last_check, '%Y-%m-%d').date()
-            if last_check_date >= current_month_start:
-                return 0
-        except:
-            pass
-    
-    # Get the previous month's date range
-    previous_month_end = current_month_start - timedelta(days=1)
-    previous_month_start = previous_month_end.replace(day=1)
-    
-    # Get transactions for the previous month
-    b = db.get_collection(username)
-    monthly_transactions = list(b.find({}))
-    
-    monthly_expenses = {}
-    total_income = 0
-    
-    for trans in monthly_transactions:
-        try:
-            trans_date = datetime.strptime(trans.get('dateEntered', ''), '%Y-%m-%d').date()
-            if previous_month_start <= trans_date <= previous_month_end:
-                if trans.get('type') == 'debit':
-                    category = trans.get('category', 'Unknown')
-                    amount = float(trans.get('amount', 0))
-                    monthly_expenses[category] = monthly_expenses.get(category, 0) + amount
-                elif trans.get('type') == 'income':
-                    total_income += float(trans.get('amount', 0))
-        except:
-            continue
-    
-    # Check how many limits were exceeded
-    limits = user.get('limit', {})
-    total_limits = len(limits)
-    exceeded_count = 0
-    
-    if total_income > 0:
-        for category, spent in monthly_expenses.items():
-            if category in limits:
-                limit_percentage = limits[category]
-                limit_amount = (limit_percentage / 100) * total_income
-                if spent > limit_amount:
-                    exceeded_count += 1
-    
-    # Calculate points: 100 * (totalLimits - n) / totalLimits
-    if total_limits > 0:
-        points = int(100 * (total_limits - exceeded_count) / total_limits)
-        award_points(username, points)
-        
-        # Track consecutive months with 100-point bonus for Budget Boss achievement
-        if points == 100:
-            consecutive_months = user.get('consecutive_monthly_bonuses', 0) + 1
-        else:
-            consecutive_months = 0
-        
-        a.update_one(
-            {'username': username},
-            {'$set': {
-                'last_monthly_check': str(current_month_start),
-                'consecutive_monthly_bonuses': consecutive_months
-            }}
-        )
-        return points
-    
-    return 0
+    # The scheduler hasn't reached this user yet
+    return evaluate_monthly_streak(db, user['username'], shared=user)
 
 
 def authenticate_user(identifier: str, password: str):
-    a = db.get_collection("userInfo")
-    user = a.find_one({"username": identifier}) or a.find_one({"email": identifier})
+    user = users_repo.get_account(identifier)
     if not user:
         return None
     stored = user.get("password")
     if stored is None:
         return None
     try:
-        if bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8')):
+        if checkpw(password.encode('utf-8'), stored.encode('utf-8')):
+            if needs_rehash(stored):
+                # The bcrypt cost changed since this hash was made
+                db.get_collection("userInfo").update_one(
+                    {'username': user['username']}, {'$set': {'password': hash_password(password)}}
+                )
+                user_written(user['username'])
             user_out = {k: v for k, v in user.items() if k != 'password' and k != '_id'}
             return user_out
     except ValueError:
@@ -394,105 +152,12 @@ def authenticate_user(identifier: str, password: str):
 
 @app.route("/add-user", methods=["POST"])
 def add_user():
-    try:
-        mySchema = {
-            "$jsonSchema": {
-            "bsonType": "object",
-            "required": ["name", "username", "email", "password", "age"],
-            "properties": {
-                "name": {
-                "bsonType": "string",
-                "description": "must be a string and is required"
-                },
-                "username": {
-                "bsonType": "string",
-                "description": "must be a string and is required"
-                },
-                "email": {
-                "bsonType": "string",
-                "pattern": "^[^@\\s]+@[^@\\s]+\\.[^@\\s]+$",
-                "description": "must be a valid email and is required"
-                },
-                "password": {
-                "bsonType": "string",
-                "minLength": 6,
-                "description": "must be a string and is required"
-                },
-                "age": {
-                "bsonType": "int",
-                "minimum": 0,
-                "maximum": 130,
-                "description": "must be an integer between 0 and 130 and is required"
-                },
-                "user_interest": {
-                "bsonType": "object",
-                "description": "object containing user interests with numeric values"
-                },
-                "limit": {
-                "bsonType": "object",
-                "description": "object containing category spending limits as percentages"
-                },
-                "reward_points": {
-                "bsonType": "int",
-                "minimum": 0,
-                "description": "total reward points earned by the user"
-                },
-                "last_weekly_check": {
-                "bsonType": "string",
-                "description": "date of last weekly streak check (Monday)"
-                },
-                "last_monthly_check": {
-                "bsonType": "string",
-                "description": "date of last monthly streak check"
-                },
-                "transaction_count": {
-                "bsonType": "int",
-                "minimum": 0,
-                "description": "total number of transactions (income/expense/loan) added by user"
-                },
-                "last_bonus_id": {
-                "bsonType": "string",
-                "description": "unique ID of last awarded bonus to prevent duplicate celebrations"
-                },
-                "achievements": {
-                "bsonType": "array",
-                "description": "list of unlocked achievement IDs"
-                },
-                "achievement_progress": {
-                "bsonType": "object",
-                "description": "tracks progress towards achievements"
-                },
-                "consecutive_monthly_bonuses": {
-                "bsonType": "int",
-                "minimum": 0,
-                "description": "count of consecutive months with 100-point bonus (for Budget Boss)"
-                },
-                "consecutive_weekly_streaks": {
-                "bsonType": "int",
-                "minimum": 0,
-                "description": "count of consecutive weekly streaks (for Streak Star)"
-                },
-                "timely_loan_repayments": {
-                "bsonType": "int",
-                "minimum": 0,
-                "description": "count of timely loan repayments (for Loan Legend)"
-                }
-            }
-            }
-        }
-        a = db.create_collection("userInfo", validator = mySchema)
-        a.create_index("username", unique = True)
-        a.create_index("name", unique = True)
-        a.create_index("age", unique = False)
-        a.create_index("email", unique = True)
-        a.create_index("password", unique = False)
-    except Exception as e:
-        a = db.get_collection("userInfo")
+    a = db.get_collection("userInfo")
 
     try:
         req = request.get_json()
         raw_pw = req.get('password', '')
-        hashed = bcrypt.hashpw(raw_pw.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed = hash_password(raw_pw)
         user_interest = {topic: 0 for topic in finance_topics}
         
         # Default category limits (in percentages)
@@ -531,7 +196,7 @@ def add_user():
             "consecutive_weekly_streaks": 0,
             "timely_loan_repayments": 0
         })
-        db.create_collection(req['username'])
+        friend_graph.add_user(req['username'], user_interest)
         return jsonify({'msg': "user inserted"})
 
     except DuplicateKeyError:
@@ -542,18 +207,15 @@ def add_transaction():
     req = request.get_json()
     username = req['username']
     a = db.get_collection("userInfo")
-    if len(list(a.find({'username':username}))) != 0:
+    user = request_user(username, 'auth', 'limits', 'rewards')
+    if user:
         pw = req['password']
-        user = list(a.find({'username':username}))[0]
-        if bcrypt.checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
-            b = db.get_collection(username)
+        if checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
+            b = for_user(db, username)
             date = str(datetime.now().date())
             amount = req['amount']
             category = req['category']
             
-            # Get transaction count BEFORE any operations
-            transaction_count = user.get('transaction_count', 0)
-            
             # Insert transaction
             b.insert_one({
                 "dateEntered": date,
@@ -561,41 +223,14 @@ def add_transaction():
                 "type": "debit",
                 "category": category
             })
+            transactions_written(username)
             
-            # Increment transaction count first
-            a.update_one(
-                {'username': username},
-                {'$inc': {'transaction_count': 1}}
-            )
-            
-            # Always check if expense exceeds limit
-            penalty = check_expense_limit_penalty(username, category, amount)
-            
-            points_awarded = 0
-            bonus_id = None
-            
-            if penalty < 0:
-                # Apply penalty whenever limit is exceeded
-                points_awarded = penalty
-                import time
-                bonus_id = f"penalty_{transaction_count + 1}_{int(time.time())}"
-                a.update_one(
-                    {'username': username},
-                    {'$set': {'last_transaction_bonus_id': bonus_id}}
-                )
-            elif transaction_count < 5:
-                # Award +10 points only for first 5 transactions
-                award_points(username, 10)
-                points_awarded = 10
-                import time
-                bonus_id = f"transaction_{transaction_count + 1}_{int(time.time())}"
-                a.update_one(
-                    {'username': username},
-                    {'$set': {'last_transaction_bonus_id': bonus_id}}
-                )
+            # Always check if expense exceeds limit; a penalty replaces the transaction bonus
+            penalty = expense_limit_exceeded(b, user.get('limit', {}), category, get_month_start())
+            points_awarded, bonus_id = apply_transaction_effects(a, user, penalty=penalty)
             
             # Check weekly streak
-            check_weekly_streak(username)
+            check_weekly_streak(user)
             return jsonify({'msg': "Transaction added successfully", 'points_awarded': points_awarded})
         else:
             return jsonify({'error': "Password entered is incorrect"})
@@ -607,45 +242,26 @@ def add_income():
     req = request.get_json()
     username = req['username']
     a = db.get_collection("userInfo")
-    if len(list(a.find({'username':username}))) != 0:
+    user = request_user(username, 'auth', 'rewards')
+    if user:
         pw = req['password']
-        user = list(a.find({'username':username}))[0]
-        if bcrypt.checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
-            b = db.get_collection(username)
+        if checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
+            b = for_user(db, username)
             date = str(datetime.now().date())
             
-            # Get transaction count BEFORE any operations
-            transaction_count = user.get('transaction_count', 0)
-            
             b.insert_one({
                 "dateEntered": date,
                 "amount": req['amount'],
                 "type": "income",
                 "source": req['source']
             })
-            
-            # Increment transaction count
-            a.update_one(
-                {'username': username},
-                {'$inc': {'transaction_count': 1}}
-            )
+            transactions_written(username)
             
             # Award points for income (only first 5 transactions)
-            points_awarded = 0
-            bonus_id = None
-            
-            if transaction_count < 5:
-                award_points(username, 10)
-                points_awarded = 10
-                import time
-                bonus_id = f"transaction_{transaction_count + 1}_{int(time.time())}"
-                a.update_one(
-                    {'username': username},
-                    {'$set': {'last_transaction_bonus_id': bonus_id}}
-                )
+            points_awarded, bonus_id = apply_transaction_effects(a, user)
             
             # Check weekly streak
-            check_weekly_streak(username)
+            check_weekly_streak(user)
             return jsonify({'msg': "Income added successfully", 'points_awarded': points_awarded})
         else:
             return jsonify({'error': "Password entered is incorrect"})
@@ -655,42 +271,23 @@ def add_loan_taken():
     req = request.get_json()
     username = req['username']
     a = db.get_collection("userInfo")
-    if len(list(a.find({'username':username}))) != 0:
+    user = request_user(username, 'auth', 'rewards')
+    if user:
         pw = req['password']
-        user = list(a.find({'username':username}))[0]
-        if bcrypt.checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
-            b = db.get_collection(username)
+        if checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
+            b = for_user(db, username)
             date = str(datetime.now().date())
             
-            # Get transaction count BEFORE any operations
-            transaction_count = user.get('transaction_count', 0)
-            
             b.insert_one({
                 "dateEntered": date,
                 "amount": req['amount'],
                 "type": "loanTaken",
                 "lender": req['lender']
             })
-            
-            # Increment transaction count
-            a.update_one(
-                {'username': username},
-                {'$inc': {'transaction_count': 1}}
-            )
+            transactions_written(username)
             
             # Award points for loan (only first 5 transactions)
-            points_awarded = 0
-            bonus_id = None
-            
-            if transaction_count < 5:
-                award_points(username, 10)
-                points_awarded = 10
-                import time
-                bonus_id = f"transaction_{transaction_count + 1}_{int(time.time())}"
-                a.update_one(
-                    {'username': username},
-                    {'$set': {'last_transaction_bonus_id': bonus_id}}
-                )
+            points_awarded, bonus_id = apply_transaction_effects(a, user)
             
             return jsonify({'msg': "Loan taken added successfully", 'points_awarded': points_awarded})
         else:
@@ -701,16 +298,13 @@ def add_loan_repayment():
     req = request.get_json()
     username = req['username']
     a = db.get_collection("userInfo")
-    if len(list(a.find({'username':username}))) != 0:
+    user = request_user(username, 'auth', 'rewards')
+    if user:
         pw = req['password']
-        user = list(a.find({'username':username}))[0]
-        if bcrypt.checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
-            b = db.get_collection(username)
+        if checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
+            b = for_user(db, username)
             date = str(datetime.now().date())
             
-            # Get transaction count BEFORE any operations
-            transaction_count = user.get('transaction_count', 0)
-            
             b.insert_one({
                 "dateEntered": date,
                 "amount": req['amount'],
@@ -718,38 +312,14 @@ def add_loan_repayment():
                 "lender": req['lender'],
                 "is_paid_on_time": req['is_paid_on_time']
             })
+            transactions_written(username)
             
-            # Increment transaction count
-            a.update_one(
-                {'username': username},
-                {'$inc': {'transaction_count': 1}}
+            # Award points: transaction points (first 5 only) + 50 bonus for timely payment,
+            # which also counts towards the Loan Legend achievement
+            points_awarded, bonus_id = apply_transaction_effects(
+                a, user, timely_repayment=bool(req.get('is_paid_on_time', False))
             )
             
-            # Award points: transaction points (first 5 only) + 50 bonus for timely payment
-            points_awarded = 0
-            bonus_id = None
-            
-            if transaction_count < 5:
-                award_points(username, 10)
-                points_awarded = 10
-                import time
-                bonus_id = f"transaction_{transaction_count + 1}_{int(time.time())}"
-                a.update_one(
-                    {'username': username},
-                    {'$set': {'last_transaction_bonus_id': bonus_id}}
-                )
-            
-            # Always award 50 points for timely payment
-            if req.get('is_paid_on_time', False):
-                award_points(username, 50)
-                points_awarded += 50
-                
-                # Track timely repayments for Loan Legend achievement
-                a.update_one(
-                    {'username': username},
-                    {'$inc': {'timely_loan_repayments': 1}}
-                )
-            
             return jsonify({'msg': "Loan repayment added successfully", 'points_awarded': points_awarded})
         else:
             return jsonify({'error': "Password entered is incorrect"})
@@ -759,13 +329,11 @@ def add_loan_repayment():
 def get_user_data():
     req = request.get_json()
     username = req['username']
-    a = db.get_collection("userInfo")
-    if len(list(a.find({'username':username}))) != 0:
+    user = request_user(username, 'auth', 'history')
+    if user:
         pw = req['password']
-        user = list(a.find({'username':username}))[0]
-        if bcrypt.checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
-            b = db.get_collection(username)
-            data = list(b.find({}, {'_id': False}))
+        if checkpw(pw.encode('utf-8'), user['password'].encode('utf-8')):
+            data = transaction_snapshot(db, username, user.get('data_version'))['records']
             return jsonify(data)
 
         else:
@@ -795,16 +363,15 @@ def gemini_suggestions():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'history')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    b = db.get_collection(username)
-    data = list(b.find({}, {'_id': False}))
+    data = transaction_snapshot(db, username, user.get('data_version'))['records']
     
     if not data:
         return jsonify({'error': 'No transaction data available for analysis'}), 404
@@ -897,12 +464,12 @@ def add_post():
     content = content.replace('\\n', '\n')
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     try:
@@ -970,12 +537,12 @@ def get_user_limits():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'limits')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     limits = user.get('limit', {})
@@ -992,20 +559,25 @@ def update_user_limits():
     if not username or not password or not new_limits:
         return jsonify({'error': 'username, password, and limits are required'}), 400
     
+    if not isinstance(new_limits, dict) or not all(valid_key(category) for category in new_limits):
+        return jsonify({'error': 'limits must map category names to percentages'}), 400
+    
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     try:
+        # One field per category, so concurrent edits of other categories survive
         a.update_one(
             {'username': username},
-            {'$set': {'limit': new_limits}}
+            {'$set': {f'limit.{category}': value for category, value in new_limits.items()}}
         )
+        user_written(username)
         return jsonify({'msg': 'Limits updated successfully'}), 200
     except Exception as e:
         return jsonify({'error': f'Failed to update limits: {str(e)}'}), 500
@@ -1040,21 +612,26 @@ def handle_interaction():
     post_keywords = post.get('keywords', [])
     
     user_info = db.get_collection("userInfo")
-    user = user_info.find_one({'username': username})
+    topics = [topic for topic in set(post_keywords) if topic in finance_topics]
+    
+    if topics:
+        # $inc per topic: concurrent interactions add up instead of overwriting each other
+        user = user_info.find_one_and_update(
+            {'username': username},
+            {'$inc': {f'user_interest.{topic}': weight for topic in topics}},
+            projection={'_id': False, 'user_interest': True},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        user = user_info.find_one({'username': username}, {'_id': False, 'user_interest': True})
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
     user_interest = user.get('user_interest', {})
-    
-    for topic in post_keywords:
-        if topic in user_interest:
-            user_interest[topic] += weight
-    
-    user_info.update_one(
-        {'username': username},
-        {'$set': {'user_interest': user_interest}}
-    )
+    if topics:
+        user_written(username)
+    friend_graph.set_interests(username, user_interest)
     
     return jsonify({
         'msg': 'Interaction handled successfully',
@@ -1073,6 +650,9 @@ def add_category():
     if not username or not password or not category_name:
         return jsonify({'error': 'username, password, and category_name are required'}), 400
     
+    if not valid_key(category_name):
+        return jsonify({'error': "category_name can't contain '.' or start with '$'"}), 400
+    
     try:
         limit_percentage = float(limit_percentage)
         if limit_percentage < 0 or limit_percentage > 100:
@@ -1081,26 +661,27 @@ def add_category():
         return jsonify({'error': 'limit_percentage must be a valid number'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    limits = user.get('limit', {})
-    
-    if category_name in limits:
-        return jsonify({'error': 'Category already exists'}), 400
-    
-    limits[category_name] = limit_percentage
-    
+    field = f'limit.{category_name}'
     try:
-        a.update_one(
-            {'username': username},
-            {'$set': {'limit': limits}}
+        # The existence check and the write are one operation on the stored map
+        updated = a.find_one_and_update(
+            {'username': username, field: {'$exists': False}},
+            {'$set': {field: limit_percentage}},
+            projection={'_id': False, 'limit': True},
+            return_document=ReturnDocument.AFTER
         )
+        if not updated:
+            return jsonify({'error': 'Category already exists'}), 400
+        limits = updated['limit']
+        user_written(username)
         return jsonify({
             'msg': 'Category added successfully',
             'category': category_name,
@@ -1121,27 +702,30 @@ def delete_category():
     if not username or not password or not category_name:
         return jsonify({'error': 'username, password, and category_name are required'}), 400
     
+    if not valid_key(category_name):
+        return jsonify({'error': 'Category does not exist'}), 404
+    
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    limits = user.get('limit', {})
-    
-    if category_name not in limits:
-        return jsonify({'error': 'Category does not exist'}), 404
-    
-    del limits[category_name]
-    
+    field = f'limit.{category_name}'
     try:
-        a.update_one(
-            {'username': username},
-            {'$set': {'limit': limits}}
+        updated = a.find_one_and_update(
+            {'username': username, field: {'$exists': True}},
+            {'$unset': {field: ''}},
+            projection={'_id': False, 'limit': True},
+            return_document=ReturnDocument.AFTER
         )
+        if not updated:
+            return jsonify({'error': 'Category does not exist'}), 404
+        limits = updated.get('limit', {})
+        user_written(username)
         return jsonify({
             'msg': 'Category deleted successfully',
             'deleted_category': category_name,
@@ -1162,139 +746,151 @@ def get_analytics():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'history')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    # Calculate date range based on time_frame
-    from datetime import timedelta
-    end_date = datetime.now().date()
+    # Every time frame is computed and cached together until the next write
+    return jsonify(analytics_report(db, username, user.get('data_version'), time_frame)), 200
+
+
+@app.route("/get-forecast", methods=["POST"])
+def get_forecast():
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    horizon = req.get('days', DEFAULT_HORIZON)  # 30 or 90
+    
+    if not username or not password:
+        return jsonify({'error': 'username and password are required'}), 400
     
-    time_frame_days = {
-        '1week': 7,
-        '1month': 30,
-        '3months': 90,
-        '6months': 180,
-        '1year': 365
-    }
+    if type(horizon) is not int or horizon not in FORECAST_HORIZONS:
+        return jsonify({'error': f'days must be one of {", ".join(map(str, FORECAST_HORIZONS))}'}), 400
     
-    days = time_frame_days.get(time_frame, 30)
-    start_date = end_date - timedelta(days=days)
-    
-    # Fetch user transactions
-    b = db.get_collection(username)
-    all_transactions = list(b.find({}, {'_id': False}))
-    
-    # Filter transactions by date range
-    filtered_transactions = []
-    for trans in all_transactions:
-        try:
-            trans_date = datetime.strptime(trans.get('dateEntered', ''), '%Y-%m-%d').date()
-            if start_date <= trans_date <= end_date:
-                filtered_transactions.append(trans)
-        except (ValueError, AttributeError):
-            continue
-    
-    # Calculate income by source
-    income_by_source = {}
-    total_income = 0
-    
-    for trans in filtered_transactions:
-        if trans.get('type') == 'income':
-            source = trans.get('source', 'Unknown')
-            amount = float(trans.get('amount', 0))
-            
-            if source in income_by_source:
-                income_by_source[source] += amount
-            else:
-                income_by_source[source] = amount
-            
-            total_income += amount
+    user = request_user(username, 'auth', 'history', 'limits')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
     
-    # Calculate expenses by category
-    expense_by_category = {}
-    total_expense = 0
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    for trans in filtered_transactions:
-        if trans.get('type') == 'debit':
-            category = trans.get('category', 'Unknown')
-            amount = float(trans.get('amount', 0))
-            
-            if category in expense_by_category:
-                expense_by_category[category] += amount
-            else:
-                expense_by_category[category] = amount
-            
-            total_expense += amount
+    report = forecast_report(db, username, user.get('data_version'), user.get('limit', {}), horizon)
+    if report is None:
+        return jsonify({'error': 'No transaction history available for forecasting'}), 404
     
-    # Calculate loans taken
-    loans_taken = {}
-    total_loans_taken = 0
+    return jsonify(report), 200
+
+
+@app.route("/recurring-schedules", methods=["POST"])
+def recurring_schedules():
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
     
-    for trans in filtered_transactions:
-        if trans.get('type') == 'loanTaken':
-            lender = trans.get('lender', 'Unknown')
-            amount = float(trans.get('amount', 0))
-            
-            if lender in loans_taken:
-                loans_taken[lender] += amount
-            else:
-                loans_taken[lender] = amount
-            
-            total_loans_taken += amount
+    if not username or not password:
+        return jsonify({'error': 'username and password are required'}), 400
     
-    # Calculate loan repayments
-    loan_repayments = {}
-    total_loan_repayments = 0
+    user = request_user(username, 'auth', 'history')
     
-    for trans in filtered_transactions:
-        if trans.get('type') == 'loanRepayment':
-            lender = trans.get('lender', 'Unknown')
-            amount = float(trans.get('amount', 0))
-            
-            if lender in loan_repayments:
-                loan_repayments[lender] += amount
-            else:
-                loan_repayments[lender] = amount
-            
-            total_loan_repayments += amount
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
     
-    # Sort by amount (descending)
-    income_by_source = dict(sorted(income_by_source.items(), key=lambda x: x[1], reverse=True))
-    expense_by_category = dict(sorted(expense_by_category.items(), key=lambda x: x[1], reverse=True))
-    loans_taken = dict(sorted(loans_taken.items(), key=lambda x: x[1], reverse=True))
-    loan_repayments = dict(sorted(loan_repayments.items(), key=lambda x: x[1], reverse=True))
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
     
     return jsonify({
-        'time_frame': time_frame,
-        'start_date': str(start_date),
-        'end_date': str(end_date),
-        'income': {
-            'by_source': income_by_source,
-            'total': round(total_income, 2)
-        },
-        'expenses': {
-            'by_category': expense_by_category,
-            'total': round(total_expense, 2)
-        },
-        'loans': {
-            'taken': {
-                'by_lender': loans_taken,
-                'total': round(total_loans_taken, 2)
-            },
-            'repayments': {
-                'by_lender': loan_repayments,
-                'total': round(total_loan_repayments, 2)
-            }
-        },
-        'net_balance': round(total_income - total_expense - total_loan_repayments + total_loans_taken, 2)
+        'schedules': list_schedules(db, username),
+        'suggestions': suggest_schedules(db, username, user.get('data_version'))
     }), 200
 
 
+@app.route("/add-recurring", methods=["POST"])
+def add_recurring():
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    type_name = req.get('type')
+    amount = req.get('amount')
+    period = req.get('period')
+    
+    if not username or not password or not type_name or amount is None or not period:
+        return jsonify({'error': 'username, password, type, amount and period are required'}), 400
+    
+    if type_name not in RECURRING_TYPES:
+        return jsonify({'error': f'type must be one of {", ".join(RECURRING_TYPES)}'}), 400
+    
+    if period not in RECURRING_PERIODS:
+        return jsonify({'error': f'period must be one of {", ".join(RECURRING_PERIODS)}'}), 400
+    
+    label = req.get(LABEL_FIELDS[type_name])
+    if not label:
+        return jsonify({'error': f'{LABEL_FIELDS[type_name]} is required'}), 400
+    
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+        return jsonify({'error': 'amount must be a positive number'}), 400
+    
+    today = datetime.now().date()
+    try:
+        next_due = datetime.strptime(req['next_due'], '%Y-%m-%d').date() if req.get('next_due') else advance(today, period)
+    except ValueError:
+        return jsonify({'error': 'next_due must be a YYYY-MM-DD date'}), 400
+    
+    if next_due < today:
+        return jsonify({'error': 'next_due cannot be in the past'}), 400
+    
+    user = request_user(username, 'auth')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    schedule = save_schedule(db, username, type_name, label, amount, period, next_due)
+    return jsonify({
+        'msg': 'Recurring transaction scheduled',
+        'schedule_id': schedule['_id'],
+        'next_due': schedule['next_due']
+    }), 201
+
+
+@app.route("/delete-recurring", methods=["POST"])
+def delete_recurring():
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    schedule = req.get('schedule_id')
+    
+    if not username or not password or not schedule:
+        return jsonify({'error': 'username, password and schedule_id are required'}), 400
+    
+    user = request_user(username, 'auth')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    if not delete_schedule(db, username, schedule):
+        return jsonify({'error': 'Schedule not found'}), 404
+    
+    return jsonify({'msg': 'Recurring transaction removed'}), 200
+
+
+# Ledger reasons shown as bonus celebrations on the rewards widget
+CELEBRATED_AWARDS = {
+    'weekly_streak': ('weekly', '🔥 Weekly Streak Bonus!'),
+    'monthly_compliance': ('monthly', '🏅 Monthly Compliance Bonus!'),
+    'transaction_bonus': ('transaction', '💰 Transaction Bonus!')
+}
+
+
 @app.route("/get-rewards", methods=["POST"])
 def get_rewards():
     req = request.get_json()
@@ -1305,80 +901,38 @@ def get_rewards():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'rewards')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    # Check weekly and monthly streaks (will award points if applicable)
-    weekly_awarded = check_weekly_streak(username)
-    monthly_points = check_monthly_streak(username)
-    
-    # Check for newly unlocked achievements
-    newly_unlocked = check_achievement_unlock(username)
+    # Streaks are evaluated by the scheduler; only catch up users it hasn't reached
+    check_weekly_streak(user)
+    check_monthly_streak(user)
     
-    # Get updated user data
-    user = a.find_one({'username': username})
+    # Achievements are unlocked when their counters move; just surface new ones
+    newly_unlocked = pop_unseen_achievements(a, user)
     
-    # Calculate if streaks were just awarded (for animations)
+    # Awards recorded in the ledger since the user last looked (for animations)
+    awards = recent_awards(a, user, list(CELEBRATED_AWARDS))
     streak_bonuses = []
-    bonus_id = None
-    
-    # Check for streak bonuses
-    if weekly_awarded or monthly_points > 0:
-        # Generate unique bonus ID based on current checks
-        bonus_id = f"streak_{user.get('last_weekly_check', 'none')}_{user.get('last_monthly_check', 'none')}"
-        
-        if weekly_awarded:
-            streak_bonuses.append({
-                'type': 'weekly',
-                'points': 25,
-                'message': '🔥 Weekly Streak Bonus!'
-            })
-        if monthly_points > 0:
-            streak_bonuses.append({
-                'type': 'monthly',
-                'points': monthly_points,
-                'message': f'🏅 Monthly Compliance Bonus!'
-            })
-    
-    # Check for transaction bonus (if a new transaction was just added)
-    last_transaction_bonus_id = user.get('last_transaction_bonus_id')
-    if last_transaction_bonus_id:
-        # Check if this transaction bonus hasn't been shown yet
-        last_shown_transaction_bonus = user.get('last_shown_transaction_bonus_id')
-        if last_transaction_bonus_id != last_shown_transaction_bonus:
-            transaction_count = user.get('transaction_count', 0)
-            if transaction_count <= 5:  # Only show for first 5
-                bonus_id = last_transaction_bonus_id
-                streak_bonuses.append({
-                    'type': 'transaction',
-                    'points': 10,
-                    'message': f'💰 Transaction Bonus! ({transaction_count}/5)'
-                })
-                # Mark this transaction bonus as shown
-                a.update_one(
-                    {'username': username},
-                    {'$set': {'last_shown_transaction_bonus_id': last_transaction_bonus_id}}
-                )
     
-    # Check if this is a new bonus (not already shown)
-    last_bonus_id = user.get('last_bonus_id')
-    is_new_bonus = bonus_id and bonus_id != last_bonus_id
-    
-    # Update last_bonus_id if we have new bonuses (for streak bonuses only)
-    if is_new_bonus and (weekly_awarded or monthly_points > 0):
-        a.update_one(
-            {'username': username},
-            {'$set': {'last_bonus_id': bonus_id}}
-        )
+    for award in awards:
+        bonus_type, message = CELEBRATED_AWARDS[award['reason']]
+        if award['reason'] == 'transaction_bonus':
+            message = f"{message} ({award.get('transaction_count', 0)}/5)"
+        streak_bonuses.append({
+            'type': bonus_type,
+            'points': award['amount'],
+            'message': message
+        })
     
-    # For transaction bonuses, always mark as new if they exist
-    if last_transaction_bonus_id and last_transaction_bonus_id != user.get('last_shown_transaction_bonus_id'):
-        is_new_bonus = True
+    bonus_id = awards[0]['bonus_id'] if awards else None
+    is_new_bonus = bool(awards)
+    mark_awards_seen(a, user, awards)
     
     return jsonify({
         'reward_points': user.get('reward_points', 0),
@@ -1402,17 +956,17 @@ def check_streaks():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'rewards')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     # Manually trigger streak checks
-    weekly_awarded = check_weekly_streak(username)
-    monthly_points = check_monthly_streak(username)
+    weekly_awarded = check_weekly_streak(user)
+    monthly_points = check_monthly_streak(user)
     
     return jsonify({
         'msg': 'Streak checks completed',
@@ -1433,19 +987,16 @@ def get_rank_and_achievements():
         return jsonify({'error': 'Username and password required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'rewards')
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Invalid credentials'}), 401
     
-    # Check for newly unlocked achievements
-    newly_unlocked = check_achievement_unlock(username)
-    
-    # Refresh user data after achievement check
-    user = a.find_one({'username': username})
+    # Achievements are unlocked when their counters move; just surface new ones
+    newly_unlocked = pop_unseen_achievements(a, user)
     
     # Get current rank
     points = user.get('reward_points', 0)
@@ -1462,34 +1013,7 @@ def get_rank_and_achievements():
         points_to_next = next_rank['min_points'] - points
     
     # Get achievements and their progress
-    unlocked_achievements = user.get('achievements', [])
-    achievements_data = []
-    
-    for achievement_id, achievement in ACHIEVEMENTS.items():
-        is_unlocked = achievement_id in unlocked_achievements
-        progress = 0
-        current_value = 0
-        
-        if achievement_id == 'streak_star':
-            current_value = user.get('consecutive_weekly_streaks', 0)
-            progress = min(100, int((current_value / achievement['requirement']) * 100))
-        elif achievement_id == 'budget_boss':
-            current_value = user.get('consecutive_monthly_bonuses', 0)
-            progress = min(100, int((current_value / achievement['requirement']) * 100))
-        elif achievement_id == 'loan_legend':
-            current_value = user.get('timely_loan_repayments', 0)
-            progress = min(100, int((current_value / achievement['requirement']) * 100))
-        
-        achievements_data.append({
-            'id': achievement_id,
-            'name': achievement['name'],
-            'icon': achievement['icon'],
-            'description': achievement['description'],
-            'unlocked': is_unlocked,
-            'progress': progress,
-            'current': current_value,
-            'required': achievement['requirement']
-        })
+    achievements_data = achievement_progress(user)
     
     return jsonify({
         'rank': {
@@ -1646,17 +1170,16 @@ def send_friend_request():
         return jsonify({'error': 'Cannot send friend request to yourself'}), 400
     
     a = db.get_collection("userInfo")
-    sender = a.find_one({'username': sender_username})
+    sender = request_user(sender_username, 'auth', 'social')
     
     if not sender:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), sender['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), sender['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     # Check if recipient exists
-    recipient = a.find_one({'username': recipient_username})
-    if not recipient:
+    if not users_repo.exists(recipient_username):
         return jsonify({'error': 'Recipient username does not exist'}), 404
     
     # Check if already friends
@@ -1665,7 +1188,7 @@ def send_friend_request():
         return jsonify({'error': 'Already friends with this user'}), 400
     
     # Check if request already exists
-    friend_requests = db.get_collection("friendRequests")
+    friend_requests = db.get_collection(FRIEND_REQUESTS)
     existing_request = friend_requests.find_one({
         'sender': sender_username,
         'recipient': recipient_username,
@@ -1686,6 +1209,9 @@ def send_friend_request():
         })
         
         return jsonify({'msg': 'Friend request sent successfully'}), 201
+    except DuplicateKeyError:
+        # Lost a race with an identical request
+        return jsonify({'error': 'Friend request already sent'}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to send friend request: {str(e)}'}), 500
 
@@ -1701,15 +1227,15 @@ def get_friend_requests():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    friend_requests = db.get_collection("friendRequests")
+    friend_requests = db.get_collection(FRIEND_REQUESTS)
     
     # Get received requests
     received_requests = list(friend_requests.find({
@@ -1729,6 +1255,27 @@ def get_friend_requests():
     }), 200
 
 
+@app.route("/get-friend-request-counts", methods=["POST"])
+def get_friend_request_counts():
+    """Number of pending friend requests received and sent, for badges"""
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'username and password are required'}), 400
+    
+    user = request_user(username, 'auth')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    return jsonify(pending_counts(db.get_collection(FRIEND_REQUESTS), username)), 200
+
+
 @app.route("/respond-friend-request", methods=["POST"])
 def respond_friend_request():
     """Approve or decline a friend request"""
@@ -1745,15 +1292,15 @@ def respond_friend_request():
         return jsonify({'error': 'action must be "approve" or "decline"'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    friend_requests = db.get_collection("friendRequests")
+    friend_requests = db.get_collection(FRIEND_REQUESTS)
     
     # Find the friend request
     friend_request = friend_requests.find_one({
@@ -1776,6 +1323,8 @@ def respond_friend_request():
                 {'username': sender_username},
                 {'$addToSet': {'friends': username}}
             )
+            user_written(username, sender_username)
+            friend_graph.add_friendship(username, sender_username)
             
             # Update request status
             friend_requests.update_one(
@@ -1807,12 +1356,12 @@ def get_friends():
         return jsonify({'error': 'username and password are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'social')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     friends = user.get('friends', [])
@@ -1820,6 +1369,68 @@ def get_friends():
     return jsonify({'friends': friends}), 200
 
 
+@app.route("/get-friend-profiles", methods=["POST"])
+def get_friend_profiles():
+    """Get the public profile of every friend in one call"""
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'username and password are required'}), 400
+    
+    user = request_user(username, 'auth', 'social')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    profiles = friend_profiles(users_repo, user.get('friends', []), get_user_rank)
+    
+    return jsonify({'friends': profiles}), 200
+
+
+@app.route("/get-friend-suggestions", methods=["POST"])
+def get_friend_suggestions():
+    """Suggest people to befriend: friends of friends, then similar interests"""
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    limit = req.get('limit', 10)
+    
+    if not username or not password:
+        return jsonify({'error': 'username and password are required'}), 400
+    
+    try:
+        limit = max(1, min(int(limit), 50))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    user = request_user(username, 'auth')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    if not friend_graph.ready:
+        return jsonify({'error': 'Friend suggestions are warming up, try again shortly'}), 503
+    
+    # Leave out people with a pending request either way
+    friend_requests = db.get_collection(FRIEND_REQUESTS)
+    pending = [r['recipient'] for r in friend_requests.find(
+        {'sender': username, 'status': 'pending'}, {'_id': False, 'recipient': True})]
+    pending += [r['sender'] for r in friend_requests.find(
+        {'recipient': username, 'status': 'pending'}, {'_id': False, 'sender': True})]
+    
+    suggestions = friend_graph.suggestions(username, limit, exclude=pending)
+    
+    return jsonify({'suggestions': suggestions}), 200
+
+
 @app.route("/remove-friend", methods=["POST"])
 def remove_friend():
     """Remove a friend from user's friend list"""
@@ -1832,12 +1443,12 @@ def remove_friend():
         return jsonify({'error': 'username, password, and friend_username are required'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     try:
@@ -1850,6 +1461,8 @@ def remove_friend():
             {'username': friend_username},
             {'$pull': {'friends': username}}
         )
+        user_written(username, friend_username)
+        friend_graph.remove_friendship(username, friend_username)
         
         return jsonify({'msg': 'Friend removed successfully'}), 200
     except Exception as e:
@@ -1880,12 +1493,12 @@ def create_split_expense():
         return jsonify({'error': 'split_with must be a non-empty array'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth', 'social')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
     # Verify all users in split_with are friends
@@ -1894,68 +1507,21 @@ def create_split_expense():
         if friend not in user_friends:
             return jsonify({'error': f'{friend} is not in your friends list'}), 400
     
-    # Calculate split amount per person (including the creator)
-    total_people = len(split_with) + 1  # +1 for the creator
-    amount_per_person = round(amount / total_people, 2)
-    
-    # Create split balances
-    balances = {}
-    for friend in split_with:
-        balances[friend] = amount_per_person  # They owe the creator
-    
     try:
-        split_expenses = db.get_collection("splitExpenses")
-        
-        # Get next expense ID
-        last_expense = split_expenses.find_one(sort=[("expense_id", -1)])
-        next_expense_id = (last_expense.get("expense_id", 0) if last_expense else 0) + 1
-        
-        date = str(datetime.now().date())
-        
-        # Add split expense to creator's transaction history
-        creator_collection = db.get_collection(username)
-        creator_collection.insert_one({
-            "dateEntered": date,
-            "amount": amount_per_person,
-            "type": "debit",
-            "category": "Split Expense",
-            "description": f"Split: {description}" if description else "Split Expense",
-            "split_expense_id": next_expense_id
-        })
-        
-        # Add split expense to each friend's transaction history
-        for friend in split_with:
-            friend_collection = db.get_collection(friend)
-            friend_collection.insert_one({
-                "dateEntered": date,
-                "amount": amount_per_person,
-                "type": "debit",
-                "category": "Split Expense",
-                "description": f"Split: {description}" if description else "Split Expense",
-                "split_expense_id": next_expense_id,
-                "split_with": username
-            })
+        expense, committed = create_split(db, username, amount, description, split_with)
         
-        expense = {
-            'expense_id': next_expense_id,
-            'created_by': username,
-            'amount': amount,
-            'description': description,
-            'split_with': split_with,
-            'total_people': total_people,
-            'amount_per_person': amount_per_person,
-            'balances': balances,  # {username: amount_owed}
-            'settled': False,
-            'dateCreated': date,
-            'timeCreated': str(datetime.now().time())
-        }
-        
-        split_expenses.insert_one(expense)
+        if not committed:
+            # Recorded; the recovery sweeper will finish applying it
+            return jsonify({
+                'msg': 'Split expense recorded, updating participants',
+                'expense_id': expense['expense_id'],
+                'amount_per_person': expense['amount_per_person']
+            }), 202
         
         return jsonify({
             'msg': 'Split expense created successfully',
-            'expense_id': next_expense_id,
-            'amount_per_person': amount_per_person
+            'expense_id': expense['expense_id'],
+            'amount_per_person': expense['amount_per_person']
         }), 201
     except Exception as e:
         return jsonify({'error': f'Failed to create split expense: {str(e)}'}), 500
@@ -1963,51 +1529,58 @@ def create_split_expense():
 
 @app.route("/get-split-expenses", methods=["POST"])
 def get_split_expenses():
-    """Get all split expenses for a user (created by them or split with them)"""
+    """
+    Get split expenses for a user (created by them or split with them).
+    
+    Optional: status ('unsettled' by default, 'settled' or 'all'), limit,
+    and created_before/involved_before to fetch the next page of each list.
+    """
     req = request.get_json()
     username = req.get('username')
     password = req.get('password')
+    status = req.get('status', 'unsettled')
     
     if not username or not password:
         return jsonify({'error': 'username and password are required'}), 400
     
-    a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    if status not in EXPENSE_FILTERS:
+        return jsonify({'error': f'status must be one of {list(EXPENSE_FILTERS)}'}), 400
+    
+    try:
+        limit = max(1, min(int(req.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        created_before = req.get('created_before')
+        created_before = int(created_before) if created_before is not None else None
+        involved_before = req.get('involved_before')
+        involved_before = int(involved_before) if involved_before is not None else None
+    except (ValueError, TypeError):
+        return jsonify({'error': 'limit and *_before must be integers'}), 400
+    
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    split_expenses = db.get_collection("splitExpenses")
+    split_expenses = db.get_collection(SPLIT_EXPENSES)
     
     # Get expenses created by user
-    created_expenses = list(split_expenses.find({'created_by': username}, {'_id': False}))
+    created_expenses, next_created = list_expenses(
+        split_expenses, {'created_by': username}, status, created_before, limit)
     
     # Get expenses user is part of
-    involved_expenses = list(split_expenses.find({'split_with': username}, {'_id': False}))
-    
-    # Calculate summary balances
-    you_owe = {}  # {friend: total_amount_you_owe}
-    owed_to_you = {}  # {friend: total_amount_owed_to_you}
-    
-    # From expenses you created
-    for expense in created_expenses:
-        if not expense.get('settled', False):
-            for friend, amount in expense.get('balances', {}).items():
-                owed_to_you[friend] = owed_to_you.get(friend, 0) + amount
+    involved_expenses, next_involved = list_expenses(
+        split_expenses, {'split_with': username}, status, involved_before, limit)
     
-    # From expenses you're part of
-    for expense in involved_expenses:
-        if not expense.get('settled', False):
-            creator = expense.get('created_by')
-            amount = expense.get('balances', {}).get(username, 0)
-            you_owe[creator] = you_owe.get(creator, 0) + amount
+    # Summary balances across all unsettled expenses
+    you_owe, owed_to_you = balance_summary(db, username)
     
     return jsonify({
         'created_expenses': created_expenses,
         'involved_expenses': involved_expenses,
+        'next_created_before': next_created,
+        'next_involved_before': next_involved,
         'you_owe': you_owe,
         'owed_to_you': owed_to_you
     }), 200
@@ -2030,15 +1603,15 @@ def settle_expense():
         return jsonify({'error': 'expense_id must be a valid integer'}), 400
     
     a = db.get_collection("userInfo")
-    user = a.find_one({'username': username})
+    user = request_user(username, 'auth')
     
     if not user:
         return jsonify({'error': 'Username does not exist'}), 404
     
-    if not bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
         return jsonify({'error': 'Password entered is incorrect'}), 401
     
-    split_expenses = db.get_collection("splitExpenses")
+    split_expenses = db.get_collection(SPLIT_EXPENSES)
     expense = split_expenses.find_one({'expense_id': expense_id})
     
     if not expense:
@@ -2048,16 +1621,133 @@ def settle_expense():
     if expense.get('created_by') != username:
         return jsonify({'error': 'Only the expense creator can settle this expense'}), 403
     
+    if expense.get('status') == 'pending':
+        return jsonify({'error': 'Expense is still being applied, try again shortly'}), 409
+    
     try:
-        split_expenses.update_one(
-            {'expense_id': expense_id},
-            {'$set': {'settled': True, 'dateSettled': str(datetime.now().date())}}
-        )
+        settle(db, expense)
         
         return jsonify({'msg': 'Expense marked as settled'}), 200
     except Exception as e:
         return jsonify({'error': f'Failed to settle expense: {str(e)}'}), 500
 
 
+def settlement_group(user: dict, members):
+    """The caller plus the requested friends (all friends if none given), or an error message"""
+    friends = user.get('friends', [])
+    if members is None:
+        members = friends
+    if not isinstance(members, list):
+        return None, 'group must be an array of usernames'
+    for member in members:
+        if member not in friends:
+            return None, f'{member} is not in your friends list'
+    return [user['username']] + [m for m in dict.fromkeys(members) if m != user['username']], None
+
+
+@app.route("/settlement-plan", methods=["POST"])
+def get_settlement_plan():
+    """Fewest transfers that settle the caller's open split expenses within a friend group"""
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    
+    if not username or not password:
+        return jsonify({'error': 'username and password are required'}), 400
+    
+    user = request_user(username, 'auth', 'social')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    group, error = settlement_group(user, req.get('group'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    return jsonify(settlement_plan(db, group, username)), 200
+
+
+@app.route("/bulk-settle", methods=["POST"])
+def bulk_settle_expenses():
+    """Settle all expenses of a settlement plan at once, after its transfers were made"""
+    req = request.get_json()
+    username = req.get('username')
+    password = req.get('password')
+    expense_ids = req.get('expense_ids')
+    
+    if not username or not password or not expense_ids:
+        return jsonify({'error': 'username, password, and expense_ids are required'}), 400
+    
+    try:
+        expense_ids = [int(expense_id) for expense_id in expense_ids]
+    except (ValueError, TypeError):
+        return jsonify({'error': 'expense_ids must be an array of integers'}), 400
+    
+    user = request_user(username, 'auth', 'social')
+    
+    if not user:
+        return jsonify({'error': 'Username does not exist'}), 404
+    
+    if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+        return jsonify({'error': 'Password entered is incorrect'}), 401
+    
+    group, error = settlement_group(user, req.get('group'))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    forbidden = forbidden_expenses(db, group, expense_ids, username)
+    if forbidden:
+        return jsonify({
+            'error': 'Only the expense creator can settle an expense, and only within the group',
+            'expense_ids': forbidden
+        }), 403
+    
+    try:
+        settlement = bulk_settle(db, group, expense_ids, username)
+        
+        return jsonify({
+            'msg': f"Settled {len(settlement['expense_ids'])} expenses",
+            'settlement_id': settlement['settlement_id'],
+            'expense_ids': settlement['expense_ids'],
+            'transfers': settlement['transfers']
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Failed to settle expenses: {str(e)}'}), 500
+
+
+@app.route("/cache-stats", methods=["GET"])
+def get_cache_stats():
+    """Hit ratios and sizes of the in-process caches"""
+    return jsonify(cache_stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request, phase and MongoDB latency in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route("/admin/profiles", methods=["GET"])
+def get_profiles():
+    """Recent request profiles, newest first"""
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Not authorized'}), 403
+    return jsonify(list_traces()), 200
+
+
+@app.route("/admin/profiles/<int:trace_id>", methods=["GET"])
+def get_profile(trace_id):
+    """One request profile with its cProfile stats and MongoDB commands"""
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({'error': 'Not authorized'}), 403
+    trace = get_trace(trace_id)
+    if not trace:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(trace), 200
+
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
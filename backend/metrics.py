@@ -0,0 +1,219 @@
+"""
+Request latency instrumentation with a Prometheus text endpoint.
+
+Every request is timed per route, and the time spent in MongoDB, bcrypt,
+LLM calls, outbound HTTP and the translator is attributed to named phases
+with `span`. MongoDB commands are timed by a pymongo CommandListener, so
+every query is covered without touching call sites; it also counts the
+round trips each request makes. Requests slower than SLOW_REQUEST_SECONDS
+are printed with their per-phase breakdown.
+
+Metrics are kept in-process (no extra dependency) and rendered in the
+Prometheus text format by `render`, served at /metrics. With several
+gunicorn workers each worker reports its own series; scrape each worker or
+aggregate with the process label.
+
+Import this module before the first MongoClient is created: pymongo only
+attaches globally registered listeners to clients created afterwards.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+SLOW_REQUEST_SECONDS = float(os.getenv("FINWISE_SLOW_REQUEST_MS", "500")) / 1000
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, label_values, value) for label_values, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            bucket = bisect.bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                series[bucket] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        out = []
+        for label_values, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                out.append((f"{self.name}_bucket", label_values + (('le', _format(bound)),), cumulative))
+            out.append((f"{self.name}_bucket", label_values + (('le', '+Inf'),), values[-1]))
+            out.append((f"{self.name}_sum", label_values, values[-2]))
+            out.append((f"{self.name}_count", label_values, values[-1]))
+        return out
+
+
+def _format(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+REQUEST_SECONDS = Histogram(
+    "finwise_request_seconds", "Request latency by route", ('route', 'method', 'status'))
+PHASE_SECONDS = Histogram(
+    "finwise_phase_seconds", "Time spent in a phase (mongo, bcrypt, llm, http, translator)", ('phase',))
+MONGO_COMMAND_SECONDS = Histogram(
+    "finwise_mongo_command_seconds", "MongoDB command latency", ('command',))
+MONGO_COMMAND_FAILURES = Counter(
+    "finwise_mongo_command_failures_total", "Failed MongoDB commands", ('command',))
+MONGO_CALLS_PER_REQUEST = Histogram(
+    "finwise_mongo_calls_per_request", "MongoDB round trips per request", ('route',), COUNT_BUCKETS)
+SLOW_REQUESTS = Counter(
+    "finwise_slow_requests_total", "Requests slower than the slow-request threshold", ('route',))
+
+REGISTRY = [REQUEST_SECONDS, PHASE_SECONDS, MONGO_COMMAND_SECONDS, MONGO_COMMAND_FAILURES,
+            MONGO_CALLS_PER_REQUEST, SLOW_REQUESTS]
+
+
+def register(metric):
+    """Add a metric defined in another module to /metrics"""
+    REGISTRY.append(metric)
+    return metric
+
+
+def _record_phase(phase: str, seconds: float):
+    PHASE_SECONDS.observe(seconds, phase)
+    if has_request_context() and 'phases' in g:
+        g.phases[phase] = g.phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def span(phase: str):
+    """Attribute the time spent in the block to a phase"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_phase(phase, time.perf_counter() - started)
+
+
+def timed(phase: str):
+    """Decorator form of span"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command and counts round trips for the current request"""
+
+    def started(self, event):
+        if has_request_context() and 'phases' in g:
+            g.mongo_calls += 1
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.observe(seconds, event.command_name)
+        _record_phase('mongo', seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMAND_SECONDS.observe(seconds, event.command_name)
+        MONGO_COMMAND_FAILURES.inc(event.command_name)
+        _record_phase('mongo', seconds)
+
+
+monitoring.register(MongoCommandMetrics())
+
+
+def instrument_app(app):
+    """Time every request of a Flask app and log the slow ones"""
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.phases = {}
+        g.mongo_calls = 0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, route, request.method, str(response.status_code))
+        MONGO_CALLS_PER_REQUEST.observe(g.mongo_calls, route)
+
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            SLOW_REQUESTS.inc(route)
+            phases = dict(g.phases)
+            phases['other'] = max(0.0, elapsed - sum(phases.values()))
+            breakdown = ", ".join(f"{phase} {seconds * 1000:.0f}ms"
+                                  for phase, seconds in sorted(phases.items(), key=lambda p: -p[1]))
+            print(f"🐢 Slow request {request.method} {route} {response.status_code}: "
+                  f"{elapsed * 1000:.0f}ms ({breakdown}; {g.mongo_calls} mongo calls)")
+        return response
+
+
+def _escape(value: str):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, label_values, value in metric.samples():
+            labels = [f'{label}="{_escape(v)}"' for label, v in zip(metric.labels, label_values)]
+            labels += [f'{label}="{_escape(v)}"' for label, v in label_values[len(metric.labels):]]
+            label_text = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{name}{label_text} {_format(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,172 @@
+"""
+Copy per-user transaction collections into the unified transactions collection.
+
+Each user's old collection (named after their username) is copied in
+batches, in parallel across users. Rows keep their original _id, so the
+copy is idempotent: run it before deploying the unified code, then again
+afterwards to pick up anything written in between. Split expense rows,
+whose _id was only unique within one user's collection, get the username
+appended.
+
+After copying, every user is verified (row count and amount total must
+match the source) and their data_version is bumped so cached histories
+are reloaded. Old collections are only dropped with --drop-source, and
+only for users that verified. Usernames that match a collection the app
+itself uses (userInfo, transactions, pointsLedger, ...) or a system
+collection are never read as legacy collections, let alone dropped.
+
+Usage:
+    python migrate_transactions.py                 # copy + verify
+    python migrate_transactions.py --verify-only
+    python migrate_transactions.py --drop-source   # copy + verify + drop verified sources
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from mongodb import getdatabase
+from cache import CHANNEL, start_invalidation_channel, transactions_written
+from transactions import TRANSACTIONS, insert_rows
+from split_expenses import COUNTERS, REBUILD_SCRATCH
+from forecast import FORECAST_MODELS
+from migrations import VERSIONS
+from schema import INDEXES, bootstrap
+
+BATCH_SIZE = 1000
+WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+# Collections of the app itself; never a user's legacy collection
+RESERVED = set(INDEXES) | {"userInfo", "community", TRANSACTIONS, COUNTERS, REBUILD_SCRATCH,
+                           FORECAST_MODELS, VERSIONS, CHANNEL}
+
+
+def is_legacy_collection(name: str):
+    return name not in RESERVED and not name.startswith('system.')
+
+
+def migrated_id(row: dict, username: str):
+    """Split expense rows used a per-collection _id; make it unique across users"""
+    row_id = row['_id']
+    if isinstance(row_id, str) and row_id.startswith('split_') and ':' not in row_id:
+        return f"{row_id}:{username}"
+    return row_id
+
+
+def copy_user(db, username: str):
+    """Copy one user's collection in batches; returns rows inserted"""
+    inserted = 0
+    batch = []
+    for row in db.get_collection(username).find({}, batch_size=BATCH_SIZE):
+        row['_id'] = migrated_id(row, username)
+        row['username'] = username
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            inserted += insert_rows(db, batch)
+            batch = []
+    inserted += insert_rows(db, batch)
+    return inserted
+
+
+def _amount(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _target_totals(db, username: str, ids: list):
+    totals = list(db.get_collection(TRANSACTIONS).aggregate([
+        {'$match': {'username': username, '_id': {'$in': ids}}},
+        {'$group': {'_id': None, 'count': {'$sum': 1}, 'amounts': {'$push': '$amount'}}}
+    ]))
+    if not totals:
+        return 0, 0.0
+    return totals[0]['count'], sum(_amount(a) for a in totals[0]['amounts'])
+
+
+def verify_user(db, username: str):
+    """
+    True if every source row is in the unified collection, by count and amount total.
+
+    Only the migrated _ids are compared, batch by batch, so rows written
+    by the new code since the copy don't count as a mismatch.
+    """
+    source = [0, 0.0]
+    target = [0, 0.0]
+    batch = []
+    rows = db.get_collection(username).find({}, {'_id': True, 'amount': True}, batch_size=BATCH_SIZE)
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            _compare_batch(db, username, batch, source, target)
+            batch = []
+    if batch:
+        _compare_batch(db, username, batch, source, target)
+
+    source = (source[0], round(source[1], 2))
+    target = (target[0], round(target[1], 2))
+    return source == target, source, target
+
+
+def _compare_batch(db, username: str, batch: list, source: list, target: list):
+    source[0] += len(batch)
+    source[1] += sum(_amount(row.get('amount')) for row in batch)
+    count, amount = _target_totals(db, username, [migrated_id(row, username) for row in batch])
+    target[0] += count
+    target[1] += amount
+
+
+def migrate_user(db, username: str, verify_only: bool, drop_source: bool):
+    if not is_legacy_collection(username):
+        raise ValueError(f"{username} names an application collection, not a legacy one")
+    copied = 0 if verify_only else copy_user(db, username)
+    ok, source, target = verify_user(db, username)
+
+    if copied:
+        db.get_collection("userInfo").update_one({'username': username}, {'$inc': {'data_version': 1}})
+        transactions_written(username)
+
+    if ok and drop_source:
+        db.drop_collection(username)
+    return username, copied, ok, source, target
+
+
+def main(verify_only: bool, drop_source: bool, workers: int):
+    db = getdatabase("finwise")
+    bootstrap(db)
+    start_invalidation_channel(db, listen=False)
+
+    collections = set(db.list_collection_names())
+    usernames = [u['username'] for u in db.get_collection("userInfo").find({}, {'username': True})
+                 if u['username'] in collections]
+    reserved = [u for u in usernames if not is_legacy_collection(u)]
+    for username in reserved:
+        print(f"⚠️  Skipping {username}: the name belongs to an application collection")
+    usernames = [u for u in usernames if is_legacy_collection(u)]
+    print(f"🔄 {len(usernames)} per-user collections to migrate with {workers} workers")
+
+    copied_total = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda u: migrate_user(db, u, verify_only, drop_source), usernames)
+        for username, copied, ok, source, target in results:
+            copied_total += copied
+            if not ok:
+                failed.append(username)
+                print(f"❌ {username}: source {source} != migrated {target}")
+
+    print(f"✅ Copied {copied_total} rows; {len(usernames) - len(failed)}/{len(usernames)} users verified")
+    if drop_source:
+        print(f"🗑️  Dropped {len(usernames) - len(failed)} verified source collections")
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate per-user transaction collections")
+    parser.add_argument('--verify-only', action='store_true', help="only compare sources with the unified collection")
+    parser.add_argument('--drop-source', action='store_true', help="drop each user's old collection once verified")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="users migrated in parallel")
+    args = parser.parse_args()
+
+    if not main(args.verify_only, args.drop_source, args.workers):
+        raise SystemExit(1)
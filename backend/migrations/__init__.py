@@ -0,0 +1,152 @@
+"""
+Versioned, resumable data migrations.
+
+Each migration is a module in this package named mNNNN_<name>.py that
+defines:
+
+    VERSION      int, applied in ascending order
+    DESCRIPTION  one line for `status`
+    COLLECTION   collection it walks
+    QUERY        filter selecting the documents that still need it
+    PROJECTION   fields transform() reads (None for whole documents)
+    transform(doc) -> update document for that _id, or None to skip
+
+The runner splits the collection into _id ranges (jobs.py), streams each
+range in batches across a process pool and applies every batch with one
+unordered bulk_write, checkpointing after each batch. Applied versions are
+recorded in the schemaMigrations collection. Because QUERY only matches
+documents that still need the change, re-running a migration is harmless.
+
+Usage (from backend/):
+    python -m migrations status
+    python -m migrations run [--dry-run] [--to VERSION] [--workers N]
+"""
+
+import importlib
+import os
+import pkgutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pymongo import UpdateOne
+from mongodb import getdatabase
+from jobs import CHECKPOINTS, plan_chunks, remaining_range, save_checkpoint, finish_chunk
+
+VERSIONS = "schemaMigrations"
+BATCH_SIZE = 1000
+WORKERS = os.cpu_count() or 4
+DRY_RUN_SAMPLES = 3
+
+
+def load_migrations():
+    """{version: module} for every migration in this package"""
+    migrations = {}
+    for module_info in pkgutil.iter_modules(__path__):
+        if module_info.name.startswith('m') and module_info.name[1:5].isdigit():
+            module = importlib.import_module(f"{__name__}.{module_info.name}")
+            if module.VERSION in migrations:
+                raise ValueError(f"duplicate migration version {module.VERSION}")
+            migrations[module.VERSION] = module
+    return dict(sorted(migrations.items()))
+
+
+def applied_versions(db):
+    return {m['_id'] for m in db.get_collection(VERSIONS).find({'status': 'done'}, {'_id': True})}
+
+
+def run_chunk(version: int, chunk_id: str):
+    """Apply one migration to one _id range; runs in a worker process"""
+    migration = load_migrations()[version]
+    db = getdatabase("finwise")  # fresh client per process
+    chunk = db.get_collection(CHECKPOINTS).find_one({'_id': chunk_id})
+    if not chunk or chunk['done']:
+        return 0, 0
+
+    collection = db.get_collection(migration.COLLECTION)
+    query = dict(migration.QUERY, _id=remaining_range(chunk))
+    cursor = collection.find(query, migration.PROJECTION).sort('_id', 1).batch_size(BATCH_SIZE)
+
+    processed = chunk['processed']
+    modified = chunk.get('modified', 0)
+    batch = []
+    last_id = None
+    for doc in cursor:
+        last_id = doc['_id']
+        update = migration.transform(doc)
+        if update:
+            batch.append(UpdateOne({'_id': doc['_id']}, update))
+        processed += 1
+        if processed % BATCH_SIZE == 0:
+            modified += _apply(collection, batch)
+            batch = []
+            save_checkpoint(db, chunk_id, last_id, processed, modified=modified)
+
+    modified += _apply(collection, batch)
+    finish_chunk(db, chunk_id, processed, modified=modified)
+    return processed, modified
+
+
+def _apply(collection, batch):
+    if not batch:
+        return 0
+    return collection.bulk_write(batch, ordered=False).modified_count
+
+
+def dry_run(db, migration):
+    """Count the documents a migration would touch and show a few of its updates"""
+    collection = db.get_collection(migration.COLLECTION)
+    matching = collection.count_documents(migration.QUERY)
+    print(f"🔍 {migration.VERSION}: {migration.DESCRIPTION} — {matching} documents in {migration.COLLECTION}")
+    for doc in collection.find(migration.QUERY, migration.PROJECTION).limit(DRY_RUN_SAMPLES):
+        print(f"   {doc['_id']}: {migration.transform(doc)}")
+
+
+def run_migration(db, migration, workers: int = WORKERS):
+    versions = db.get_collection(VERSIONS)
+    versions.update_one(
+        {'_id': migration.VERSION},
+        {'$set': {'description': migration.DESCRIPTION, 'status': 'running'},
+         '$setOnInsert': {'started_at': datetime.now()}},
+        upsert=True
+    )
+
+    chunks = [c for c in plan_chunks(db, f"migration:{migration.VERSION}", migration.COLLECTION) if not c['done']]
+    print(f"🔄 {migration.VERSION}: {migration.DESCRIPTION} ({len(chunks)} ranges)")
+
+    processed = modified = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, migration.VERSION, c['_id']) for c in chunks]
+        for future in as_completed(futures):
+            chunk_processed, chunk_modified = future.result()
+            processed += chunk_processed
+            modified += chunk_modified
+
+    versions.update_one(
+        {'_id': migration.VERSION},
+        {'$set': {'status': 'done', 'finished_at': datetime.now()}, '$inc': {'modified': modified}}
+    )
+    print(f"✅ {migration.VERSION}: {processed} documents read, {modified} modified")
+
+
+def run(to_version: int = None, dry: bool = False, workers: int = WORKERS):
+    """Apply every pending migration up to to_version, in order"""
+    db = getdatabase("finwise")
+    done = applied_versions(db)
+    pending = [m for v, m in load_migrations().items()
+               if v not in done and (to_version is None or v <= to_version)]
+    if not pending:
+        print("✅ No pending migrations")
+
+    for migration in pending:
+        if dry:
+            dry_run(db, migration)
+        else:
+            run_migration(db, migration, workers)
+
+
+def status():
+    db = getdatabase("finwise")
+    records = {m['_id']: m for m in db.get_collection(VERSIONS).find()}
+    for version, migration in load_migrations().items():
+        record = records.get(version, {})
+        state = record.get('status', 'pending')
+        print(f"{version:>5}  {state:<8} {migration.DESCRIPTION}")
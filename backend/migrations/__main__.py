@@ -0,0 +1,16 @@
+import argparse
+from migrations import run, status, WORKERS
+
+parser = argparse.ArgumentParser(prog="python -m migrations", description="Versioned data migrations")
+commands = parser.add_subparsers(dest='command', required=True)
+commands.add_parser('status', help="list migrations and whether they were applied")
+run_parser = commands.add_parser('run', help="apply pending migrations in order")
+run_parser.add_argument('--dry-run', action='store_true', help="count and preview changes without writing")
+run_parser.add_argument('--to', type=int, help="stop after this version")
+run_parser.add_argument('--workers', type=int, default=WORKERS, help="worker processes per migration")
+args = parser.parse_args()
+
+if args.command == 'status':
+    status()
+else:
+    run(args.to, args.dry_run, args.workers)
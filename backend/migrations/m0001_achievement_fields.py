@@ -0,0 +1,23 @@
+"""Add achievement fields to users created before the achievement system (was migrate_achievements.py)"""
+
+VERSION = 1
+DESCRIPTION = "Add achievement fields to existing users"
+COLLECTION = "userInfo"
+QUERY = {'achievements': {'$exists': False}}
+PROJECTION = {'_id': True}
+
+ACHIEVEMENT_FIELDS = {
+    'achievements': [],
+    'achievement_progress': {
+        'streak_star_weeks': 0,
+        'budget_boss_months': 0,
+        'loan_legend_count': 0
+    },
+    'consecutive_monthly_bonuses': 0,
+    'consecutive_weekly_streaks': 0,
+    'timely_loan_repayments': 0
+}
+
+
+def transform(doc):
+    return {'$set': ACHIEVEMENT_FIELDS}
@@ -0,0 +1,21 @@
+"""Replace None streak/bonus markers with empty strings (was fix_users.py)"""
+
+VERSION = 2
+DESCRIPTION = "Replace None check/bonus fields with empty strings"
+COLLECTION = "userInfo"
+QUERY = {
+    '$or': [
+        {'last_weekly_check': None},
+        {'last_monthly_check': None},
+        {'last_bonus_id': None}
+    ]
+}
+PROJECTION = {'last_weekly_check': True, 'last_monthly_check': True, 'last_bonus_id': True}
+
+FIELDS = ['last_weekly_check', 'last_monthly_check', 'last_bonus_id']
+
+
+def transform(doc):
+    # Only blank the fields that are None, so a real check date is never lost
+    blank = {field: '' for field in FIELDS if doc.get(field) is None}
+    return {'$set': blank} if blank else None
@@ -0,0 +1,34 @@
+"""Give the oldest accounts every field later code expects (was fix_users_migration.py)"""
+
+VERSION = 3
+DESCRIPTION = "Add missing rewards, achievement and friends fields to old users"
+COLLECTION = "userInfo"
+QUERY = {
+    '$or': [
+        {'transaction_count': {'$exists': False}},
+        {'friends': {'$exists': False}}
+    ]
+}
+PROJECTION = None
+
+DEFAULTS = {
+    'last_weekly_check': '',
+    'last_monthly_check': '',
+    'last_bonus_id': '',
+    'transaction_count': 0,
+    'achievements': [],
+    'achievement_progress': {
+        'streak_star_weeks': 0,
+        'budget_boss_months': 0,
+        'loan_legend_count': 0
+    },
+    'consecutive_monthly_bonuses': 0,
+    'consecutive_weekly_streaks': 0,
+    'timely_loan_repayments': 0,
+    'friends': []
+}
+
+
+def transform(doc):
+    missing = {field: value for field, value in DEFAULTS.items() if field not in doc}
+    return {'$set': missing} if missing else None
@@ -0,0 +1,28 @@
+"""Unlock achievements for users who met their requirement before the rule could see it"""
+
+from achievements import ACHIEVEMENTS
+
+VERSION = 4
+DESCRIPTION = "Unlock achievements already earned by existing users"
+COLLECTION = "userInfo"
+QUERY = {
+    '$or': [
+        {achievement['counter']: {'$gte': achievement['requirement']}, 'achievements': {'$ne': achievement['id']}}
+        for achievement in ACHIEVEMENTS.values()
+    ]
+}
+PROJECTION = dict({achievement['counter']: True for achievement in ACHIEVEMENTS.values()}, achievements=True)
+
+
+def transform(doc):
+    held = set(doc.get('achievements', []))
+    earned = [
+        achievement['id'] for achievement in ACHIEVEMENTS.values()
+        if doc.get(achievement['counter'], 0) >= achievement['requirement'] and achievement['id'] not in held
+    ]
+    if not earned:
+        return None
+    return {'$addToSet': {
+        'achievements': {'$each': earned},
+        'unseen_achievements': {'$each': earned}
+    }}
@@ -1,4 +1,13 @@
-from pymongo import MongoClient
+import os
+from pymongo import AsyncMongoClient, MongoClient
+
+
 def getdatabase(d):
-    client = MongoClient('mongodb://localhost:27017')
-    return client[d]
\ No newline at end of file
+    # MONGODB_URI / FINWISE_DATABASE let benchmarks and staging point the app elsewhere
+    client = MongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017'))
+    return client[os.getenv('FINWISE_DATABASE', d)]
+
+
+def getdatabase_async(d):
+    client = AsyncMongoClient(os.getenv('MONGODB_URI', 'mongodb://localhost:27017'))
+    return client[os.getenv('FINWISE_DATABASE', d)]
@@ -1,8 +1,10 @@
 import os
+import httpx
 import requests
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
+from metrics import span
 
 load_dotenv()
 NEWSAPI_KEY = os.environ.get("NEWSAPI_KEY")
@@ -46,6 +48,26 @@ def get_finance_tips_articles(
         - content: Article content snippet
     """
     
+    endpoint, params = tips_request(query, language, sort_by, page_size, page, from_date)
+    return _fetch(endpoint, params, query=query, from_date=params["from"])
+
+
+async def get_finance_tips_articles_async(
+    query: str = "finance tips OR personal finance OR money management OR budgeting OR saving money",
+    language: str = "en",
+    sort_by: str = "publishedAt",
+    page_size: int = 10,
+    page: int = 1,
+    from_date: Optional[str] = None
+) -> Dict:
+    """get_finance_tips_articles over an async HTTP client"""
+    endpoint, params = tips_request(query, language, sort_by, page_size, page, from_date)
+    return await _fetch_async(endpoint, params, query=query, from_date=params["from"])
+
+
+def tips_request(query: str, language: str, sort_by: str, page_size: int, page: int,
+                 from_date: Optional[str]):
+    """Endpoint and query parameters for a finance tips search"""
     # Default to last 7 days if no from_date provided
     if from_date is None:
         from_date = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
@@ -62,40 +84,7 @@ def get_finance_tips_articles(
         "from": from_date,
         "apiKey": NEWSAPI_KEY
     }
-    
-    try:
-        response = requests.get(endpoint, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Check if the API returned an error
-        if data.get("status") == "error":
-            return {
-                "status": "error",
-                "error": data.get("message", "Unknown error from NewsAPI"),
-                "articles": []
-            }
-        
-        return {
-            "status": "ok",
-            "totalResults": data.get("totalResults", 0),
-            "articles": data.get("articles", []),
-            "query": query,
-            "from_date": from_date
-        }
-        
-    except requests.exceptions.RequestException as e:
-        return {
-            "status": "error",
-            "error": f"Request failed: {str(e)}",
-            "articles": []
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": f"Unexpected error: {str(e)}",
-            "articles": []
-        }
+    return endpoint, params
 
 
 def get_top_finance_headlines(
@@ -117,6 +106,23 @@ def get_top_finance_headlines(
         Dictionary containing status, totalResults, and articles list
     """
     
+    endpoint, params = headlines_request(country, category, page_size, page)
+    return _fetch(endpoint, params)
+
+
+async def get_top_finance_headlines_async(
+    country: str = "us",
+    category: str = "business",
+    page_size: int = 10,
+    page: int = 1
+) -> Dict:
+    """get_top_finance_headlines over an async HTTP client"""
+    endpoint, params = headlines_request(country, category, page_size, page)
+    return await _fetch_async(endpoint, params)
+
+
+def headlines_request(country: str, category: str, page_size: int, page: int):
+    """Endpoint and query parameters for top headlines"""
     endpoint = f"{NEWSAPI_BASE_URL}/top-headlines"
     
     params = {
@@ -126,37 +132,69 @@ def get_top_finance_headlines(
         "page": page,
         "apiKey": NEWSAPI_KEY
     }
+    return endpoint, params
+
+
+def _result(data: Dict, **extra) -> Dict:
+    # Check if the API returned an error
+    if data.get("status") == "error":
+        return {
+            "status": "error",
+            "error": data.get("message", "Unknown error from NewsAPI"),
+            "articles": []
+        }
     
+    return {
+        "status": "ok",
+        "totalResults": data.get("totalResults", 0),
+        "articles": data.get("articles", []),
+        **extra
+    }
+
+
+def _failure(message: str) -> Dict:
+    return {
+        "status": "error",
+        "error": message,
+        "articles": []
+    }
+
+
+def _fetch(endpoint: str, params: Dict, **extra) -> Dict:
     try:
-        response = requests.get(endpoint, params=params, timeout=10)
+        with span('http'):
+            response = requests.get(endpoint, params=params, timeout=10)
         response.raise_for_status()
-        data = response.json()
-        
-        if data.get("status") == "error":
-            return {
-                "status": "error",
-                "error": data.get("message", "Unknown error from NewsAPI"),
-                "articles": []
-            }
-        
-        return {
-            "status": "ok",
-            "totalResults": data.get("totalResults", 0),
-            "articles": data.get("articles", [])
-        }
+        return _result(response.json(), **extra)
         
     except requests.exceptions.RequestException as e:
-        return {
-            "status": "error",
-            "error": f"Request failed: {str(e)}",
-            "articles": []
-        }
+        return _failure(f"Request failed: {str(e)}")
     except Exception as e:
-        return {
-            "status": "error",
-            "error": f"Unexpected error: {str(e)}",
-            "articles": []
-        }
+        return _failure(f"Unexpected error: {str(e)}")
+
+
+_async_client = None
+
+
+def _http_client():
+    # One pooled client per process, created inside the running event loop
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=10)
+    return _async_client
+
+
+async def _fetch_async(endpoint: str, params: Dict, **extra) -> Dict:
+    try:
+        with span('http'):
+            response = await _http_client().get(endpoint, params=params)
+        response.raise_for_status()
+        return _result(response.json(), **extra)
+        
+    except httpx.HTTPError as e:
+        return _failure(f"Request failed: {str(e)}")
+    except Exception as e:
+        return _failure(f"Unexpected error: {str(e)}")
 
 
 def format_articles_for_display(articles: List[Dict]) -> List[Dict]:
@@ -0,0 +1,124 @@
+"""
+Password hashing and verification on a bounded process pool.
+
+bcrypt is CPU-bound: each hash or check occupies whoever runs it for a
+quarter of a second or more, so a signup burst or a login storm could keep
+every request worker busy hashing. Here every hash and
+check runs in a dedicated process pool (FINWISE_PASSWORD_WORKERS processes,
+one per CPU by default). At most FINWISE_PASSWORD_QUEUE operations may be
+queued or running; beyond that callers get PasswordQueueFull, which the
+app answers with 503 instead of queueing without bound.
+
+The cost factor is FINWISE_BCRYPT_ROUNDS. Hashes made with another cost
+keep verifying; `needs_rehash` tells signin to store a fresh hash.
+
+Latency (queue wait included), queue depth and rejections are on /metrics.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+from metrics import Counter, Gauge, Histogram, register, span
+
+BCRYPT_ROUNDS = int(os.getenv("FINWISE_BCRYPT_ROUNDS", "12"))
+WORKERS = int(os.getenv("FINWISE_PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+MAX_QUEUE = int(os.getenv("FINWISE_PASSWORD_QUEUE", str(WORKERS * 8)))
+
+PASSWORD_SECONDS = register(Histogram(
+    "finwise_password_seconds", "bcrypt hash/verify latency including queue wait", ('op',)))
+PASSWORD_QUEUE_DEPTH = register(Gauge(
+    "finwise_password_queue_depth", "bcrypt operations queued or running"))
+PASSWORD_REJECTED = register(Counter(
+    "finwise_password_rejected_total", "bcrypt operations refused because the queue was full", ('op',)))
+
+
+class PasswordQueueFull(Exception):
+    """Too many password operations in flight; retry later"""
+
+
+_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _hash(password: bytes, rounds: int):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        # fork (where available) so workers don't re-import the app; with fork
+        # every worker is started on the first submit
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def start_password_pool():
+    """
+    Start the worker processes now.
+
+    Call this before the app starts any threads (MongoClient monitors,
+    background jobs): forking a process that has other threads running
+    can leave locks held in the children.
+    """
+    _executor().submit(int).result()
+
+
+def _done(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+        PASSWORD_QUEUE_DEPTH.set(_pending)
+
+
+def _submit(op: str, func, *args):
+    global _pending
+    with _lock:
+        if _pending >= MAX_QUEUE:
+            PASSWORD_REJECTED.inc(op)
+            raise PasswordQueueFull(f"{_pending} password operations already queued")
+        _pending += 1
+        PASSWORD_QUEUE_DEPTH.set(_pending)
+        future = _executor().submit(func, *args)
+    future.add_done_callback(_done)
+    return future
+
+
+def _wait(op: str, func, *args):
+    started = time.perf_counter()
+    with span('bcrypt'):
+        result = _submit(op, func, *args).result()
+    PASSWORD_SECONDS.observe(time.perf_counter() - started, op)
+    return result
+
+
+def checkpw(password: bytes, hashed: bytes):
+    """bcrypt.checkpw on the pool"""
+    return _wait('verify', bcrypt.checkpw, password, hashed)
+
+
+def hash_password(password: str):
+    """New bcrypt hash (str) at the configured cost"""
+    return _wait('hash', _hash, password.encode('utf-8'), BCRYPT_ROUNDS).decode('utf-8')
+
+
+async def checkpw_async(password: bytes, hashed: bytes):
+    """checkpw for the async server: waits on the pool without holding a thread"""
+    started = time.perf_counter()
+    result = await asyncio.wrap_future(_submit('verify', bcrypt.checkpw, password, hashed))
+    PASSWORD_SECONDS.observe(time.perf_counter() - started, 'verify')
+    return result
+
+
+def needs_rehash(hashed: str):
+    """True if a hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
@@ -0,0 +1,277 @@
+"""
+Points service and ledger.
+
+All userInfo side effects of a new transaction (transaction count, data
+version, the first-transactions bonus, the expense limit penalty, the timely
+repayment bonus and counter) are computed up front and applied with a single
+find_one_and_update, so the count and the bonus it decides are read and
+written atomically.
+
+`reward_points` stays a materialized balance on userInfo. Every change to
+it is also appended to the pointsLedger collection with its reason, so
+awards can be audited, replayed and reconciled (see reconcile_points.py).
+Ledger entries have deterministic _ids (username and bonus id), and the
+write that moves the balance also pushes a marker of its awards onto
+`pending_awards`. Recording the entries afterwards is idempotent, so if a
+request dies in between, reconcile_points.py rebuilds them from the marker.
+`ledger_points` counts the points that went through the ledger, which is
+what lets the opening balance be seeded exactly.
+"""
+
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument, DESCENDING
+from pymongo.errors import BulkWriteError
+from achievements import on_counters_changed
+from cache import user_written
+from user_repository import projection_for
+
+TRANSACTION_BONUS = 10
+TRANSACTION_BONUS_LIMIT = 5  # only the first 5 transactions earn the bonus
+EXPENSE_LIMIT_PENALTY = -30
+TIMELY_REPAYMENT_BONUS = 50
+
+LEDGER = "pointsLedger"
+PENDING_AWARDS_KEPT = 20  # newest award markers kept on userInfo for reconcile_points.py
+EFFECT_BATCHES_KEPT = 50  # newest recurring batch ids kept on userInfo
+
+
+def ledger_entry(username: str, reason: str, amount: int, bonus_id: str, timestamp: datetime = None, **details):
+    """Build a ledger entry; extra keyword arguments are stored alongside it"""
+    entry = {
+        '_id': f"{username}:{bonus_id}",  # recording an award twice is a no-op
+        'username': username,
+        'reason': reason,
+        'amount': amount,
+        'bonus_id': bonus_id,
+        'timestamp': timestamp or datetime.now(),
+        'seq': ObjectId()  # orders entries for the /get-rewards cursor
+    }
+    entry.update(details)
+    return entry
+
+
+def record_ledger(users, entries: list):
+    """Insert entries into the points ledger in one bulk write, skipping ones already recorded"""
+    if entries:
+        try:
+            users.database.get_collection(LEDGER).insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+
+
+def transaction_awards(username: str, marker: dict):
+    """The ledger entries of an apply_transaction_effects marker"""
+    count, at = marker['count'], marker['at']
+    entries = []
+    if marker['penalty']:
+        entries.append(ledger_entry(username, 'expense_limit_penalty', EXPENSE_LIMIT_PENALTY,
+                                    f"penalty_{count}", at))
+    else:
+        for transaction_count in range(count - marker['transactions'] + 1, min(count, TRANSACTION_BONUS_LIMIT) + 1):
+            entries.append(ledger_entry(username, 'transaction_bonus', TRANSACTION_BONUS,
+                                        f"transaction_{transaction_count}", at, transaction_count=transaction_count))
+    if marker['timely_repayment']:
+        entries.append(ledger_entry(username, 'timely_repayment', TIMELY_REPAYMENT_BONUS,
+                                    f"repayment_{count}", at))
+    return entries
+
+
+def marker_entries(username: str, marker: dict):
+    """The ledger entries a pending_awards marker stands for"""
+    return marker['entries'] if 'entries' in marker else transaction_awards(username, marker)
+
+
+def award_points(users, username: str, entries: list, user: dict = None, claim: dict = None,
+                 changes: dict = None):
+    """
+    Apply ledger entries to the materialized balance and record them.
+
+    Args:
+        users: the userInfo collection
+        username: user to award
+        entries: ledger entries from ledger_entry
+        user: the request's copy of the user document; refreshed in place
+            from the post-image
+        claim: extra filter the write must match; nothing is awarded if it
+            doesn't, so a claim and its award are made together or not at all
+        changes: further update operators applied in the same write
+
+    Returns:
+        the user's rewards view after the write, or None if `claim` didn't match
+    """
+    total = sum(entry['amount'] for entry in entries)
+    update = dict(changes or {})
+    if total:
+        update['$inc'] = dict(update.get('$inc', {}), reward_points=total, ledger_points=total)
+        update['$push'] = {'pending_awards': {
+            '$each': [{'entries': entries, 'at': datetime.now()}],
+            '$slice': -PENDING_AWARDS_KEPT
+        }}
+    if not update:
+        return {}
+
+    updated = users.find_one_and_update(
+        dict(claim or {}, username=username),
+        update,
+        projection=projection_for('rewards'),
+        return_document=ReturnDocument.AFTER
+    )
+    user_written(username)
+    if not updated:
+        return None
+    if user is not None:
+        user.update(updated)
+    record_ledger(users, entries)
+    return updated
+
+
+def recent_awards(users, user: dict, reasons: list, limit: int = 10):
+    """
+    Ledger entries recorded since the user last viewed their rewards, newest first.
+
+    Args:
+        users: the userInfo collection
+        user: userInfo document already loaded by the caller
+        reasons: ledger reasons to include
+        limit: maximum entries to return
+    """
+    query = {'username': user['username'], 'reason': {'$in': reasons}}
+    if user.get('rewards_seen_id'):
+        query['seq'] = {'$gt': user['rewards_seen_id']}
+    elif user.get('rewards_seen_at'):
+        query['timestamp'] = {'$gt': user['rewards_seen_at']}  # cursor saved before rewards_seen_id
+
+    ledger = users.database.get_collection(LEDGER)
+    return list(ledger.find(query).sort('seq', DESCENDING).limit(limit))
+
+
+def mark_awards_seen(users, user: dict, entries: list):
+    """Move the user's rewards cursor past the given entries"""
+    if entries:
+        users.update_one(
+            {'username': user['username']},
+            {'$max': {'rewards_seen_id': entries[0]['seq']}}
+        )
+        user_written(user['username'])
+        user['rewards_seen_id'] = entries[0]['seq']
+
+
+def expense_limit_exceeded(transactions, limits: dict, category: str, month_start):
+    """
+    Check whether this month's spending in a category is over its limit.
+
+    Sums are computed server-side with one aggregation instead of pulling the
+    whole transaction history into Python.
+
+    Args:
+        transactions: the user's transaction collection
+        limits: the user's category limits (percent of monthly income)
+        category: category of the expense just added
+        month_start: first day of the current month
+    """
+    if category not in limits:
+        return False
+
+    totals = list(transactions.aggregate([
+        {'$match': {
+            'dateEntered': {'$gte': str(month_start)},
+            '$or': [{'type': 'income'}, {'type': 'debit', 'category': category}]
+        }},
+        {'$group': {'_id': '$type', 'total': {'$sum': '$amount'}}}
+    ]))
+    totals = {t['_id']: t['total'] for t in totals}
+
+    total_income = totals.get('income', 0)
+    if total_income <= 0:
+        return False
+
+    limit_amount = (limits[category] / 100) * total_income
+    return totals.get('debit', 0) > limit_amount
+
+
+def apply_transaction_effects(users, user: dict, penalty: bool = False, timely_repayment: bool = False,
+                              transactions: int = 1, batch: str = None):
+    """
+    Apply every userInfo side effect of new transactions in one write.
+
+    Args:
+        users: the userInfo collection
+        user: the request's copy of the user document; refreshed in place
+            from the post-image
+        penalty: the expense pushed a category over its limit
+        timely_repayment: the transaction is a loan repayment paid on time
+        transactions: how many transactions were added together (recurring
+            entries are applied per batch); each one still counts towards
+            the first-transactions bonus, and one penalty covers the batch
+        batch: id of a recurring batch; the write is skipped if the user
+            already recorded it, so retrying a batch applies it once
+
+    Returns:
+        (points awarded, bonus_id or None)
+    """
+    username = user['username']
+    count = {'$ifNull': ['$transaction_count', 0]}
+
+    if penalty:
+        # A penalty replaces the first-transactions bonus
+        points = EXPENSE_LIMIT_PENALTY
+    else:
+        # The bonus for each of the new transactions still within the first few
+        bonused = {'$max': [0, {'$min': [transactions, {'$subtract': [TRANSACTION_BONUS_LIMIT, count]}]}]}
+        points = {'$multiply': [bonused, TRANSACTION_BONUS]}
+
+    if timely_repayment:
+        points = {'$add': [points, TIMELY_REPAYMENT_BONUS]}
+
+    # What transaction_awards needs to rebuild this write's ledger entries
+    marker = {
+        'count': {'$add': [count, transactions]},
+        'transactions': transactions,
+        'penalty': penalty,
+        'timely_repayment': timely_repayment,
+        'at': datetime.now()
+    }
+    changes = {
+        'transaction_count': {'$add': [count, transactions]},
+        'reward_points': {'$add': [{'$ifNull': ['$reward_points', 0]}, points]},
+        'ledger_points': {'$add': [{'$ifNull': ['$ledger_points', 0]}, points]},
+        'data_version': {'$add': [{'$ifNull': ['$data_version', 0]}, 1]},
+        'pending_awards': {'$slice': [
+            {'$concatArrays': [{'$ifNull': ['$pending_awards', []]}, [marker]]}, -PENDING_AWARDS_KEPT
+        ]}
+    }
+    if timely_repayment:
+        changes['timely_loan_repayments'] = {'$add': [{'$ifNull': ['$timely_loan_repayments', 0]}, 1]}
+
+    query = {'username': username}
+    if batch is not None:
+        query['effects_batches'] = {'$ne': batch}
+        changes['effects_batches'] = {'$slice': [
+            {'$concatArrays': [{'$ifNull': ['$effects_batches', []]}, [batch]]}, -EFFECT_BATCHES_KEPT
+        ]}
+
+    # Pipeline update: every expression sees the pre-update document, so the
+    # bonus decision and the increment can't race with a concurrent write.
+    updated = users.find_one_and_update(
+        query,
+        [{'$set': changes}],
+        projection=projection_for('rewards'),
+        return_document=ReturnDocument.AFTER
+    )
+    user_written(username)
+    if not updated:
+        return 0, None
+    user.update(updated)
+
+    marker['count'] = user['transaction_count']
+    entries = transaction_awards(username, marker)
+    record_ledger(users, entries)
+
+    if timely_repayment:
+        on_counters_changed(users, username, {'timely_loan_repayments': user['timely_loan_repayments']}, user)
+
+    points_awarded = sum(entry['amount'] for entry in entries)
+    bonus_id = next((e['bonus_id'] for e in reversed(entries) if e['reason'] != 'timely_repayment'), None)
+    return points_awarded, bonus_id
@@ -0,0 +1,151 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries an X-Profile header equal to
+FINWISE_ADMIN_TOKEN, or when it hits one of PROFILED_ROUTES and is picked
+by FINWISE_PROFILE_SAMPLE_RATE (0 by default, so nothing is sampled unless
+configured). A profiled request runs under cProfile and records every
+MongoDB command it issues (name, collection, filter keys and duration; no
+values). The result is kept in a bounded in-memory ring buffer that admins
+read through /admin/profiles with the X-Admin-Token header.
+
+Only one request per process is profiled at a time; others that would
+have been profiled in the meantime just run normally.
+
+Like metrics.py, import this module before the first MongoClient is created.
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from itertools import count
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+ADMIN_TOKEN = os.getenv("FINWISE_ADMIN_TOKEN", "")
+SAMPLE_RATE = float(os.getenv("FINWISE_PROFILE_SAMPLE_RATE", "0"))
+PROFILED_ROUTES = {"/get-rewards", "/get-analytics", "/gemini-suggestions"}
+BUFFER_SIZE = int(os.getenv("FINWISE_PROFILE_BUFFER", "50"))
+TOP_FUNCTIONS = 40
+MAX_COMMANDS = 500
+
+_traces = deque(maxlen=BUFFER_SIZE)
+_traces_lock = threading.Lock()
+_active = threading.Lock()  # cProfile can't run two profilers at once
+_trace_ids = count(1)
+
+
+def admin_authorized(token: str):
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token or "", ADMIN_TOKEN)
+
+
+def _wants_profile():
+    if request.headers.get('X-Profile') is not None:
+        return admin_authorized(request.headers['X-Profile'])
+    rule = request.url_rule.rule if request.url_rule else None
+    return rule in PROFILED_ROUTES and random.random() < SAMPLE_RATE
+
+
+class ProfiledCommands(monitoring.CommandListener):
+    """Records the MongoDB commands issued by a profiled request"""
+
+    def started(self, event):
+        if has_request_context() and g.get('profile_commands') is not None:
+            command = event.command
+            collection = command.get(event.command_name)
+            query = command.get('filter') or command.get('q') or {}
+            g.profile_started[event.request_id] = {
+                'command': event.command_name,
+                'collection': collection if isinstance(collection, str) else None,
+                'filter_keys': sorted(query) if isinstance(query, dict) else [],
+            }
+
+    def _finish(self, event, ok: bool):
+        if has_request_context() and g.get('profile_commands') is not None:
+            entry = g.profile_started.pop(event.request_id, None)
+            if entry and len(g.profile_commands) < MAX_COMMANDS:
+                entry.update(ms=round(event.duration_micros / 1000, 3), ok=ok)
+                g.profile_commands.append(entry)
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+
+monitoring.register(ProfiledCommands())
+
+
+def _stats_text(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def install_profiler(app):
+    """Profile the requests that ask for it (or are sampled) on a Flask app"""
+
+    @app.before_request
+    def start_profile():
+        if not _wants_profile() or not _active.acquire(blocking=False):
+            return
+        g.profile_commands = []
+        g.profile_started = {}
+        g.profile_began = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def save_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        _active.release()
+
+        body = request.get_json(silent=True)
+        trace = {
+            'id': next(_trace_ids),
+            'route': request.url_rule.rule if request.url_rule else request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'username': body.get('username') if isinstance(body, dict) else None,
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'ms': round((time.perf_counter() - g.profile_began) * 1000, 1),
+            'mongo_commands': g.profile_commands,
+            'profile': _stats_text(profiler),
+        }
+        g.profile_commands = None
+        with _traces_lock:
+            _traces.append(trace)
+        response.headers['X-Profile-Id'] = str(trace['id'])
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request doesn't run when the view raised; don't leave the profiler on
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _active.release()
+
+
+def list_traces():
+    """Newest first, without the profile text"""
+    with _traces_lock:
+        traces = list(_traces)
+    return [{k: v for k, v in t.items() if k not in ('profile', 'mongo_commands')}
+            | {'mongo_commands': len(t['mongo_commands'])} for t in reversed(traces)]
+
+
+def get_trace(trace_id: int):
+    with _traces_lock:
+        return next((t for t in _traces if t['id'] == trace_id), None)
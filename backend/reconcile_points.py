@@ -0,0 +1,143 @@
+"""
+Reconcile materialized reward_points balances against the points ledger.
+
+Streams per-user ledger totals and compares them with userInfo in batches.
+Balances that predate the ledger can be brought in with --seed, which writes
+an 'opening_balance' entry for every user not seeded yet. Its amount is
+reward_points - ledger_points, taken in the same write that marks the user
+seeded, so awards made before or during seeding are never counted twice.
+
+Before comparing, awards whose request died between moving the balance and
+recording the ledger entries are finished from the user's pending_awards
+markers. Markers older than PENDING_GRACE are then dropped.
+
+Usage:
+    python reconcile_points.py            # verify only
+    python reconcile_points.py --seed     # seed opening balances, then verify
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from mongodb import getdatabase
+from pymongo import ReturnDocument
+from points import LEDGER, ledger_entry, marker_entries, record_ledger
+from schema import bootstrap
+
+BATCH_SIZE = 1000
+PENDING_GRACE = timedelta(minutes=5)  # awards still in flight are left alone
+
+db = getdatabase("finwise")
+userInfo = db.get_collection("userInfo")
+ledger = db.get_collection(LEDGER)
+
+
+def seed_opening_balances():
+    """Record each user's points from before the ledger as an opening balance"""
+    print("🌱 Seeding opening balances...\n")
+
+    seeded = 0
+    entries = []
+    for user in userInfo.find({'ledger_opened': {'$ne': True}}, {'username': True}).batch_size(BATCH_SIZE):
+        entry = _open_ledger(user['username'])
+        if entry:
+            entries.append(entry)
+            seeded += 1
+        if len(entries) >= BATCH_SIZE:
+            record_ledger(userInfo, entries)
+            entries = []
+    record_ledger(userInfo, entries)
+
+    print(f"✅ Seeded {seeded} opening balances\n")
+
+
+def _open_ledger(username: str):
+    """Mark the user seeded and queue their opening balance in one write; returns the entry"""
+    entry = ledger_entry(username, 'opening_balance', 0, 'opening_balance')
+    entry['amount'] = {'$subtract': [{'$ifNull': ['$reward_points', 0]}, {'$ifNull': ['$ledger_points', 0]}]}
+    updated = userInfo.find_one_and_update(
+        {'username': username, 'ledger_opened': {'$ne': True}},
+        [{'$set': {
+            'ledger_opened': True,
+            'ledger_points': {'$ifNull': ['$reward_points', 0]},
+            'pending_awards': {'$concatArrays': [
+                {'$ifNull': ['$pending_awards', []]}, [{'entries': [entry], 'at': entry['timestamp']}]
+            ]}
+        }}],
+        projection={'pending_awards': {'$slice': -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    return updated['pending_awards'][0]['entries'][0] if updated else None
+
+
+def finish_pending_awards():
+    """Record the ledger entries of every award marker, then drop markers past PENDING_GRACE"""
+    cutoff = datetime.now() - PENDING_GRACE
+    finished = 0
+    for user in userInfo.find({'pending_awards.at': {'$lte': cutoff}},
+                              {'username': True, 'pending_awards': True}).batch_size(BATCH_SIZE):
+        markers = [m for m in user['pending_awards'] if m['at'] <= cutoff]
+        # Entries already recorded are skipped by their _id
+        record_ledger(userInfo, [e for m in markers for e in marker_entries(user['username'], m)])
+        userInfo.update_one({'_id': user['_id']}, {'$pull': {'pending_awards': {'at': {'$lte': cutoff}}}})
+        finished += len(markers)
+
+    print(f"⏳ Finished {finished} award markers\n")
+
+
+def reconcile():
+    """Compare ledger totals with materialized balances; returns the mismatches"""
+    print("🔍 Reconciling reward points with the ledger...\n")
+
+    # Both streams are sorted by username so they can be merged in one pass
+    totals = ledger.aggregate(
+        [
+            {'$group': {'_id': '$username', 'total': {'$sum': '$amount'}}},
+            {'$sort': {'_id': 1}}
+        ],
+        allowDiskUse=True,
+        batchSize=BATCH_SIZE
+    )
+    users = userInfo.find(
+        {}, {'username': True, 'reward_points': True}
+    ).sort('username', 1).batch_size(BATCH_SIZE)
+
+    checked = 0
+    mismatches = []
+    row = next(totals, None)
+    for user in users:
+        username = user['username']
+        while row is not None and row['_id'] < username:
+            # ledger entries for a user that no longer exists
+            row = next(totals, None)
+
+        total = 0
+        if row is not None and row['_id'] == username:
+            total = row['total']
+            row = next(totals, None)
+
+        balance = user.get('reward_points', 0)
+        if balance != total:
+            mismatches.append((username, balance, total))
+        checked += 1
+
+    print(f"{'='*50}")
+    print(f"📊 Users checked: {checked}")
+    print(f"❌ Mismatched balances: {len(mismatches)}")
+    print(f"{'='*50}\n")
+
+    for username, balance, total in mismatches[:50]:
+        print(f"   {username}: balance {balance}, ledger {total}")
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile reward points with the points ledger")
+    parser.add_argument('--seed', action='store_true', help="write opening balances for users without ledger entries")
+    args = parser.parse_args()
+
+    bootstrap(db)
+    if args.seed:
+        seed_opening_balances()
+    finish_pending_awards()
+    reconcile()
@@ -0,0 +1,312 @@
+"""
+Recurring transactions: detection, schedules and the daily materializer.
+
+`detect_recurring` finds salaries and bills in a user's history in one
+vectorized pass over their columns: rows are grouped by type,
+category/source and similar amount, and a group is recurring when the
+gaps between its dates match a weekly, fortnightly or monthly period.
+
+Users confirm a pattern as a schedule in recurringSchedules, indexed on
+next_due. `python recurring.py` (meant for a daily cron, e.g. `10 0 * * *`)
+writes every due entry, catching up missed occurrences, one batch of
+schedules at a time. Each batch is a single bulk insert. Each user's
+points and limit penalty are then applied once for all of their new
+entries, using the same rules as /add-transaction and /add-income. Rows
+have deterministic _ids, so a re-run never duplicates an entry.
+
+Rows are inserted carrying `effects_pending`, the id of their batch. The
+effects write only applies if the user hasn't recorded that batch id yet,
+and the flag is cleared afterwards. Every run first finishes rows whose
+effects a crashed run left pending. Each entry's points, penalty and
+data_version bump are therefore applied exactly once.
+
+Usage:
+    python recurring.py           # materialize everything due today
+    python recurring.py --loop    # stay up and run once a day
+"""
+
+import argparse
+import calendar
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from columnar import TYPE_CODES, LABEL_FIELDS, get_columns
+from transactions import TRANSACTIONS, for_user, insert_new_rows
+from points import expense_limit_exceeded, apply_transaction_effects
+from cache import transactions_written
+from streaks import get_month_start
+
+SCHEDULES = "recurringSchedules"
+RECURRING_TYPES = ['debit', 'income']
+
+# period -> (days between occurrences, tolerance in days)
+PERIODS = {
+    'weekly': (7, 1),
+    'biweekly': (14, 2),
+    'monthly': (30, 3)
+}
+MIN_OCCURRENCES = 3
+AMOUNT_TOLERANCE = 0.15  # largest step between sorted amounts of one pattern
+MIN_REGULARITY = 0.75  # share of gaps that must match the period
+BATCH_SIZE = 500  # schedules per materializer batch
+MAX_CATCH_UP = 12  # occurrences written per schedule per run
+
+_PERIOD_NAMES = list(PERIODS)
+_PERIOD_DAYS = np.array([days for days, _ in PERIODS.values()])
+_PERIOD_TOLERANCE = np.array([tolerance for _, tolerance in PERIODS.values()])
+
+
+def advance(due: date, period: str, anchor_day: int = None):
+    """The occurrence after `due`; monthly schedules keep their day of month where it exists"""
+    if period != 'monthly':
+        return due + timedelta(days=PERIODS[period][0])
+    year, month = (due.year + 1, 1) if due.month == 12 else (due.year, due.month + 1)
+    day = min(anchor_day or due.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def _group_medians(keys, values):
+    """(group keys, upper median per group, group sizes) for int keys"""
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    return keys[starts], values[starts + sizes // 2], sizes
+
+
+def detect_recurring(columns, today: date):
+    """Recurring (type, category/source) patterns in a user's history"""
+    type_codes = [TYPE_CODES[t] for t in RECURRING_TYPES]
+    rows = np.flatnonzero(columns.mask(None, today, inclusive_end=True) & np.isin(columns.types, type_codes))
+    if not len(rows):
+        return []
+    labels = len(columns.label_names)
+    labels_of = columns.types[rows].astype(np.int64) * labels + columns.labels[rows]
+    amounts = columns.amounts[rows]
+    days = columns.dates[rows].astype(np.int64)
+
+    # Split each category/source into runs of similar amounts, so a 1200 rent
+    # and a 40 fee under "Rent" are told apart; each run is one candidate
+    order = np.lexsort((amounts, labels_of))
+    labels_of, amounts, days = labels_of[order], amounts[order], days[order]
+    new_run = np.r_[True, (labels_of[1:] != labels_of[:-1]) | (amounts[1:] > amounts[:-1] * (1 + AMOUNT_TOLERANCE))]
+    keys = np.cumsum(new_run) - 1
+    run_labels = labels_of[new_run]
+
+    order = np.lexsort((days, keys))
+    keys, amounts, days = keys[order], amounts[order], days[order]
+
+    same = keys[1:] == keys[:-1]
+    gaps, gap_keys = np.diff(days)[same], keys[1:][same]
+    if not len(gaps):
+        return []
+
+    # A group recurs when its median gap is close to a period and most gaps agree
+    groups, median_gaps, gap_counts = _group_medians(gap_keys, gaps)
+    distance = np.abs(median_gaps[:, None] - _PERIOD_DAYS[None, :])
+    period = np.argmin(distance, axis=1)
+    matched = distance[np.arange(len(groups)), period] <= _PERIOD_TOLERANCE[period]
+    gap_group = np.searchsorted(groups, gap_keys)
+    on_time = np.abs(gaps - _PERIOD_DAYS[period][gap_group]) <= _PERIOD_TOLERANCE[period][gap_group]
+    regularity = np.bincount(gap_group, weights=on_time, minlength=len(groups)) / gap_counts
+
+    ends = np.flatnonzero(np.r_[~same, True])  # last (latest) row of each group
+    at = np.searchsorted(keys[ends], groups)
+    last_day = days[ends][at]
+    amount = _group_medians(keys, amounts)[1][at]
+    lapsed = np.datetime64(today, 'D').astype(np.int64) - last_day > 2 * _PERIOD_DAYS[period]
+
+    recurring = matched & ~lapsed & (regularity >= MIN_REGULARITY) & (gap_counts + 1 >= MIN_OCCURRENCES)
+    patterns = {}
+    for i in np.flatnonzero(recurring):
+        label = run_labels[groups[i]]
+        type_name = RECURRING_TYPES[type_codes.index(label // labels)]
+        name = _PERIOD_NAMES[period[i]]
+        last = date(1970, 1, 1) + timedelta(days=int(last_day[i]))
+        next_due = advance(last, name)
+        while next_due < today:
+            next_due = advance(next_due, name, last.day)
+        pattern = {
+            'type': type_name,
+            LABEL_FIELDS[type_name]: columns.label_names[label % labels],
+            'amount': round(float(amount[i]), 2),
+            'period': name,
+            'occurrences': int(gap_counts[i]) + 1,
+            'last_date': str(last),
+            'next_due': str(next_due),
+            'confidence': round(float(regularity[i]), 2)
+        }
+        # A schedule is per category/source; offer its largest pattern
+        best = patterns.get(label)
+        if best is None or pattern['amount'] > best['amount']:
+            patterns[label] = pattern
+    return sorted(patterns.values(), key=lambda p: p['amount'], reverse=True)
+
+
+def schedule_id(username: str, type_name: str, label: str):
+    # One schedule per user and category/source, so confirming twice updates it
+    return f"{username}:{type_name}:{label}"
+
+
+def suggest_schedules(db, username: str, data_version, today: date = None):
+    """Detected patterns the user hasn't confirmed yet"""
+    today = today or date.today()
+    confirmed = {s['_id'] for s in db.get_collection(SCHEDULES).find({'username': username}, {'_id': True})}
+    return [p for p in detect_recurring(get_columns(db, username, data_version), today)
+            if schedule_id(username, p['type'], p[LABEL_FIELDS[p['type']]]) not in confirmed]
+
+
+def list_schedules(db, username: str):
+    schedules = db.get_collection(SCHEDULES).find({'username': username}, {'created_at': False}).sort('next_due', 1)
+    return [{'schedule_id': s.pop('_id'), **s} for s in schedules]
+
+
+def save_schedule(db, username: str, type_name: str, label: str, amount: float, period: str, next_due: date):
+    """Create or replace the user's schedule for a category/source"""
+    schedule = {
+        '_id': schedule_id(username, type_name, label),
+        'username': username,
+        'type': type_name,
+        LABEL_FIELDS[type_name]: label,
+        'amount': amount,
+        'period': period,
+        'anchor_day': next_due.day,
+        'next_due': str(next_due),
+        'created_at': datetime.now()
+    }
+    db.get_collection(SCHEDULES).replace_one({'_id': schedule['_id']}, schedule, upsert=True)
+    return schedule
+
+
+def delete_schedule(db, username: str, schedule: str):
+    return db.get_collection(SCHEDULES).delete_one({'_id': schedule, 'username': username}).deleted_count > 0
+
+
+def _occurrences(schedule: dict, today: date):
+    """Due dates up to today and the next due date after them"""
+    due = date.fromisoformat(schedule['next_due'])
+    dates = []
+    while due <= today and len(dates) < MAX_CATCH_UP:
+        dates.append(due)
+        due = advance(due, schedule['period'], schedule.get('anchor_day'))
+    while due <= today:  # too far behind; skip the rest
+        due = advance(due, schedule['period'], schedule.get('anchor_day'))
+    return dates, due
+
+
+def recurring_row(schedule: dict, due: date, batch: str):
+    """The transaction row a schedule adds on a due date"""
+    label_field = LABEL_FIELDS[schedule['type']]
+    return {
+        "_id": f"recurring_{schedule['_id']}:{due}",  # makes the write idempotent
+        "username": schedule['username'],
+        "dateEntered": str(due),
+        "amount": schedule['amount'],
+        "type": schedule['type'],
+        label_field: schedule[label_field],
+        "recurring_id": schedule['_id'],
+        "effects_pending": batch
+    }
+
+
+def apply_effects(db, username: str, batch: str, rows: list, today: date):
+    """Apply a user's points and limit penalty for a batch of their rows, once"""
+    users = db.get_collection("userInfo")
+    user = users.find_one({'username': username}, {'username': True, 'limit': True})
+    if user:
+        limits = user.get('limit', {})
+        transactions = for_user(db, username)
+        categories = {row['category'] for row in rows if row['type'] == 'debit'}
+        penalty = any(expense_limit_exceeded(transactions, limits, c, get_month_start(today)) for c in categories)
+        apply_transaction_effects(users, user, penalty=penalty, transactions=len(rows), batch=batch)
+    db.get_collection(TRANSACTIONS).update_many(
+        {'username': username, 'effects_pending': batch},
+        {'$unset': {'effects_pending': ''}}
+    )
+
+
+def finish_pending_effects(db, today: date):
+    """Apply the effects of rows a crashed run inserted but didn't finish; returns rows finished"""
+    pending = defaultdict(list)
+    for row in db.get_collection(TRANSACTIONS).find({'effects_pending': {'$exists': True}},
+                                                    {'username': True, 'type': True, 'category': True,
+                                                     'effects_pending': True}):
+        pending[row['username'], row['effects_pending']].append(row)
+    if pending:
+        transactions_written(*{username for username, _ in pending})
+    for (username, batch), rows in pending.items():
+        apply_effects(db, username, batch, rows, today)
+    return sum(len(rows) for rows in pending.values())
+
+
+def materialize_batch(db, schedules: list, today: date):
+    """Write the due entries of a batch of schedules and apply their effects per user"""
+    batch = str(ObjectId())
+    rows, advances = [], []
+    for schedule in schedules:
+        dates, next_due = _occurrences(schedule, today)
+        rows += [recurring_row(schedule, due, batch) for due in dates]
+        advances.append(UpdateOne(
+            {'_id': schedule['_id'], 'next_due': schedule['next_due']},
+            {'$set': {'next_due': str(next_due), 'last_materialized': str(today)}}
+        ))
+
+    inserted = defaultdict(list)
+    for row in insert_new_rows(db, rows):
+        inserted[row['username']].append(row)
+
+    if inserted:
+        transactions_written(*inserted)
+        for username, new_rows in inserted.items():
+            apply_effects(db, username, batch, new_rows, today)
+
+    if advances:
+        db.get_collection(SCHEDULES).bulk_write(advances, ordered=False)
+    return sum(len(r) for r in inserted.values())
+
+
+def run(db, today: date = None, batch_size: int = BATCH_SIZE):
+    """Materialize every schedule due on or before today; returns entries written"""
+    today = today or datetime.now().date()
+    schedules = db.get_collection(SCHEDULES)
+    finished = finish_pending_effects(db, today)
+    if finished:
+        print(f"🔁 Finished the effects of {finished} entries from an interrupted run")
+    written = batches = 0
+    while True:
+        batch = list(schedules.find({'next_due': {'$lte': str(today)}}).sort('next_due', 1).limit(batch_size))
+        if not batch:
+            break
+        written += materialize_batch(db, batch, today)
+        batches += 1
+    print(f"🔁 Recurring entries for {today}: {written} written in {batches} batches")
+    return written
+
+
+def loop(db):
+    """Run now, then shortly after every midnight"""
+    while True:
+        run(db)
+        tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        wake_at = tomorrow + timedelta(minutes=10)
+        print(f"💤 Next run at {wake_at}")
+        time.sleep(max(0, (wake_at - datetime.now()).total_seconds()))
+
+
+if __name__ == "__main__":
+    from mongodb import getdatabase
+    from cache import start_invalidation_channel
+
+    parser = argparse.ArgumentParser(description="Write due recurring transactions for all users")
+    parser.add_argument('--loop', action='store_true', help="keep running and materialize once a day")
+    args = parser.parse_args()
+
+    database = getdatabase("finwise")
+    start_invalidation_channel(database, listen=False)  # tell web workers about the writes
+    if args.loop:
+        loop(database)
+    else:
+        run(database)
@@ -0,0 +1,325 @@
+"""
+Collections, validators and indexes, declared in one place.
+
+`bootstrap` runs once at process start (and from the CLI below). It
+creates missing collections, applies the userInfo validator, creates every
+declared index that doesn't exist yet and reports the ones it didn't
+expect, so request handlers never issue DDL. Indexes are identified by
+their key pattern; an existing index with the same keys but different
+options is reported, not replaced.
+
+QUERY_SHAPES lists the filters/sorts the application issues. `--check`
+reports any shape no index can serve.
+
+Usage:
+    python schema.py                # create what's missing, report the rest
+    python schema.py --check        # report only, change nothing
+    python schema.py --drop-extra   # also drop indexes that aren't declared
+"""
+
+import argparse
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure
+from points import LEDGER
+from social import FRIEND_REQUESTS
+from split_expenses import SPLIT_EXPENSES, SPLIT_BALANCES, seed_expense_counter
+from settlement import SETTLEMENTS
+from transactions import TRANSACTIONS, SHARD_KEY
+from jobs import CHECKPOINTS
+from recurring import SCHEDULES
+
+USER_INFO_VALIDATOR = {
+    "$jsonSchema": {
+    "bsonType": "object",
+    "required": ["name", "username", "email", "password", "age"],
+    "properties": {
+        "name": {
+        "bsonType": "string",
+        "description": "must be a string and is required"
+        },
+        "username": {
+        "bsonType": "string",
+        "description": "must be a string and is required"
+        },
+        "email": {
+        "bsonType": "string",
+        "pattern": "^[^@\\s]+@[^@\\s]+\\.[^@\\s]+$",
+        "description": "must be a valid email and is required"
+        },
+        "password": {
+        "bsonType": "string",
+        "minLength": 6,
+        "description": "must be a string and is required"
+        },
+        "age": {
+        "bsonType": "int",
+        "minimum": 0,
+        "maximum": 130,
+        "description": "must be an integer between 0 and 130 and is required"
+        },
+        "user_interest": {
+        "bsonType": "object",
+        "description": "object containing user interests with numeric values"
+        },
+        "limit": {
+        "bsonType": "object",
+        "description": "object containing category spending limits as percentages"
+        },
+        "reward_points": {
+        "bsonType": "int",
+        "minimum": 0,
+        "description": "total reward points earned by the user"
+        },
+        "last_weekly_check": {
+        "bsonType": "string",
+        "description": "date of last weekly streak check (Monday)"
+        },
+        "last_monthly_check": {
+        "bsonType": "string",
+        "description": "date of last monthly streak check"
+        },
+        "transaction_count": {
+        "bsonType": "int",
+        "minimum": 0,
+        "description": "total number of transactions (income/expense/loan) added by user"
+        },
+        "last_bonus_id": {
+        "bsonType": "string",
+        "description": "unique ID of last awarded bonus to prevent duplicate celebrations"
+        },
+        "rewards_seen_id": {
+        "bsonType": "objectId",
+        "description": "seq of the newest points ledger entry shown to the user"
+        },
+        "ledger_points": {
+        "bsonType": "int",
+        "description": "points applied through the points ledger; the rest of reward_points is the opening balance"
+        },
+        "ledger_opened": {
+        "bsonType": "bool",
+        "description": "the opening balance has been recorded in the points ledger"
+        },
+        "effects_batches": {
+        "bsonType": "array",
+        "description": "ids of the newest recurring batches whose effects were applied"
+        },
+        "pending_awards": {
+        "bsonType": "array",
+        "description": "markers of the newest awards, from which reconcile_points.py rebuilds missing ledger entries"
+        },
+        "rewards_seen_at": {
+        "bsonType": "date",
+        "description": "timestamp cursor used before rewards_seen_id; read only while that is unset"
+        },
+        "data_version": {
+        "bsonType": "int",
+        "minimum": 0,
+        "description": "bumped by every write to the user's transactions; keys cached views of them"
+        },
+        "achievements": {
+        "bsonType": "array",
+        "description": "list of unlocked achievement IDs"
+        },
+        "unseen_achievements": {
+        "bsonType": "array",
+        "description": "unlocked achievement IDs not yet shown to the user"
+        },
+        "achievement_progress": {
+        "bsonType": "object",
+        "description": "tracks progress towards achievements"
+        },
+        "consecutive_monthly_bonuses": {
+        "bsonType": "int",
+        "minimum": 0,
+        "description": "count of consecutive months with 100-point bonus (for Budget Boss)"
+        },
+        "consecutive_weekly_streaks": {
+        "bsonType": "int",
+        "minimum": 0,
+        "description": "count of consecutive weekly streaks (for Streak Star)"
+        },
+        "timely_loan_repayments": {
+        "bsonType": "int",
+        "minimum": 0,
+        "description": "count of timely loan repayments (for Loan Legend)"
+        }
+    }
+    }
+}
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "userInfo": [
+        ([("username", ASCENDING)], {'unique': True}),
+        ([("name", ASCENDING)], {'unique': True}),
+        ([("email", ASCENDING)], {'unique': True})
+    ],
+    "community": [
+        ([("post_id", ASCENDING)], {'unique': True})
+    ],
+    TRANSACTIONS: [
+        (SHARD_KEY, {}),
+        ([("username", ASCENDING), ("type", ASCENDING), ("dateEntered", ASCENDING)], {}),
+        ([("effects_pending", ASCENDING)], {'partialFilterExpression': {'effects_pending': {'$exists': True}}})
+    ],
+    LEDGER: [
+        ([("username", ASCENDING), ("seq", DESCENDING)], {})
+    ],
+    FRIEND_REQUESTS: [
+        ([("recipient", ASCENDING), ("status", ASCENDING), ("sender", ASCENDING)], {}),
+        ([("sender", ASCENDING), ("status", ASCENDING), ("recipient", ASCENDING)], {}),
+        ([("sender", ASCENDING), ("recipient", ASCENDING)], {
+            'unique': True,
+            'partialFilterExpression': {'status': 'pending'},
+            'name': 'one_pending_request'
+        })
+    ],
+    SPLIT_EXPENSES: [
+        ([("expense_id", ASCENDING)], {'unique': True}),
+        ([("status", ASCENDING), ("fanout_started", ASCENDING)], {'partialFilterExpression': {'status': 'pending'}}),
+        ([("created_by", ASCENDING), ("settled", ASCENDING), ("expense_id", DESCENDING)], {}),
+        ([("split_with", ASCENDING), ("settled", ASCENDING), ("expense_id", DESCENDING)], {})
+    ],
+    SPLIT_BALANCES: [
+        ([("debtor", ASCENDING), ("creditor", ASCENDING)], {'unique': True}),
+        ([("creditor", ASCENDING), ("debtor", ASCENDING)], {})
+    ],
+    SETTLEMENTS: [
+        ([("settled_by", ASCENDING), ("dateSettled", DESCENDING)], {})
+    ],
+    CHECKPOINTS: [
+        ([("job", ASCENDING)], {})
+    ],
+    SCHEDULES: [
+        ([("next_due", ASCENDING)], {}),
+        ([("username", ASCENDING), ("next_due", ASCENDING)], {})
+    ]
+}
+
+VALIDATORS = {
+    "userInfo": USER_INFO_VALIDATOR
+}
+
+# (collection, equality fields, then sort/range fields, where it's issued)
+QUERY_SHAPES = [
+    ("userInfo", ["username"], [], "every authenticated route"),
+    ("userInfo", ["email"], [], "signin by email"),
+    ("community", ["post_id"], [], "/get-post, /handle-interaction"),
+    ("community", [], ["post_id"], "next post id in /add-post"),
+    (TRANSACTIONS, ["username"], [], "history snapshot"),
+    (TRANSACTIONS, ["username", "type"], ["dateEntered"], "monthly limit check"),
+    (TRANSACTIONS, [], ["effects_pending"], "recurring.py unfinished effects"),
+    (LEDGER, ["username"], ["seq"], "/get-rewards recent awards"),
+    (FRIEND_REQUESTS, ["recipient", "status"], [], "received requests and counts"),
+    (FRIEND_REQUESTS, ["sender", "status"], [], "sent requests and counts"),
+    (FRIEND_REQUESTS, ["sender", "recipient", "status"], [], "duplicate request check"),
+    (SPLIT_EXPENSES, ["expense_id"], [], "/settle-expense"),
+    (SPLIT_EXPENSES, ["created_by", "settled"], ["expense_id"], "created expenses page"),
+    (SPLIT_EXPENSES, ["split_with", "settled"], ["expense_id"], "involved expenses page"),
+    (SPLIT_EXPENSES, ["status"], ["fanout_started"], "split recovery sweeper"),
+    (SPLIT_BALANCES, ["debtor"], [], "you_owe"),
+    (SPLIT_BALANCES, ["creditor"], [], "owed_to_you"),
+    (CHECKPOINTS, ["job"], [], "streak scheduler resume"),
+    (SCHEDULES, [], ["next_due"], "recurring materializer"),
+    (SCHEDULES, ["username"], ["next_due"], "/recurring-schedules")
+]
+
+
+def _key_pattern(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+
+def _ensure_collection(db, name: str, existing: set, check_only: bool, report: list):
+    validator = VALIDATORS.get(name)
+    if name not in existing:
+        if check_only:
+            report.append(f"missing collection {name}")
+            return
+        try:
+            db.create_collection(name, **({'validator': validator} if validator else {}))
+        except CollectionInvalid:
+            pass  # created concurrently
+    elif validator and not check_only:
+        try:
+            db.command('collMod', name, validator=validator)
+        except OperationFailure as e:
+            report.append(f"could not update the {name} validator: {e}")
+
+
+def _reconcile_indexes(collection, declared: list, check_only: bool, drop_extra: bool, report: list):
+    existing = {_key_pattern(info['key'].items()): info for info in collection.list_indexes()}
+    wanted = {_key_pattern(keys): (keys, options) for keys, options in declared}
+
+    for pattern, (keys, options) in wanted.items():
+        info = existing.get(pattern)
+        if info is None:
+            if check_only:
+                report.append(f"missing index {collection.name} {dict(keys)}")
+                continue
+            try:
+                collection.create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. existing duplicates block a unique index
+                report.append(f"could not create index {collection.name} {dict(keys)}: {e}")
+            continue
+        for option in ('unique', 'partialFilterExpression'):
+            if (info.get(option) or None) != (options.get(option) or None):
+                report.append(f"index {info['name']} on {collection.name} differs in '{option}'; left as is")
+
+    for pattern, info in existing.items():
+        if pattern == (('_id', 1),) or pattern in wanted:
+            continue
+        if drop_extra and not check_only:
+            collection.drop_index(info['name'])
+            report.append(f"dropped undeclared index {collection.name}.{info['name']}")
+        else:
+            report.append(f"undeclared index {collection.name}.{info['name']}")
+
+
+def unsupported_query_shapes(db):
+    """Query shapes with no index whose leading keys are their equality then sort/range fields"""
+    patterns = {}
+    for name in {shape[0] for shape in QUERY_SHAPES}:
+        patterns[name] = [[field for field, _ in info['key'].items()]
+                          for info in db.get_collection(name).list_indexes()]
+
+    missing = []
+    for name, equality, ordered, where in QUERY_SHAPES:
+        supported = any(
+            set(keys[:len(equality)]) == set(equality) and keys[len(equality):len(equality) + len(ordered)] == ordered
+            for keys in patterns[name]
+        )
+        if not supported:
+            missing.append((name, equality, ordered, where))
+    return missing
+
+
+def bootstrap(db, check_only: bool = False, drop_extra: bool = False):
+    """Bring collections, validators and indexes in line with the declarations; returns the report"""
+    report = []
+    existing = set(db.list_collection_names())
+    for name in set(INDEXES) | set(VALIDATORS):
+        _ensure_collection(db, name, existing, check_only, report)
+    for name, declared in INDEXES.items():
+        _reconcile_indexes(db.get_collection(name), declared, check_only, drop_extra, report)
+
+    if not check_only:
+        seed_expense_counter(db)
+
+    for name, equality, ordered, where in unsupported_query_shapes(db):
+        report.append(f"no index serves {name} {equality + ordered} ({where})")
+    return report
+
+
+if __name__ == "__main__":
+    from mongodb import getdatabase
+
+    parser = argparse.ArgumentParser(description="Create and check collections, validators and indexes")
+    parser.add_argument('--check', action='store_true', help="report differences without changing anything")
+    parser.add_argument('--drop-extra', action='store_true', help="drop indexes that aren't declared here")
+    args = parser.parse_args()
+
+    report = bootstrap(getdatabase("finwise"), check_only=args.check, drop_extra=args.drop_extra)
+    for line in report:
+        print(f"⚠️  {line}")
+    print("✅ Schema is in line with the declarations" if not report else f"{len(report)} findings")
@@ -0,0 +1,146 @@
+"""
+Debt simplification for a group of friends.
+
+Every unsettled split expense between group members is reduced to one net
+position per person (what they are owed minus what they owe). The plan
+then pays the largest debtor into the largest creditor until everyone is
+at zero (greedy min-cash-flow), which needs at most n - 1 transfers for n
+people however many expenses are open. Amounts are handled in cents so
+rounding never leaves a stray transfer behind.
+
+Only expenses the caller created (the ones where they are owed money)
+and whose participants are all in the group are included, the same rule
+/settle-expense enforces: nobody can close a debt owed to someone else.
+"""
+
+import heapq
+import uuid
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from split_expenses import SPLIT_EXPENSES, SPLIT_BALANCES, balance_updates
+
+SETTLEMENTS = "settlements"
+
+
+def _settleable(group: list, settled_by: str):
+    return {
+        'created_by': settled_by,
+        'settled': False,
+        'status': {'$ne': 'pending'},
+        'split_with': {'$not': {'$elemMatch': {'$nin': group}}}
+    }
+
+
+def group_expenses(split_expenses, group: list, settled_by: str):
+    """Unsettled, committed expenses the caller created, among group members only"""
+    return list(split_expenses.find(_settleable(group, settled_by),
+                                    {'_id': False, 'expense_id': True, 'created_by': True, 'balances': True}))
+
+
+def forbidden_expenses(db, group: list, expense_ids: list, settled_by: str):
+    """Requested expenses the caller may not settle: someone else's, or shared outside the group"""
+    expenses = db.get_collection(SPLIT_EXPENSES).find(
+        {'expense_id': {'$in': expense_ids}},
+        {'_id': False, 'expense_id': True, 'created_by': True, 'split_with': True}
+    )
+    return sorted(e['expense_id'] for e in expenses
+                  if e['created_by'] != settled_by or any(m not in group for m in e.get('split_with', [])))
+
+
+def net_positions(expenses):
+    """{username: cents} — positive is owed money, negative owes money"""
+    net = {}
+    for expense in expenses:
+        creditor = expense['created_by']
+        for debtor, amount in expense.get('balances', {}).items():
+            cents = int(round(amount * 100))
+            net[creditor] = net.get(creditor, 0) + cents
+            net[debtor] = net.get(debtor, 0) - cents
+    return net
+
+
+def min_cash_flow(net: dict):
+    """Greedy transfers that bring every net position to zero"""
+    creditors = [(-cents, username) for username, cents in net.items() if cents > 0]
+    debtors = [(cents, username) for username, cents in net.items() if cents < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        owed, creditor = heapq.heappop(creditors)
+        owes, debtor = heapq.heappop(debtors)
+        cents = min(-owed, -owes)
+        transfers.append({'from': debtor, 'to': creditor, 'amount': cents / 100})
+
+        if owed + cents < 0:
+            heapq.heappush(creditors, (owed + cents, creditor))
+        if owes + cents < 0:
+            heapq.heappush(debtors, (owes + cents, debtor))
+    return transfers
+
+
+def settlement_plan(db, group: list, settled_by: str):
+    """Net positions and the greedy transfers settling the caller's open expenses inside the group"""
+    expenses = group_expenses(db.get_collection(SPLIT_EXPENSES), group, settled_by)
+    net = net_positions(expenses)
+    return {
+        'group': group,
+        'expense_ids': sorted(e['expense_id'] for e in expenses),
+        'open_debts': sum(len(e.get('balances', {})) for e in expenses),
+        'net_positions': {username: cents / 100 for username, cents in net.items() if cents},
+        'transfers': min_cash_flow(net)
+    }
+
+
+def bulk_settle(db, group: list, expense_ids: list, settled_by: str):
+    """
+    Settle the given plan's expenses in one batch.
+
+    Only the caller's own expenses inside the group are touched (check
+    forbidden_expenses first to reject the rest). Their pairwise balances
+    are released with a single bulk_write before the expenses are marked
+    settled with a single update_many, like split_expenses.settle: if the
+    second write never happens the expenses stay open, and settling them
+    again releases nothing twice because the balance updates are
+    conditional. Returns the settlement record.
+    """
+    settlement_id = uuid.uuid4().hex
+    split_expenses = db.get_collection(SPLIT_EXPENSES)
+    expenses = list(split_expenses.find(
+        dict(_settleable(group, settled_by), expense_id={'$in': expense_ids}),
+        {'_id': False, 'expense_id': True, 'created_by': True, 'balances': True}
+    ))
+
+    updates = [update for expense in expenses for update in balance_updates(expense, -1)]
+    if updates:
+        try:
+            db.get_collection(SPLIT_BALANCES).bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+
+    split_expenses.update_many(
+        {'expense_id': {'$in': [e['expense_id'] for e in expenses]}, 'settled': False},
+        {'$set': {
+            'settled': True,
+            'dateSettled': str(datetime.now().date()),
+            'settlement_id': settlement_id
+        }}
+    )
+
+    # A concurrent settle may have flagged some first; record only ours
+    claimed = list(split_expenses.find({'expense_id': {'$in': expense_ids}, 'settlement_id': settlement_id},
+                                       {'_id': False, 'expense_id': True, 'created_by': True, 'balances': True}))
+    record = {
+        'settlement_id': settlement_id,
+        'settled_by': settled_by,
+        'group': group,
+        'expense_ids': sorted(e['expense_id'] for e in claimed),
+        'transfers': min_cash_flow(net_positions(claimed)),
+        'dateSettled': str(datetime.now().date()),
+        'timeSettled': str(datetime.now().time())
+    }
+    if claimed:
+        db.get_collection(SETTLEMENTS).insert_one(dict(record))
+    return record
@@ -0,0 +1,42 @@
+"""
+Friend requests and friend profiles.
+
+friendRequests is always read by (recipient, status) or (sender, status),
+optionally narrowed to the other party, so both orders get a compound
+index that ends with the other username (see schema.py). A partial unique
+index on pending (sender, recipient) pairs makes duplicate requests
+impossible instead of relying on a find-then-insert.
+"""
+
+FRIEND_REQUESTS = "friendRequests"
+
+
+def pending_counts(friend_requests, username: str):
+    """Received/sent pending request counts, answered from the indexes alone"""
+    return {
+        'received': friend_requests.count_documents({'recipient': username, 'status': 'pending'}),
+        'sent': friend_requests.count_documents({'sender': username, 'status': 'pending'})
+    }
+
+
+def friend_profiles(users_repo, usernames: list, rank_of):
+    """Public profiles of several users, fetched with one $in query"""
+    if not usernames:
+        return []
+    found = {user['username']: user for user in users_repo.get_many(usernames, 'profile')}
+
+    profiles = []
+    for username in usernames:
+        user = found.get(username)
+        if user is None:
+            continue  # account was deleted
+        points = user.get('reward_points', 0)
+        rank = rank_of(points)
+        profiles.append({
+            'username': username,
+            'name': user.get('name'),
+            'reward_points': points,
+            'rank': {'name': rank['name'], 'icon': rank['icon']},
+            'achievements': user.get('achievements', [])
+        })
+    return profiles
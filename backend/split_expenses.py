@@ -0,0 +1,339 @@
+"""
+Split expense creation as an outbox-style saga.
+
+The splitExpenses document is the source of truth and is written first,
+with status 'pending' and the list of participants still to receive their
+transaction row. All participants' rows are then written in one batch,
+alongside the balance updates; each row has a deterministic _id, so a
+retried write is a no-op. Once every row and the data_version bumps are
+in, the expense is marked 'committed'.
+
+If the process dies or a write fails in between, the expense stays
+pending and the recovery sweeper rolls it forward with the same idempotent
+writes. A standalone MongoDB has no multi-document transactions, so this
+is the atomicity we can get without a replica set: every expense ends up
+either fully applied or never visible as committed.
+
+Open debts are also kept pairwise in splitBalances, one document per
+(debtor, creditor) with the running amount and the ids of the open
+expenses it includes. Applying or settling an expense is conditional on
+that id list, so a retried write never counts an expense twice, and
+you_owe/owed_to_you are indexed reads instead of a scan of every expense.
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne, DESCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+from cache import transactions_written
+from transactions import insert_rows
+
+SPLIT_EXPENSES = "splitExpenses"
+SPLIT_BALANCES = "splitBalances"
+COUNTERS = "counters"
+FANOUT_WORKERS = 16
+RECOVERY_AFTER = timedelta(seconds=30)  # pending this long means the creator gave up
+RECOVERY_INTERVAL = 60  # seconds
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SETTLED_EPSILON = 0.005  # balances below half a cent are paid off
+REBUILD_SCRATCH = SPLIT_BALANCES + "_rebuild"
+REBUILD_GRACE = 10  # seconds for in-flight fan-outs and settles to finish after the swap
+
+# list filter -> splitExpenses condition
+EXPENSE_FILTERS = {
+    'unsettled': {'settled': False},
+    'settled': {'settled': True},
+    'all': {}
+}
+
+_fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="split-fanout")
+
+
+def seed_expense_counter(db):
+    """Move the expense id counter past every existing expense"""
+    split_expenses = db.get_collection(SPLIT_EXPENSES)
+    last_expense = split_expenses.find_one(sort=[("expense_id", -1)], projection={'expense_id': True})
+    db.get_collection(COUNTERS).update_one(
+        {'_id': 'expense_id'},
+        {'$max': {'value': last_expense.get("expense_id", 0) if last_expense else 0}},
+        upsert=True
+    )
+
+
+def next_expense_id(db):
+    """Allocate an expense id; unlike max(expense_id) + 1 this never hands out the same id twice"""
+    counter = db.get_collection(COUNTERS).find_one_and_update(
+        {'_id': 'expense_id'},
+        {'$inc': {'value': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter['value']
+
+
+def split_transaction(expense: dict, username: str):
+    """The transaction row an expense adds to one participant's history"""
+    description = expense.get('description')
+    row = {
+        "_id": f"split_{expense['expense_id']}:{username}",  # makes the write idempotent
+        "username": username,
+        "dateEntered": expense['dateCreated'],
+        "amount": expense['amount_per_person'],
+        "type": "debit",
+        "category": "Split Expense",
+        "description": f"Split: {description}" if description else "Split Expense",
+        "split_expense_id": expense['expense_id']
+    }
+    if username != expense['created_by']:
+        row["split_with"] = expense['created_by']
+    return row
+
+
+def balance_updates(expense: dict, sign: int):
+    """Conditional per-pair updates adding (sign=1) or removing (sign=-1) an expense"""
+    expense_id = expense['expense_id']
+    creditor = expense['created_by']
+    updates = []
+    for debtor, amount in expense.get('balances', {}).items():
+        if sign > 0:
+            updates.append(UpdateOne(
+                {'debtor': debtor, 'creditor': creditor, 'open_expenses': {'$ne': expense_id}},
+                {'$inc': {'amount': amount}, '$push': {'open_expenses': expense_id}},
+                upsert=True
+            ))
+        else:
+            updates.append(UpdateOne(
+                {'debtor': debtor, 'creditor': creditor, 'open_expenses': expense_id},
+                {'$inc': {'amount': -amount}, '$pull': {'open_expenses': expense_id}}
+            ))
+    return updates
+
+
+def _apply_balances(db, expense: dict, sign: int):
+    updates = balance_updates(expense, sign)
+    if not updates:
+        return
+    try:
+        db.get_collection(SPLIT_BALANCES).bulk_write(updates, ordered=False)
+    except BulkWriteError as e:
+        # A duplicate key means the pair exists and already holds this expense
+        if any(error['code'] != 11000 for error in e.details['writeErrors']):
+            raise
+
+
+def fan_out(db, expense: dict):
+    """
+    Write every participant's row and the pairwise balances, then commit the expense.
+
+    Safe to run any number of times for the same expense.
+    """
+    participants = expense['fanout']
+    rows = [split_transaction(expense, username) for username in participants]
+    futures = [
+        _fanout_pool.submit(insert_rows, db, rows),
+        _fanout_pool.submit(_apply_balances, db, expense, 1)
+    ]
+    for future in futures:
+        future.result()  # re-raise the first failure; the expense stays pending
+
+    # Everyone's transaction history changed
+    db.get_collection("userInfo").update_many(
+        {'username': {'$in': participants}},
+        {'$inc': {'data_version': 1}}
+    )
+    transactions_written(*participants)
+
+    db.get_collection(SPLIT_EXPENSES).update_one(
+        {'expense_id': expense['expense_id'], 'status': 'pending'},
+        {'$set': {'status': 'committed'}, '$unset': {'fanout': '', 'fanout_started': ''}}
+    )
+
+
+def create_split_expense(db, username: str, amount: float, description: str, split_with: list):
+    """
+    Record a split expense and apply it to every participant.
+
+    Returns (expense, committed). If committed is False the expense is
+    recorded but some rows are still missing; the sweeper will finish it.
+    """
+    total_people = len(split_with) + 1  # +1 for the creator
+    amount_per_person = round(amount / total_people, 2)
+    now = datetime.now()
+
+    expense = {
+        'expense_id': next_expense_id(db),
+        'created_by': username,
+        'amount': amount,
+        'description': description,
+        'split_with': split_with,
+        'total_people': total_people,
+        'amount_per_person': amount_per_person,
+        'balances': {friend: amount_per_person for friend in split_with},  # {username: amount_owed}
+        'settled': False,
+        'dateCreated': str(now.date()),
+        'timeCreated': str(now.time()),
+        'status': 'pending',
+        'fanout': [username] + split_with,
+        'fanout_started': now
+    }
+    db.get_collection(SPLIT_EXPENSES).insert_one(dict(expense))
+
+    try:
+        fan_out(db, expense)
+        return expense, True
+    except PyMongoError:
+        return expense, False
+
+
+def recover_pending_splits(db, now: datetime = None):
+    """Roll forward expenses whose fan-out was interrupted; returns how many were finished"""
+    now = now or datetime.now()
+    split_expenses = db.get_collection(SPLIT_EXPENSES)
+    recovered = 0
+
+    while True:
+        # Lease the expense so concurrent sweepers don't all redo it
+        expense = split_expenses.find_one_and_update(
+            {'status': 'pending', 'fanout_started': {'$lt': now - RECOVERY_AFTER}},
+            {'$set': {'fanout_started': now}},
+            projection={'_id': False}
+        )
+        if expense is None:
+            return recovered
+        try:
+            fan_out(db, expense)
+            recovered += 1
+        except PyMongoError as e:
+            print(f"⚠️  Split expense {expense['expense_id']} still pending: {e}")
+
+
+def start_split_recovery(db, interval: float = RECOVERY_INTERVAL):
+    """Run the recovery sweeper in a background thread"""
+    def sweep_forever():
+        while True:
+            try:
+                recover_pending_splits(db)
+            except PyMongoError as e:
+                print(f"⚠️  Split expense recovery failed: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=sweep_forever, name="split-recovery", daemon=True).start()
+
+
+def settle(db, expense: dict):
+    """Mark an expense settled and take it out of the pairwise balances"""
+    _apply_balances(db, expense, -1)
+    db.get_collection(SPLIT_EXPENSES).update_one(
+        {'expense_id': expense['expense_id']},
+        {'$set': {'settled': True, 'dateSettled': str(datetime.now().date())}}
+    )
+
+
+def balance_summary(db, username: str):
+    """What the user owes each creditor and what each debtor owes them, from the balance table"""
+    balances = db.get_collection(SPLIT_BALANCES)
+    open_debt = {'amount': {'$gt': SETTLED_EPSILON}}
+    projection = {'_id': False, 'debtor': True, 'creditor': True, 'amount': True}
+
+    you_owe = {
+        b['creditor']: round(b['amount'], 2)
+        for b in balances.find(dict(open_debt, debtor=username), projection)
+    }
+    owed_to_you = {
+        b['debtor']: round(b['amount'], 2)
+        for b in balances.find(dict(open_debt, creditor=username), projection)
+    }
+    return you_owe, owed_to_you
+
+
+def list_expenses(split_expenses, query: dict, status: str = 'unsettled', before: int = None,
+                  limit: int = DEFAULT_PAGE_SIZE):
+    """
+    One page of expenses, newest first.
+
+    Pages are keyed on expense_id: pass the returned `next_before` to get
+    the next page. Returns (expenses, next_before or None).
+    """
+    query = dict(query, **EXPENSE_FILTERS[status])
+    if before is not None:
+        query['expense_id'] = {'$lt': before}
+    projection = {'_id': False, 'fanout': False, 'fanout_started': False}
+
+    expenses = list(split_expenses.find(query, projection).sort('expense_id', DESCENDING).limit(limit + 1))
+    if len(expenses) > limit:
+        return expenses[:limit], expenses[limit - 1]['expense_id']
+    return expenses, None
+
+
+def _open_expenses(db):
+    return list(db.get_collection(SPLIT_EXPENSES).find(
+        {'settled': False, 'status': {'$ne': 'pending'}},
+        {'_id': False, 'expense_id': True, 'created_by': True, 'balances': True}
+    ))
+
+
+def rebuild_balances(db, grace: float = REBUILD_GRACE):
+    """
+    Recompute splitBalances from the unsettled committed expenses.
+
+    The table is built in a scratch collection and swapped in with
+    renameCollection(dropTarget=True), so the live table is never emptied.
+    Fan-outs and settles that ran against the old table while it was being
+    built are then caught up: after `grace` seconds (long enough for any
+    in-flight request to finish its writes), expenses committed since the
+    snapshot are added and expenses settled since are released. Both use
+    the conditional balance updates, so nothing is applied twice. Returns
+    how many expenses the table was built from.
+    """
+    from schema import INDEXES  # schema imports this module
+
+    expenses = _open_expenses(db)
+    rows = {}
+    for expense in expenses:
+        creditor = expense['created_by']
+        for debtor, amount in expense.get('balances', {}).items():
+            row = rows.setdefault((debtor, creditor), {
+                'debtor': debtor, 'creditor': creditor, 'amount': 0, 'open_expenses': []
+            })
+            row['amount'] += amount
+            row['open_expenses'].append(expense['expense_id'])
+
+    scratch = db.get_collection(REBUILD_SCRATCH)
+    scratch.drop()
+    for keys, options in INDEXES[SPLIT_BALANCES]:
+        scratch.create_index(keys, **options)
+    if rows:
+        scratch.insert_many(list(rows.values()))
+    scratch.rename(SPLIT_BALANCES, dropTarget=True)
+
+    time.sleep(grace)
+    built = {e['expense_id']: e for e in expenses}
+    current = {e['expense_id']: e for e in _open_expenses(db)}
+    for expense_id in built.keys() - current.keys():
+        _apply_balances(db, built[expense_id], -1)
+    for expense_id in current.keys() - built.keys():
+        _apply_balances(db, current[expense_id], 1)
+    return len(expenses)
+
+
+if __name__ == "__main__":
+    from mongodb import getdatabase
+
+    parser = argparse.ArgumentParser(description="Split expense maintenance")
+    parser.add_argument('--rebuild-balances', action='store_true',
+                        help="recompute splitBalances from unsettled expenses in a scratch collection and swap it in; "
+                             "safe while the app is running; writes made during the rebuild are caught up afterwards")
+    parser.add_argument('--recover', action='store_true', help="roll forward interrupted split expenses")
+    args = parser.parse_args()
+
+    db = getdatabase("finwise")
+    if args.recover:
+        print(f"✅ Recovered {recover_pending_splits(db)} split expenses")
+    if args.rebuild_balances:
+        print(f"✅ Rebuilt balances from {rebuild_balances(db)} unsettled expenses")
+    if not (args.recover or args.rebuild_balances):
+        parser.error("pass --rebuild-balances and/or --recover")
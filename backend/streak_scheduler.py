@@ -0,0 +1,121 @@
+"""
+Batch streak evaluation for all users.
+
+Runs weekly and monthly streak evaluation right after the period rolls
+over, so requests only ever see an "already evaluated" user. Users are
+split into _id ranges that are evaluated in parallel across a process
+pool. Each range checkpoints its progress in the jobCheckpoints
+collection (see jobs.py), so an interrupted run resumes where it stopped.
+
+Usage:
+    python streak_scheduler.py weekly       # evaluate the current week once
+    python streak_scheduler.py monthly      # evaluate the current month once
+    python streak_scheduler.py --loop       # stay up and run at every rollover
+
+The one-shot form is meant for cron, e.g. `5 0 * * 1` for weekly and
+`5 0 1 * *` for monthly.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, date, timedelta
+from mongodb import getdatabase
+from jobs import CHECKPOINTS, plan_chunks, remaining_range, save_checkpoint, finish_chunk
+from cache import start_invalidation_channel
+from streaks import get_week_start, get_month_start, evaluate_weekly_streak, evaluate_monthly_streak
+
+CHECKPOINT_EVERY = 200  # users evaluated between checkpoint writes
+WORKERS = os.cpu_count() or 4
+ROLLOVER_DELAY = timedelta(minutes=5)
+
+# kind -> (period start, userInfo field marking evaluation, evaluator)
+PERIODS = {
+    'weekly': (get_week_start, 'last_weekly_check', evaluate_weekly_streak),
+    'monthly': (get_month_start, 'last_monthly_check', evaluate_monthly_streak)
+}
+
+
+def run_chunk(kind: str, today_iso: str, chunk_id: str):
+    """Evaluate every due user in one _id range; runs in a worker process"""
+    db = getdatabase("finwise")  # fresh client per process
+    start_invalidation_channel(db, listen=False)  # tell web workers about the writes
+    checkpoints = db.get_collection(CHECKPOINTS)
+    chunk = checkpoints.find_one({'_id': chunk_id})
+    if not chunk or chunk['done']:
+        return 0
+
+    today = date.fromisoformat(today_iso)
+    period_of, field, evaluate = PERIODS[kind]
+    period_start = str(period_of(today))
+
+    users = db.get_collection("userInfo").find(
+        {'_id': remaining_range(chunk), field: {'$not': {'$gte': period_start}}},
+        {'username': True}
+    ).sort('_id', 1)
+
+    processed = chunk['processed']
+    for user in users:
+        evaluate(db, user['username'], today)
+        processed += 1
+        if processed % CHECKPOINT_EVERY == 0:
+            save_checkpoint(db, chunk_id, user['_id'], processed)
+
+    finish_chunk(db, chunk_id, processed)
+    return processed
+
+
+def run(kind: str, today=None, workers: int = WORKERS):
+    """Evaluate one period for all users; safe to re-run after an interruption"""
+    if today is None:
+        today = datetime.now().date()
+    period_of = PERIODS[kind][0]
+    period_start = str(period_of(today))
+
+    db = getdatabase("finwise")
+    chunks = [c for c in plan_chunks(db, f"{kind}_streaks:{period_start}") if not c['done']]
+    print(f"⏱️  {kind} streaks for {period_start}: {len(chunks)} ranges to evaluate")
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, kind, today.isoformat(), c['_id']) for c in chunks]
+        for future in as_completed(futures):
+            total += future.result()
+
+    print(f"✅ {kind} streaks for {period_start}: {total} users evaluated")
+    return total
+
+
+def next_rollover(now: datetime):
+    """The next weekly or monthly period start, plus a small delay"""
+    today = now.date()
+    next_monday = get_week_start(today) + timedelta(days=7)
+    next_month = (get_month_start(today) + timedelta(days=32)).replace(day=1)
+    return datetime.combine(min(next_monday, next_month), datetime.min.time()) + ROLLOVER_DELAY
+
+
+def loop(workers: int = WORKERS):
+    """Catch up the current periods, then run again after every rollover"""
+    while True:
+        run('weekly', workers=workers)
+        run('monthly', workers=workers)
+
+        wake_at = next_rollover(datetime.now())
+        print(f"💤 Next run at {wake_at}")
+        time.sleep(max(0, (wake_at - datetime.now()).total_seconds()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate weekly/monthly streaks for all users")
+    parser.add_argument('kind', nargs='?', choices=list(PERIODS), help="period to evaluate once")
+    parser.add_argument('--loop', action='store_true', help="keep running and evaluate at every rollover")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="worker processes")
+    args = parser.parse_args()
+
+    if args.loop:
+        loop(args.workers)
+    elif args.kind:
+        run(args.kind, workers=args.workers)
+    else:
+        parser.error("pass a period (weekly/monthly) or --loop")
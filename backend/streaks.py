@@ -0,0 +1,155 @@
+"""
+Weekly and monthly streak evaluation.
+
+Streaks are normally evaluated for every user right after the period rolls
+over by streak_scheduler.py. The request path only falls back to evaluating
+a user the scheduler hasn't reached yet; `weekly_due`/`monthly_due` make
+that an in-memory check on a user document the route already loaded.
+
+Each evaluation claims the period with a conditional update on
+last_weekly_check/last_monthly_check in the same write that awards its
+points, so the scheduler and a request can never both award the same
+period, and a worker that dies before that write leaves the period
+unclaimed for the next run to evaluate.
+"""
+
+from datetime import datetime, timedelta
+from achievements import on_counters_changed
+from points import award_points, ledger_entry
+from columnar import get_columns, period_totals, exceeded_categories
+
+WEEKLY_STREAK_BONUS = 25
+MONTHLY_COMPLIANCE_BONUS = 100
+
+
+def get_week_start(date_obj=None):
+    """Get the Monday of the current week"""
+    if date_obj is None:
+        date_obj = datetime.now().date()
+    days_since_monday = date_obj.weekday()
+    monday = date_obj - timedelta(days=days_since_monday)
+    return monday
+
+
+def get_month_start(date_obj=None):
+    """Get the first day of the current month"""
+    if date_obj is None:
+        date_obj = datetime.now().date()
+    return date_obj.replace(day=1)
+
+
+def weekly_due(user: dict, today=None):
+    """True if the current week hasn't been evaluated for this user"""
+    return (user.get('last_weekly_check') or '') < str(get_week_start(today))
+
+
+def monthly_due(user: dict, today=None):
+    """True if the current month hasn't been evaluated for this user"""
+    return (user.get('last_monthly_check') or '') < str(get_month_start(today))
+
+
+def _unclaimed(field: str, period_start: str):
+    """Filter matching users whose period hasn't been evaluated yet"""
+    return {field: {'$not': {'$gte': period_start}}}
+
+
+def _claim_period(users, username: str, field: str, period_start: str, entries: list, changes: dict,
+                  shared: dict = None):
+    """
+    Mark the period as evaluated and apply its award in one write, only if
+    nobody else did already.
+
+    Returns the user's rewards view after the write, or None if the period
+    was already claimed.
+    """
+    changes.setdefault('$set', {})[field] = period_start
+    return award_points(users, username, entries, shared, claim=_unclaimed(field, period_start),
+                        changes=changes)
+
+
+def evaluate_weekly_streak(db, username: str, today=None, shared: dict = None):
+    """
+    Check if user maintained limits for the past week and award points.
+
+    `shared` is the request's copy of the user document, kept in sync if given.
+    """
+    a = db.get_collection("userInfo")
+    current_monday = get_week_start(today)
+    field, period_start = 'last_weekly_check', str(current_monday)
+
+    user = a.find_one({'username': username, **_unclaimed(field, period_start)},
+                      {'limit': True, 'data_version': True})
+    if not user:
+        return False
+
+    # Transactions from the previous week
+    previous_monday = current_monday - timedelta(days=7)
+    columns = get_columns(db, username, user.get('data_version'))
+    total_income, weekly_expenses = period_totals(columns, previous_monday, current_monday)
+
+    # Check if any limit was exceeded
+    limit_exceeded = bool(exceeded_categories(weekly_expenses, user.get('limit', {}), total_income))
+
+    # Award points if no limit exceeded
+    if not limit_exceeded and (weekly_expenses or total_income > 0):
+        # Increment consecutive weekly streaks for Streak Star achievement
+        entries = [ledger_entry(username, 'weekly_streak', WEEKLY_STREAK_BONUS, f"weekly_{current_monday}")]
+        changes = {'$inc': {'consecutive_weekly_streaks': 1}}
+    else:
+        # Reset consecutive weeks if limit exceeded
+        entries = []
+        changes = {'$set': {'consecutive_weekly_streaks': 0}}
+
+    updated = _claim_period(a, username, field, period_start, entries, changes, shared)
+    if not updated or not entries:
+        return False
+
+    on_counters_changed(a, username, {'consecutive_weekly_streaks': updated['consecutive_weekly_streaks']}, shared)
+    return True
+
+
+def evaluate_monthly_streak(db, username: str, today=None, shared: dict = None):
+    """
+    Check monthly limit compliance and award points.
+
+    `shared` is the request's copy of the user document, kept in sync if given.
+    """
+    a = db.get_collection("userInfo")
+    current_month_start = get_month_start(today)
+    field, period_start = 'last_monthly_check', str(current_month_start)
+
+    user = a.find_one({'username': username, **_unclaimed(field, period_start)},
+                      {'limit': True, 'data_version': True})
+    if not user:
+        return 0
+
+    # Transactions from the previous month
+    previous_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
+    columns = get_columns(db, username, user.get('data_version'))
+    total_income, monthly_expenses = period_totals(columns, previous_month_start, current_month_start)
+
+    # Check how many limits were exceeded
+    limits = user.get('limit', {})
+    total_limits = len(limits)
+    exceeded_count = len(exceeded_categories(monthly_expenses, limits, total_income))
+
+    if total_limits == 0:
+        _claim_period(a, username, field, period_start, [], {}, shared)
+        return 0
+
+    # Calculate points: 100 * (totalLimits - n) / totalLimits
+    points = int(MONTHLY_COMPLIANCE_BONUS * (total_limits - exceeded_count) / total_limits)
+    entries = [ledger_entry(username, 'monthly_compliance', points, f"monthly_{current_month_start}")]
+
+    # Track consecutive months with 100-point bonus for Budget Boss achievement
+    if points == MONTHLY_COMPLIANCE_BONUS:
+        changes = {'$inc': {'consecutive_monthly_bonuses': 1}}
+    else:
+        changes = {'$set': {'consecutive_monthly_bonuses': 0}}
+
+    updated = _claim_period(a, username, field, period_start, entries, changes, shared)
+    if not updated:
+        return 0
+
+    on_counters_changed(a, username, {'consecutive_monthly_bonuses': updated['consecutive_monthly_bonuses']}, shared)
+    return points
@@ -0,0 +1,83 @@
+"""
+Data access for user transactions.
+
+All users' transactions live in one `transactions` collection, each row
+tagged with its owner's username, instead of one collection per user.
+Every read and write goes through this module so the username filter is
+never forgotten; `for_user` hands out a collection-like view for code that
+was written against a per-user collection.
+
+The collection is indexed on (username, dateEntered) (see schema.py),
+which is also the intended shard key: a user's history stays on one shard
+and date-range reads are a single index range scan.
+"""
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+TRANSACTIONS = "transactions"
+SHARD_KEY = [('username', 1), ('dateEntered', 1)]
+
+# Fields stored on every row but not part of the transaction itself
+HIDDEN = {'_id': False, 'username': False}
+
+
+class UserTransactions:
+    """One user's slice of the transactions collection, with a collection-like API"""
+
+    def __init__(self, collection, username: str):
+        self.collection = collection
+        self.username = username
+
+    def _scoped(self, query: dict = None):
+        return dict(query or {}, username=self.username)
+
+    def insert_one(self, transaction: dict):
+        return self.collection.insert_one(dict(transaction, username=self.username))
+
+    def find(self, query: dict = None, projection: dict = None, **kwargs):
+        """Like Collection.find; without a projection, _id and username are left out"""
+        if projection is None:
+            projection = HIDDEN
+        elif not any(value for field, value in projection.items() if field != '_id'):
+            projection = dict(projection, username=False)  # exclusion projection
+        return self.collection.find(self._scoped(query), projection, **kwargs)
+
+    def aggregate(self, pipeline: list, **kwargs):
+        return self.collection.aggregate([{'$match': {'username': self.username}}] + list(pipeline), **kwargs)
+
+    def count_documents(self, query: dict = None):
+        return self.collection.count_documents(self._scoped(query))
+
+
+def for_user(db, username: str):
+    return UserTransactions(db.get_collection(TRANSACTIONS), username)
+
+
+def add_transaction(db, username: str, transaction: dict):
+    """Record one transaction for a user"""
+    return for_user(db, username).insert_one(transaction)
+
+
+def insert_rows(db, rows: list):
+    """
+    Insert rows (each carrying its username) in one unordered batch.
+
+    Rows whose _id already exists are skipped, so callers that give rows a
+    deterministic _id can safely retry. Returns how many were inserted.
+    """
+    return len(insert_new_rows(db, rows))
+
+
+def insert_new_rows(db, rows: list):
+    """Like insert_rows, but returns the rows that were actually inserted"""
+    if not rows:
+        return []
+    try:
+        db.get_collection(TRANSACTIONS).bulk_write([InsertOne(row) for row in rows], ordered=False)
+        return rows
+    except BulkWriteError as e:
+        if any(error['code'] != 11000 for error in e.details['writeErrors']):
+            raise
+        skipped = {error['index'] for error in e.details['writeErrors']}
+        return [row for i, row in enumerate(rows) if i not in skipped]
@@ -2,7 +2,9 @@
 # LibreTranslate is a Free and Open Source Machine Translation API
 # Documentation: https://github.com/LibreTranslate/LibreTranslate
 
+import asyncio
 from deep_translator import GoogleTranslator
+from metrics import span
 import os
 
 # List of supported languages (same as frontend)
@@ -59,7 +61,8 @@ def translate_text(text, source_lang='en', target_lang='en'):
     try:
         # Use deep-translator which is free and doesn't require API keys
         translator = GoogleTranslator(source=source_lang, target=target_lang)
-        translated = translator.translate(text)
+        with span('translator'):
+            translated = translator.translate(text)
         return translated
     except Exception as e:
         print(f"Translation error: {str(e)}")
@@ -87,6 +90,33 @@ def translate_batch(texts, source_lang='en', target_lang='en'):
     
     return translated_texts
 
+# Strings of one batch translated at the same time by the async server
+TRANSLATE_CONCURRENCY = 8
+
+async def translate_text_async(text, source_lang='en', target_lang='en'):
+    """
+    translate_text for the async server.
+    
+    deep-translator has no async API, so the request runs on a worker
+    thread; the event loop keeps serving other requests meanwhile.
+    """
+    if source_lang == target_lang or target_lang == 'en':
+        return text
+    return await asyncio.to_thread(translate_text, text, source_lang, target_lang)
+
+async def translate_batch_async(texts, source_lang='en', target_lang='en'):
+    """translate_batch with up to TRANSLATE_CONCURRENCY strings in flight at once"""
+    if source_lang == target_lang or target_lang == 'en':
+        return texts
+    
+    limit = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+    
+    async def translate_one(text):
+        async with limit:
+            return await translate_text_async(text, source_lang, target_lang)
+    
+    return list(await asyncio.gather(*(translate_one(text) for text in texts)))
+
 def get_supported_languages():
     """
     Get list of supported languages
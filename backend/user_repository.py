@@ -0,0 +1,158 @@
+"""
+Typed access to userInfo documents through named projections.
+
+Each use case reads only the fields it needs, declared once below as a
+TypedDict: the bcrypt hash, the 30-key interest map and the friends array
+are only shipped to the routes that actually use them. Views are cached
+per user in cache.user_cache and invalidated together by user_written(),
+except the auth view: the password hash is read from MongoDB each time it
+is needed and never kept in a worker's cache.
+
+Cached views may be up to USER_TTL seconds stale. Writes must not be built
+from them; update the fields in place ($set on a path, $inc, $addToSet).
+"""
+
+import copy
+from typing import TypedDict, List, Dict, get_type_hints
+from datetime import datetime
+from bson import ObjectId
+from cache import user_cache
+
+
+class IdentityView(TypedDict, total=False):
+    username: str
+
+
+class AuthView(IdentityView, total=False):
+    password: str
+
+
+class LimitsView(IdentityView, total=False):
+    limit: Dict[str, float]
+
+
+class HistoryView(IdentityView, total=False):
+    data_version: int
+
+
+class RewardsView(IdentityView, total=False):
+    reward_points: int
+    transaction_count: int
+    data_version: int
+    last_weekly_check: str
+    last_monthly_check: str
+    rewards_seen_id: ObjectId
+    rewards_seen_at: datetime
+    achievements: List[str]
+    unseen_achievements: List[str]
+    consecutive_weekly_streaks: int
+    consecutive_monthly_bonuses: int
+    timely_loan_repayments: int
+
+
+class SocialView(IdentityView, total=False):
+    friends: List[str]
+
+
+class InterestsView(IdentityView, total=False):
+    user_interest: Dict[str, float]
+
+
+class ProfileView(IdentityView, total=False):
+    name: str
+    reward_points: int
+    achievements: List[str]
+
+
+VIEWS = {
+    'identity': IdentityView,
+    'auth': AuthView,
+    'limits': LimitsView,
+    'history': HistoryView,
+    'rewards': RewardsView,
+    'social': SocialView,
+    'interests': InterestsView,
+    'profile': ProfileView
+}
+
+UNCACHED_VIEWS = {'auth'}
+
+# view name -> projection, derived from the TypedDict fields
+PROJECTIONS = {
+    name: dict({field: True for field in get_type_hints(view)}, _id=False)
+    for name, view in VIEWS.items()
+}
+
+
+def projection_for(*views):
+    """Union projection of several views"""
+    projection = {'_id': False}
+    for view in views:
+        projection.update(PROJECTIONS[view])
+    return projection
+
+
+class UserRepository:
+    """Reads userInfo documents through named, cached views"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, username: str, *views):
+        """
+        Fields of the given views for one user, or None if the user doesn't exist.
+
+        Cached views are served from memory; the missing ones are fetched
+        together in a single query. Returns a copy the caller may mutate.
+        """
+        views = views or ('identity',)
+        cached, missing = self._cached(username, views)
+        if missing:
+            fetched = self.collection.find_one({'username': username}, projection_for(*missing))
+            if fetched is None:
+                return None
+            cached = self._store(username, cached, missing, fetched)
+        return self._assemble(cached, views)
+
+    def _cached(self, username: str, views):
+        cached = user_cache.get(username) or {}
+        return cached, [view for view in views if view not in cached]
+
+    def _store(self, username: str, cached: dict, missing: list, fetched: dict):
+        cached = dict(cached)
+        for view in missing:
+            cached[view] = {field: fetched[field] for field in PROJECTIONS[view] if field in fetched}
+        user_cache.put(username, {view: fields for view, fields in cached.items() if view not in UNCACHED_VIEWS})
+        return cached
+
+    def _assemble(self, cached: dict, views):
+        user = {}
+        for view in views:
+            user.update(cached[view])
+        return copy.deepcopy(user)
+
+    def get_account(self, identifier: str):
+        """Full profile (without _id) by username, then by email, for signin"""
+        return self.collection.find_one({'username': identifier}, {'_id': False}) or \
+            self.collection.find_one({'email': identifier}, {'_id': False})
+
+    def exists(self, username: str):
+        return self.get(username, 'identity') is not None
+
+    def get_many(self, usernames: list, *views):
+        """Fields of the given views for several users, in one query"""
+        return list(self.collection.find({'username': {'$in': list(usernames)}}, projection_for(*views)))
+
+
+class AsyncUserRepository(UserRepository):
+    """UserRepository.get over an AsyncCollection (for the ASGI server), sharing the same view cache"""
+
+    async def get(self, username: str, *views):
+        views = views or ('identity',)
+        cached, missing = self._cached(username, views)
+        if missing:
+            fetched = await self.collection.find_one({'username': username}, projection_for(*missing))
+            if fetched is None:
+                return None
+            cached = self._store(username, cached, missing, fetched)
+        return self._assemble(cached, views)